@@ -0,0 +1,165 @@
+"""
+Generates the offline inputs for the benchmarks: HTML pages in the markup of
+the wiki tables that `data/app.py` scrapes, rendered from the recipes and raw
+materials in `data/diy_recipes.json`, optionally scaled up with synthetic
+recipes. Everything is deterministic, so runs on different machines and
+commits benchmark the same inputs.
+"""
+
+import html
+import json
+import os
+import re
+
+REPOSITORY_LOCATION = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECIPE_DATA_FILENAME = os.path.join(REPOSITORY_LOCATION, 'data', 'diy_recipes.json')
+
+# Every nth recipe of each synthetic copy also requires the same recipe from
+# the previous copy, so the dependency chains get deeper with the scale.
+CHAIN_EVERY = 10
+
+
+def load_recipe_data(filename: str = RECIPE_DATA_FILENAME) -> dict:
+    with open(filename) as recipe_json:
+        return json.load(recipe_json)
+
+
+def scale_recipes(recipes: dict, scale: int) -> list:
+    """
+    Returns a list of `scale` copies of the scraped properties of the
+    recipes. Copy k (k > 0) prefixes the name of each recipe, and of each
+    material that's a recipe, with "Mk k", so each copy only depends on
+    itself and the raw materials are shared. Every `CHAIN_EVERY`th recipe of
+    a copy also requires one of the same recipe from the previous copy,
+    which makes dependency chains that are `scale` recipes deep.
+    """
+
+    scaled_recipes = []
+    for copy in range(scale):
+        def _copy_name(name: str) -> str:
+            return f'Mk {copy} {name}' if copy else name
+
+        def _copy_id(recipe_id: str, copy: int = copy) -> str:
+            return f'mk_{copy}_{recipe_id}' if copy else recipe_id
+
+        for index, recipe in enumerate(recipes.values()):
+            materials = [
+                {
+                    'name': _copy_name(material['name']),
+                    'id': _copy_id(material['id']),
+                    'uri': material['uri'],
+                    'quantity': material['quantity'],
+                }
+                if material['id'] in recipes else
+                dict(material)
+                for material in recipe['materials']
+            ]
+
+            if copy and index % CHAIN_EVERY == 0:
+                materials.append({
+                    'name': recipe['name'] if copy == 1 else f"Mk {copy - 1} {recipe['name']}",
+                    'id': _copy_id(recipe['id'], copy - 1),
+                    'uri': recipe['uri'],
+                    'quantity': 1,
+                })
+
+            scaled_recipes.append({
+                'name': _copy_name(recipe['name']),
+                'id': _copy_id(recipe['id']),
+                'uri': recipe['uri'],
+                'has_page': recipe['has_page'],
+                'image_url': recipe['image_url'],
+                'materials': materials,
+                'source': recipe['source'],
+                'sell_price': recipe['sell_price'],
+            })
+
+    return scaled_recipes
+
+
+def _link(text: str, href: str, new: bool = False) -> str:
+    href_attribute = f' href="{html.escape(href)}"' if href is not None else ''
+    class_attribute = ' class="new"' if new else ''
+    return f'<a{href_attribute}{class_attribute}>{html.escape(text)}</a>'
+
+
+def _image(image_url: str) -> str:
+    if image_url is None:
+        return ''
+
+    return f'<a href="{html.escape(image_url)}" class="image"><img src="{html.escape(image_url)}"></a>'
+
+
+def render_recipes_page(recipes: list) -> str:
+    """
+    Renders the recipes in the markup of the tables on the wiki's DIY recipe
+    pages.
+    """
+
+    rows = []
+    for recipe in recipes:
+        materials = '<br>'.join(
+            f"{material['quantity']}x {_link(material['name'], material['uri'])}"
+            for material in recipe['materials']
+        )
+
+        # The wiki lists the sell price of one item, even for recipes that
+        # craft several.
+        sell_price = recipe['sell_price']
+        multiplication_factor = re.search(r'x(\d+)$', recipe['name'], re.I)
+        if sell_price is not None and multiplication_factor:
+            sell_price //= int(multiplication_factor.group(1))
+
+        rows.append(''.join((
+            '<tr>',
+            f"<td>{_link(recipe['name'], recipe['uri'], new=not recipe['has_page'])}</td>",
+            f"<td>{_image(recipe['image_url'])}</td>",
+            f'<td>{materials}</td>',
+            '<td>1x1</td>',
+            f"<td>{html.escape(recipe['source'] or '')}</td>",
+            f"<td>{'' if sell_price is None else f'{sell_price:,} Bells'}</td>",
+            '</tr>',
+        )))
+
+    return (
+        '<html><body><table class="article-table"><tbody>'
+        + '\n'.join(rows) +
+        '</tbody></table></body></html>'
+    )
+
+
+def render_raw_materials_page(raw_materials: dict) -> str:
+    """
+    Renders the raw materials in the markup of the tables on the wiki's
+    crafting materials page.
+    """
+
+    rows = ['<tr><th>Name</th><th>Image</th><th>Source</th><th>Sell price</th></tr>']
+    for raw_material in raw_materials.values():
+        sell_price = raw_material['sell_price']
+        rows.append(''.join((
+            '<tr>',
+            f"<td>{_link(raw_material['name'], raw_material['uri'])}</td>",
+            f"<td>{_image(raw_material['image_url'])}</td>",
+            '<td></td>',
+            f"<td>{'' if sell_price is None else f'{sell_price:,} Bells'}</td>",
+            '</tr>',
+        )))
+
+    return (
+        '<html><body><table class="roundy mw-collapsible mw-made-collapsible"><tbody>'
+        + '\n'.join(rows) +
+        '</tbody></table></body></html>'
+    )
+
+
+def html_fixtures(recipe_data: dict, scale: int = 1) -> tuple:
+    """
+    Returns the (recipe page, crafting materials page) HTML fixtures for the
+    recipe data, scaled up by `scale`.
+    """
+
+    return (
+        render_recipes_page(scale_recipes(recipe_data['recipes'], scale)),
+        render_raw_materials_page(recipe_data['raw_materials']),
+    )
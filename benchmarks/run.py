@@ -0,0 +1,417 @@
+"""
+Benchmarks the scraper pipeline in `data/app.py` and the GraphQL API in
+`graphql-backend/app.py`, offline, against HTML fixtures rendered from
+`data/diy_recipes.json` and against synthetic datasets that are scaled up
+from it (see `fixtures.py`). Writes a JSON report with the latency
+percentiles, throughput and peak memory of each benchmark, which can be
+compared with the report of a previous run:
+
+    python benchmarks/run.py --output after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import gc
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fixtures
+
+BENCHMARKS_LOCATION = os.path.dirname(os.path.abspath(__file__))
+DATA_LOCATION = os.path.join(fixtures.REPOSITORY_LOCATION, 'data')
+BACKEND_LOCATION = os.path.join(fixtures.REPOSITORY_LOCATION, 'graphql-backend')
+
+PERCENTILES = (50, 90, 99)
+
+# Each query is run against the scaled datasets as well, so they only use IDs
+# that exist in every dataset.
+CRAFTING_PLAN_INVENTORY = '[%s]' % ', '.join(
+    f'{{ rawMaterialId: "{raw_material_id}", quantity: {quantity} }}'
+    for raw_material_id, quantity in (('wood', 60), ('softwood', 30), ('hardwood', 30), ('stone', 30), ('iron_nugget', 20), ('clay', 10))
+)
+
+QUERIES = {
+    'recipes': '{ recipes { id name sellPrice rawMaterials { id quantity } } }',
+    'recipes_by_raw_material': '{ recipes(rawMaterialId: "wood") { id name sellPrice } }',
+    'recipes_connection_page': '{ recipesConnection(first: 20, sortBy: PROFIT_MARGIN, descending: true) { totalCount edges { node { id name } } } }',
+    'craftable_recipes_large_inventory': None,
+    'optimal_crafting_plan': '{ optimalCraftingPlan(rawMaterials: %s) { profit optimal recipes { quantity recipe { id } } } }' % CRAFTING_PLAN_INVENTORY,
+    'optimal_crafting_plan_labor_budget': '{ optimalCraftingPlan(rawMaterials: %s, laborBudget: 20) { profit optimal recipes { quantity recipe { id } } } }' % CRAFTING_PLAN_INVENTORY,
+    'crafting_plan_frontier': '{ craftingPlanFrontier(rawMaterials: %s, laborBudget: 20) { profit totalCraftingSteps optimal } }' % CRAFTING_PLAN_INVENTORY,
+    'search': '{ search(query: "wodden chai", limit: 10) { score recipe { id } rawMaterial { id } } }',
+}
+
+# Imports the GraphQL app, or loads a data file, in a fresh interpreter, and
+# prints the time that it took and the peak memory of the process.
+COLD_START_SCRIPT = '''
+import json, os, resource, sys, time
+start = time.perf_counter()
+if sys.argv[1] == 'json_load':
+    with open(os.environ['RECIPE_DATA_FILENAME']) as recipe_json:
+        json.load(recipe_json)
+else:
+    import app
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'peak_memory_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+}))
+'''
+
+# Runs the query benchmarks in a fresh interpreter that serves the data file
+# like the API does, and prints the results along with the peak resident
+# memory of the process once the data was loaded and after the queries ran.
+QUERY_GROUP_SCRIPT = '''
+import json, resource, sys
+sys.path.insert(0, sys.argv[1])
+import run
+graphql_app = run.load_graphql_app()
+loaded_memory_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+results = run.benchmark_queries(graphql_app, int(sys.argv[2]), graphql_app.DATASETS.current, run.parse_args(sys.argv[3:]))
+print(json.dumps({
+    'results': results,
+    'loaded_memory_bytes': loaded_memory_bytes,
+    'peak_memory_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+}))
+'''
+
+
+def load_scraper():
+    """
+    Imports `data/app.py`, which has the same module name as the GraphQL app.
+    """
+
+    spec = importlib.util.spec_from_file_location('scraper', os.path.join(DATA_LOCATION, 'app.py'))
+    scraper = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(scraper)
+    return scraper
+
+
+def load_graphql_app():
+    os.environ['RECIPE_DATA_RELOAD_INTERVAL'] = '0'
+    sys.path.insert(0, BACKEND_LOCATION)
+    import app
+    return app
+
+
+def summarize(name: str, group: str, scale: int, samples: list, peak_memory_bytes: int) -> dict:
+    ordered_samples = sorted(samples)
+
+    def _percentile(percentile: int) -> float:
+        # Nearest-rank percentile
+        rank = max(0, -(-percentile * len(ordered_samples) // 100) - 1)
+        return ordered_samples[rank]
+
+    mean = statistics.mean(samples)
+    return {
+        'name': name,
+        'group': group,
+        'scale': scale,
+        'samples': len(samples),
+        'min_seconds': ordered_samples[0],
+        'mean_seconds': mean,
+        **{
+            f'p{percentile}_seconds': _percentile(percentile)
+            for percentile in PERCENTILES
+        },
+        'max_seconds': ordered_samples[-1],
+        'throughput_per_second': 1 / mean if mean else None,
+        'peak_memory_bytes': peak_memory_bytes,
+    }
+
+
+def measure(name: str, group: str, scale: int, func, repeat: int, max_time: float) -> dict:
+    """
+    Times `repeat` calls to `func`, after one warm-up call, stopping early
+    once `max_time` seconds have been spent (but after at least 3 calls). The
+    peak memory is the peak of the Python allocations, traced in a separate
+    call so that tracing doesn't slow down the timed calls.
+    """
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        func()
+        gc.collect()
+
+        samples = []
+        started = time.perf_counter()
+        while len(samples) < repeat and (len(samples) < 3 or time.perf_counter() - started < max_time):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            func()
+            _, peak_memory_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    result = summarize(name, group, scale, samples, peak_memory_bytes)
+    print(f"{group}/{name} x{scale}: p50 {result['p50_seconds'] * 1000:.2f} ms, {result['samples']} samples", file=sys.stderr)
+    return result
+
+
+def measure_cold_start(name: str, scale: int, mode: str, data_filename: str, repeat: int) -> dict:
+    samples = []
+    peak_memory_bytes = 0
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, '-c', COLD_START_SCRIPT, mode],
+            cwd=BACKEND_LOCATION,
+            env=dict(os.environ, RECIPE_DATA_FILENAME=data_filename, RECIPE_DATA_RELOAD_INTERVAL='0'),
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        output = json.loads(process.stdout.decode('utf-8').strip().splitlines()[-1])
+        samples.append(output['seconds'])
+        peak_memory_bytes = max(peak_memory_bytes, output['peak_memory_bytes'])
+
+    result = summarize(name, 'cold_start', scale, samples, peak_memory_bytes)
+    print(f"cold_start/{name} x{scale}: p50 {result['p50_seconds'] * 1000:.2f} ms", file=sys.stderr)
+    return result
+
+
+def run_pipeline(scraper, recipes_page: str, raw_materials_page: str) -> dict:
+    recipes = scraper.generate_recipe_table_from_recipe_list(scraper.scrape_recipes_from_html_doc(recipes_page))
+    raw_materials = scraper.scrape_raw_materials_from_html_doc(raw_materials_page)
+    scraper.calculate_generated_recipe_properties(recipes)
+    raw_materials = scraper.generate_raw_materials_table(recipes, raw_materials)
+    scraper.calculate_value_of_raw_materials(recipes, raw_materials)
+
+    return {
+        'wiki_base_url': scraper.WIKI_BASE_URL,
+        'utc_datetime': '2020-04-30 00:00:00+00:00',
+        'recipes': recipes,
+        'raw_materials': raw_materials,
+    }
+
+
+def benchmark_pipeline(scraper, scale: int, recipes_page: str, raw_materials_page: str, args) -> list:
+    scraped_recipes = scraper.scrape_recipes_from_html_doc(recipes_page)
+    scraped_raw_materials = scraper.scrape_raw_materials_from_html_doc(raw_materials_page)
+    recipes = scraper.generate_recipe_table_from_recipe_list(scraped_recipes)
+
+    # The generated properties are recalculated from the scraped ones, so
+    # the table can be reused between calls
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        scraper.calculate_generated_recipe_properties(recipes)
+
+    def _measure(name, func):
+        return measure(name, 'pipeline', scale, func, args.repeat, args.max_time)
+
+    return [
+        _measure('scrape_recipes_from_html_doc', lambda: scraper.scrape_recipes_from_html_doc(recipes_page)),
+        _measure('scrape_raw_materials_from_html_doc', lambda: scraper.scrape_raw_materials_from_html_doc(raw_materials_page)),
+        _measure('generate_recipe_table_from_recipe_list', lambda: scraper.generate_recipe_table_from_recipe_list(
+            [dict(recipe) for recipe in scraped_recipes]
+        )),
+        _measure('calculate_generated_recipe_properties', lambda: scraper.calculate_generated_recipe_properties(recipes)),
+        _measure('generate_raw_materials_table', lambda: scraper.generate_raw_materials_table(recipes, scraped_raw_materials)),
+        _measure('full_pipeline', lambda: run_pipeline(scraper, recipes_page, raw_materials_page)),
+    ]
+
+
+def benchmark_queries(graphql_app, scale: int, data, args) -> list:
+    queries = dict(QUERIES)
+    queries['craftable_recipes_large_inventory'] = '{ craftableRecipes(rawMaterials: [%s]) { quantity recipe { id } } }' % ', '.join(
+        f'{{ rawMaterialId: "{raw_material_id}", quantity: 100 }}'
+        for raw_material_id in sorted(data.raw_materials)
+    )
+
+    def _execute(query):
+        # The planner caches its searches per inventory, so every call plans
+        # from scratch, like a request with a new inventory
+        data.planner._hulls.clear()
+        result = graphql_app.schema.execute(query, context_value={'dataset': data})
+        if result.errors:
+            raise RuntimeError(f'Benchmark query failed: {result.errors}')
+
+    return [
+        measure(name, 'query', scale, lambda query=query: _execute(query), args.repeat, args.max_time)
+        for name, query in queries.items()
+    ]
+
+
+def measure_query_group(scale: int, data_filename: str, args) -> list:
+    """
+    Runs `benchmark_queries` in a fresh interpreter, since the peak resident
+    memory of this process is dominated by the pipeline benchmarks. Each
+    query result also records the peak resident memory of that interpreter
+    once the data was loaded, and after all of the queries ran.
+    """
+
+    process = subprocess.run(
+        [
+            sys.executable, '-c', QUERY_GROUP_SCRIPT,
+            BENCHMARKS_LOCATION, str(scale),
+            '--repeat', str(args.repeat), '--max-time', str(args.max_time),
+        ],
+        cwd=BACKEND_LOCATION,
+        env=dict(os.environ, RECIPE_DATA_FILENAME=data_filename),
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    output = json.loads(process.stdout.decode('utf-8').strip().splitlines()[-1])
+
+    print(f"query x{scale}: peak RSS {output['peak_memory_bytes'] / 2 ** 20:.1f} MiB, {output['loaded_memory_bytes'] / 2 ** 20:.1f} MiB once loaded", file=sys.stderr)
+    return [
+        dict(
+            result,
+            group_loaded_rss_bytes=output['loaded_memory_bytes'],
+            group_peak_rss_bytes=output['peak_memory_bytes'],
+        )
+        for result in output['results']
+    ]
+
+
+def benchmark_scale(scraper, recipe_data: dict, scale: int, args) -> list:
+    recipes_page, raw_materials_page = fixtures.html_fixtures(recipe_data, scale)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        scaled_data = run_pipeline(scraper, recipes_page, raw_materials_page)
+
+    results = benchmark_pipeline(scraper, scale, recipes_page, raw_materials_page, args)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_filename = os.path.join(directory, 'diy_recipes.json')
+        compact_filename = os.path.join(directory, 'diy_recipes.bin')
+        with open(json_filename, 'w') as recipe_json:
+            json.dump(scaled_data, recipe_json, indent=2)
+        scraper.write_compact_recipe_data(scaled_data, compact_filename)
+
+        results += measure_query_group(scale, compact_filename, args)
+
+        if args.cold_start_repeat:
+            results += [
+                measure_cold_start('json_load', scale, 'json_load', json_filename, args.cold_start_repeat),
+                measure_cold_start('import_app_json', scale, 'import_app', json_filename, args.cold_start_repeat),
+                measure_cold_start('import_app_compact', scale, 'import_app', compact_filename, args.cold_start_repeat),
+            ]
+
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=fixtures.REPOSITORY_LOCATION,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        ).stdout.decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'utc_datetime': str(datetime.datetime.now(tz=datetime.timezone.utc)),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(previous_report: dict, report: dict):
+    """
+    Prints the change in median latency of each benchmark since a previous
+    report.
+    """
+
+    previous_results = {
+        (result['group'], result['name'], result['scale']): result
+        for result in previous_report['results']
+    }
+
+    for result in report['results']:
+        previous_result = previous_results.get((result['group'], result['name'], result['scale']), None)
+        if previous_result is None:
+            continue
+
+        ratio = result['p50_seconds'] / previous_result['p50_seconds']
+        print(
+            f"{result['group']}/{result['name']} x{result['scale']}: "
+            f"{previous_result['p50_seconds'] * 1000:.2f} ms -> {result['p50_seconds'] * 1000:.2f} ms "
+            f"({(ratio - 1) * 100:+.1f}%)"
+        )
+
+
+def parse_args(args: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the scraper pipeline and the GraphQL API against offline fixtures.",
+    )
+
+    parser.add_argument(
+        '--scales',
+        type=int,
+        nargs='+',
+        default=[1, 10, 100],
+        help="How many times to scale up the recipes of the shipped data.",
+    )
+
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=20,
+        help="Maximum number of timed calls per benchmark.",
+    )
+
+    parser.add_argument(
+        '--max-time',
+        type=float,
+        default=5,
+        help="Seconds after which a benchmark stops taking samples, once it has at least 3.",
+    )
+
+    parser.add_argument(
+        '--cold-start-repeat',
+        type=int,
+        default=3,
+        help="Number of fresh interpreters used to time cold starts. 0 skips the cold start benchmarks.",
+    )
+
+    parser.add_argument(
+        '--output',
+        default='benchmark_report.json',
+        help="Filename of the JSON report.",
+    )
+
+    parser.add_argument(
+        '--compare',
+        help="Filename of a previous JSON report to compare the results with.",
+    )
+
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    scraper = load_scraper()
+    recipe_data = fixtures.load_recipe_data()
+
+    results = []
+    for scale in args.scales:
+        results += benchmark_scale(scraper, recipe_data, scale, args)
+
+    report = {
+        'environment': environment(),
+        'arguments': vars(args),
+        'results': results,
+    }
+
+    with open(args.output, 'w') as report_json:
+        json.dump(report, report_json, indent=2)
+
+    if args.compare:
+        with open(args.compare) as previous_report_json:
+            compare(json.load(previous_report_json), report)
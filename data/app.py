@@ -1,10 +1,22 @@
+import argparse
+import array
+import concurrent.futures
 import datetime
 import collections
+import copy
+import hashlib
 import os
 import json
+import queue
 import re
+import struct
+import sys
+import threading
+import time
 
 import bs4
+import lxml.etree
+import lxml.html
 import selenium.webdriver
 import selenium.webdriver.support.expected_conditions
 
@@ -23,6 +35,30 @@ WIKI_PAGES_DIY_RECIPES = [
 WIKI_PAGE_CRAFTING_MATERIALS = 'https://animalcrossing.fandom.com/wiki/Crafting_materials_(New_Horizons)'
 
 FILE_LOCATION = os.path.dirname(__file__)
+HTML_CACHE_LOCATION = os.path.join(FILE_LOCATION, 'html_cache')
+RECIPE_DATA_FILENAME = os.path.join(FILE_LOCATION, 'diy_recipes.json')
+CHANGE_REPORT_FILENAME = os.path.join(FILE_LOCATION, 'diy_recipes.changes.json')
+COMPACT_RECIPE_DATA_FILENAME = os.path.join(FILE_LOCATION, 'diy_recipes.bin')
+
+# Recipe properties that are scraped from the wiki, as opposed to being
+# calculated from other recipes and raw materials.
+SCRAPED_RECIPE_PROPERTIES = (
+    'name',
+    'id',
+    'uri',
+    'has_page',
+    'image_url',
+    'materials',
+    'source',
+    'sell_price',
+)
+
+GENERATED_RECIPE_PROPERTIES = (
+    'depends_on',
+    'raw_materials',
+    'total_crafting_steps',
+    'value_of_raw_materials',
+)
 
 
 def convert_name_to_id(value: str) -> str:
@@ -46,38 +82,464 @@ def convert_name_to_id(value: str) -> str:
     return value
 
 
-def load_html_page(page: str) -> str:
+def create_browser() -> selenium.webdriver.Firefox:
+    """
+    Starts a new headless Firefox session.
+    """
+
+    options = selenium.webdriver.firefox.options.Options()
+    options.headless = True
+    return selenium.webdriver.Firefox(options=options)
+
+
+def load_html_page(page: str, browser: selenium.webdriver.Firefox = None) -> str:
     """
     Loads a string containing the HTML representation of the requested page.
+    If no `browser` is provided, a new browser session is started for the
+    request and quit afterwards.
     """
 
     print("Downloading:", page)
+    start_time = time.perf_counter()
 
-    options = selenium.webdriver.firefox.options.Options()
-    options.headless = True
-    browser = selenium.webdriver.Firefox(options=options)
-    browser.get(page)
+    if browser is None:
+        browser = create_browser()
+        try:
+            browser.get(page)
+            page_contents = browser.page_source
+        finally:
+            browser.quit()
+    else:
+        browser.get(page)
+        page_contents = browser.page_source
+
+    elapsed = time.perf_counter() - start_time
+    print('Page:', page, 'Source Length:', len(page_contents), f'Time: {elapsed:.2f}s')
+    return page_contents
+
+
+class BrowserPool:
+    """
+    A small pool of long-lived headless browser sessions that can be shared
+    between threads. Browsers are started lazily, up to `size` sessions, and
+    are returned to the pool after each page load so that consecutive page
+    loads don't pay for a browser startup. All sessions are quit when the
+    pool is closed.
+    """
+
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError(f'Browser pool size must be at least 1, got {size}')
+
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._browsers = []
+        self._started = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> selenium.webdriver.Firefox:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            start_new_browser = self._started < self.size
+            if start_new_browser:
+                # Reserve the slot up front, starting a browser is slow.
+                self._started += 1
+
+        if not start_new_browser:
+            return self._idle.get()
+
+        start_time = time.perf_counter()
+        try:
+            browser = create_browser()
+        except:
+            with self._lock:
+                self._started -= 1
+            raise
+
+        with self._lock:
+            self._browsers.append(browser)
+
+        print(f'Started browser session in {time.perf_counter() - start_time:.2f}s')
+        return browser
+
+    def load_html_page(self, page: str) -> str:
+        """
+        Loads a page using one of the pooled browser sessions.
+        """
+
+        browser = self._acquire()
+        try:
+            return load_html_page(page, browser=browser)
+        finally:
+            self._idle.put(browser)
+
+    def close(self):
+        with self._lock:
+            browsers = self._browsers
+            self._browsers = []
+            self._started = 0
+
+        for browser in browsers:
+            browser.quit()
 
-    page_contents = browser.page_source
-    browser.quit()
-    print('Page:', page, 'Source Length:', len(page_contents))
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_html_pages(pages: list, workers: int = 1) -> list:
+    """
+    Loads the HTML representation of each of the requested pages, returning
+    the page contents in the same order as `pages`. Pages are fetched
+    concurrently using a pool of `workers` long-lived browser sessions.
+    """
+
+    start_time = time.perf_counter()
+    workers = max(1, min(workers, len(pages)))
+
+    with BrowserPool(workers) as browser_pool:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            page_contents = list(executor.map(browser_pool.load_html_page, pages))
+
+    elapsed = time.perf_counter() - start_time
+    print(f'Downloaded {len(pages)} pages using {workers} browser session(s) in {elapsed:.2f}s')
     return page_contents
 
 
-def scrape_recipes_from_html_doc(page_contents: str) -> list:
+class HtmlSnapshotCache:
+    """
+    A content-addressed, on-disk cache of downloaded HTML pages. The contents
+    of each page are stored in a file named after the SHA-256 hash of the
+    contents, and a manifest maps each URL to the hash of its latest snapshot
+    and the time that the snapshot was downloaded.
+
+    Snapshots that are no longer referenced by the manifest, either because
+    the page was downloaded again or because the URL is no longer scraped,
+    are evicted when the manifest is saved.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.snapshot_directory = os.path.join(directory, 'snapshots')
+        self.manifest_filename = os.path.join(directory, 'manifest.json')
+
+        try:
+            with open(self.manifest_filename) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            self.manifest = {}
+
+    def _snapshot_filename(self, sha256: str) -> str:
+        return os.path.join(self.snapshot_directory, f'{sha256}.html')
+
+    def age(self, url: str) -> float:
+        """
+        Returns the age of the URL's snapshot in seconds, or None if the URL
+        has not been cached.
+        """
+
+        entry = self.manifest.get(url, None)
+        if not entry or not os.path.exists(self._snapshot_filename(entry['sha256'])):
+            return None
+
+        return time.time() - entry['timestamp']
+
+    def is_fresh(self, url: str, max_age: float) -> bool:
+        """
+        Returns True if the URL has a snapshot that is no older than `max_age`
+        seconds.
+        """
+
+        age = self.age(url)
+        return age is not None and age <= max_age
+
+    def get(self, url: str) -> str:
+        """
+        Returns the contents of the latest snapshot of the URL, or None if the
+        URL has not been cached.
+        """
+
+        entry = self.manifest.get(url, None)
+        if not entry:
+            return None
+
+        try:
+            with open(self._snapshot_filename(entry['sha256']), encoding='utf-8') as snapshot_file:
+                return snapshot_file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, url: str, page_contents: str):
+        """
+        Stores a new snapshot of the URL.
+        """
+
+        encoded_contents = page_contents.encode('utf-8')
+        sha256 = hashlib.sha256(encoded_contents).hexdigest()
+        snapshot_filename = self._snapshot_filename(sha256)
+
+        if not os.path.exists(snapshot_filename):
+            os.makedirs(self.snapshot_directory, exist_ok=True)
+            temp_filename = f'{snapshot_filename}.tmp'
+            with open(temp_filename, 'wb') as snapshot_file:
+                snapshot_file.write(encoded_contents)
+            os.replace(temp_filename, snapshot_filename)
+
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        self.manifest[url] = {
+            'sha256': sha256,
+            'length': len(encoded_contents),
+            'utc_datetime': str(now),
+            'timestamp': now.timestamp(),
+        }
+
+    def save(self, urls: list = None):
+        """
+        Writes the manifest to disk and evicts any snapshots that are no
+        longer referenced by it. If `urls` is provided, manifest entries for
+        any other URLs are evicted as well.
+        """
+
+        if urls is not None:
+            self.manifest = {
+                url: entry
+                for url, entry in self.manifest.items()
+                if url in urls
+            }
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_filename = f'{self.manifest_filename}.tmp'
+        with open(temp_filename, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2)
+        os.replace(temp_filename, self.manifest_filename)
+
+        referenced_snapshots = {
+            f"{entry['sha256']}.html"
+            for entry in self.manifest.values()
+        }
+
+        if os.path.isdir(self.snapshot_directory):
+            for snapshot_filename in os.listdir(self.snapshot_directory):
+                if snapshot_filename not in referenced_snapshots:
+                    print('Evicting cached snapshot:', snapshot_filename)
+                    os.remove(os.path.join(self.snapshot_directory, snapshot_filename))
+
+
+def load_html_pages_with_cache(
+    pages: list,
+    cache: HtmlSnapshotCache,
+    max_age: float,
+    offline: bool = False,
+    workers: int = 1,
+) -> list:
+    """
+    Loads the HTML representation of each of the requested pages, returning
+    the page contents in the same order as `pages`. Pages that have a cached
+    snapshot that is no older than `max_age` seconds are loaded from the
+    cache. All other pages are downloaded and cached, unless `offline` is set,
+    in which case every page must already have a snapshot (of any age).
+    """
+
+    if offline:
+        missing_pages = [page for page in pages if cache.age(page) is None]
+        if missing_pages:
+            raise RuntimeError(
+                'Cannot run offline, no cached snapshot for: ' +
+                ', '.join(missing_pages)
+            )
+
+        stale_pages = []
+    else:
+        stale_pages = [page for page in pages if not cache.is_fresh(page, max_age)]
+
+    for page in pages:
+        if page not in stale_pages:
+            print(f'Using cached snapshot ({cache.age(page):.0f}s old):', page)
+
+    if stale_pages:
+        for page, page_contents in zip(stale_pages, load_html_pages(stale_pages, workers=workers)):
+            cache.put(page, page_contents)
+
+    cache.save(pages)
+    return [cache.get(page) for page in pages]
+
+
+class Bs4ParserEngine:
+    """
+    Parses pages into a BeautifulSoup tree using Python's built-in HTML
+    parser, selecting nodes with CSS selectors.
+    """
+
+    name = 'bs4'
+
+    @staticmethod
+    def recipe_rows(page_contents: str) -> list:
+        soup = bs4.BeautifulSoup(page_contents, 'html.parser')
+        return soup.select('.article-table tbody tr')
+
+    @staticmethod
+    def raw_material_rows(page_contents: str) -> list:
+        soup = bs4.BeautifulSoup(page_contents, 'html.parser')
+        return soup.select('table.roundy.mw-collapsible.mw-made-collapsible tbody tr')
+
+    @staticmethod
+    def cells(row) -> list:
+        return row.select('td')
+
+    @staticmethod
+    def has_header_cells(row) -> bool:
+        return bool(row.select('th'))
+
+    @staticmethod
+    def text(node) -> str:
+        return node.text
+
+    @staticmethod
+    def first_link(node):
+        return node.find('a')
+
+    @staticmethod
+    def link_classes(link) -> list:
+        return link.attrs.get('class', [])
+
+    @staticmethod
+    def link_href(link) -> str:
+        return link.attrs.get('href', None)
+
+    @staticmethod
+    def material_links(cell) -> list:
+        return cell.select('a:not(.image)')
+
+    @staticmethod
+    def previous_string(node) -> str:
+        """
+        Returns the closest string that precedes the node within its parent,
+        or None if there isn't one.
+        """
+
+        current_node = node
+        while current_node and not isinstance(current_node, str):
+            current_node = current_node.previous_sibling
+
+        return current_node
+
+
+def _xpath_class_predicate(*class_names: str) -> str:
+    return ' and '.join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+        for class_name in class_names
+    )
+
+
+class LxmlParserEngine:
+    """
+    Parses pages using lxml and walks only the rows of the relevant tables
+    using precompiled XPath expressions. Produces the same results as the
+    `Bs4ParserEngine`, roughly an order of magnitude faster.
+    """
+
+    name = 'lxml'
+
+    _recipe_rows = lxml.etree.XPath(
+        f"//*[{_xpath_class_predicate('article-table')}]//tbody//tr"
+    )
+    _raw_material_rows = lxml.etree.XPath(
+        f"//table[{_xpath_class_predicate('roundy', 'mw-collapsible', 'mw-made-collapsible')}]//tbody//tr"
+    )
+    _cells = lxml.etree.XPath('.//td')
+    _header_cells = lxml.etree.XPath('.//th')
+    _material_links = lxml.etree.XPath(f".//a[not({_xpath_class_predicate('image')})]")
+
+    @classmethod
+    def recipe_rows(cls, page_contents: str) -> list:
+        return cls._recipe_rows(lxml.html.document_fromstring(page_contents))
+
+    @classmethod
+    def raw_material_rows(cls, page_contents: str) -> list:
+        return cls._raw_material_rows(lxml.html.document_fromstring(page_contents))
+
+    @classmethod
+    def cells(cls, row) -> list:
+        return cls._cells(row)
+
+    @classmethod
+    def has_header_cells(cls, row) -> bool:
+        return bool(cls._header_cells(row))
+
+    @staticmethod
+    def text(node) -> str:
+        return node.text_content()
+
+    @staticmethod
+    def first_link(node):
+        return node.find('.//a')
+
+    @staticmethod
+    def link_classes(link) -> list:
+        return link.get('class', '').split()
+
+    @staticmethod
+    def link_href(link) -> str:
+        return link.get('href', None)
+
+    @staticmethod
+    def material_links(cell) -> list:
+        return LxmlParserEngine._material_links(cell)
+
+    @staticmethod
+    def previous_string(node) -> str:
+        """
+        Returns the closest string that precedes the node within its parent,
+        or None if there isn't one. lxml stores the text that follows an
+        element in the element's "tail", and the text that precedes an
+        element's first child in the parent's "text".
+        """
+
+        current_node = node
+        while True:
+            previous_node = current_node.getprevious()
+            if previous_node is None:
+                return current_node.getparent().text
+
+            if previous_node.tail is not None:
+                return previous_node.tail
+
+            # BeautifulSoup treats comments as strings
+            if previous_node.tag is lxml.etree.Comment:
+                return previous_node.text
+
+            current_node = previous_node
+
+
+PARSER_ENGINES = {
+    engine.name: engine
+    for engine in (Bs4ParserEngine, LxmlParserEngine)
+}
+
+DEFAULT_PARSER_ENGINE = LxmlParserEngine.name
+
+
+def scrape_recipes_from_html_doc(page_contents: str, parser: str = DEFAULT_PARSER_ENGINE) -> list:
     """
     Converts the diy_recipes.html document to a list of dicts that represent
-    that data from those recipes.
+    that data from those recipes. `parser` is the name of one of the
+    `PARSER_ENGINES`, all of which produce the same results.
     """
 
+    engine = PARSER_ENGINES[parser]
     recipes = []
-    soup = bs4.BeautifulSoup(page_contents, 'html.parser')
-    table_tr_collection = soup.select('.article-table tbody tr')
+    table_tr_collection = engine.recipe_rows(page_contents)
     for recipe_tr in table_tr_collection:
         recipe = {}
         recipes.append(recipe)
 
-        cells = recipe_tr.select('td')
+        cells = engine.cells(recipe_tr)
 
         recipe_name_cell = cells[0]
         recipe_image_cell = cells[1]
@@ -92,7 +554,7 @@ def scrape_recipes_from_html_doc(page_contents: str) -> list:
             recipe_source_cell = cells[3]
             recipe_sell_price_cell = cells[4]
 
-        recipe_name = recipe_name_cell.text.strip()
+        recipe_name = engine.text(recipe_name_cell).strip()
         recipe['name'] = recipe_name
         recipe['id'] = convert_name_to_id(recipe['name'])
 
@@ -106,44 +568,42 @@ def scrape_recipes_from_html_doc(page_contents: str) -> list:
         except:
             recipe_sell_price_multiplication_factor = 1
 
-        recipe_name_a = recipe_name_cell.find('a')
+        recipe_name_a = engine.first_link(recipe_name_cell)
 
         # Will be used to determine if the recipe has a valid URL (<a> will have a
         # "class" of "new")
         recipe_url_class = (
-            recipe_name_a.attrs.get('class', [])
-            if recipe_name_a else
+            engine.link_classes(recipe_name_a)
+            if recipe_name_a is not None else
             []
         )
 
         recipe['uri'] = (
-            recipe_name_a.attrs.get('href', None)
-            if recipe_name_a else
+            engine.link_href(recipe_name_a)
+            if recipe_name_a is not None else
             None
         )
 
         recipe['has_page'] = bool(recipe['uri']) and ('new' not in recipe_url_class)
 
-        recipe_image_a = recipe_image_cell.find('a')
+        recipe_image_a = engine.first_link(recipe_image_cell)
         recipe['image_url'] = (
-            recipe_image_a.attrs.get('href', None)
-            if recipe_image_a else
+            engine.link_href(recipe_image_a)
+            if recipe_image_a is not None else
             None
         )
 
         materials = recipe.setdefault('materials', [])
 
-        recipe_materials_a = recipe_materials_cell.select('a:not(.image)')
+        recipe_materials_a = engine.material_links(recipe_materials_cell)
         for material_a in recipe_materials_a:
             material = {}
             materials.append(material)
-            material['name'] = material_a.text.strip()
+            material['name'] = engine.text(material_a).strip()
             material['id'] = convert_name_to_id(material['name'])
-            material['uri'] = material_a.attrs.get('href', None)
+            material['uri'] = engine.link_href(material_a)
 
-            current_node = material_a
-            while current_node and not isinstance(current_node, str):
-                current_node = current_node.previous_sibling
+            current_node = engine.previous_string(material_a)
 
             try:
                 material['quantity'] = int(re.sub(r'[^\d]', '', current_node))
@@ -151,9 +611,9 @@ def scrape_recipes_from_html_doc(page_contents: str) -> list:
                 print(f'WARNING: Issue occurred while scraping quantity of {material} for {recipe}')
                 material['quantity'] = 1
 
-        recipe['source'] = recipe_source_cell.text.strip()
+        recipe['source'] = engine.text(recipe_source_cell).strip()
 
-        sell_price = recipe_sell_price_cell.text.strip()
+        sell_price = engine.text(recipe_sell_price_cell).strip()
         try:
             recipe_sell_price = int(re.sub(r'[^\d]', '', sell_price))
         except:
@@ -170,25 +630,26 @@ def scrape_recipes_from_html_doc(page_contents: str) -> list:
     return recipes
 
 
-def scrape_raw_materials_from_html_doc(page_contents: str) -> list:
+def scrape_raw_materials_from_html_doc(page_contents: str, parser: str = DEFAULT_PARSER_ENGINE) -> list:
     """
     Converts the crafting_materials.html document to a list of dicts that represent
-    that data for those raw materials.
+    that data for those raw materials. `parser` is the name of one of the
+    `PARSER_ENGINES`, all of which produce the same results.
     """
+    engine = PARSER_ENGINES[parser]
     raw_materials = []
-    soup = bs4.BeautifulSoup(page_contents, 'html.parser')
-    table_tr_collection = soup.select('table.roundy.mw-collapsible.mw-made-collapsible tbody tr')
+    table_tr_collection = engine.raw_material_rows(page_contents)
     for raw_material_tr in table_tr_collection:
-        if raw_material_tr.select('th'):
+        if engine.has_header_cells(raw_material_tr):
             continue
 
-        if not raw_material_tr.text.strip():
+        if not engine.text(raw_material_tr).strip():
             continue
 
         raw_material = {}
         raw_materials.append(raw_material)
 
-        cells = raw_material_tr.select('td')
+        cells = engine.cells(raw_material_tr)
 
         name_cell = cells[0]
         image_cell = cells[1]
@@ -205,44 +666,44 @@ def scrape_raw_materials_from_html_doc(page_contents: str) -> list:
             None
         )
 
-        material_name = name_cell.text.strip()
+        material_name = engine.text(name_cell).strip()
         raw_material['name'] = material_name
         raw_material['id'] = convert_name_to_id(material_name)
 
-        name_a = name_cell.find('a')
+        name_a = engine.first_link(name_cell)
 
         # Will be used to determine if the recipe has a valid URL (<a> will have a
         # "class" of "new")
         url_class = (
-            name_a.attrs.get('class', [])
-            if name_a else
+            engine.link_classes(name_a)
+            if name_a is not None else
             []
         )
 
         raw_material['uri'] = (
-            name_a.attrs.get('href', None)
-            if name_a else
+            engine.link_href(name_a)
+            if name_a is not None else
             None
         )
 
         raw_material['has_page'] = bool(raw_material['uri']) and ('new' not in url_class)
 
-        image_a = image_cell.find('a')
+        image_a = engine.first_link(image_cell)
 
         raw_material['image_url'] = (
-            image_a.attrs.get('href', None)
-            if image_a else
+            engine.link_href(image_a)
+            if image_a is not None else
             None
         )
 
         raw_material['source'] = (
-            source_cell.text.strip()
-            if source_cell else
+            engine.text(source_cell).strip()
+            if source_cell is not None else
             None
         )
 
-        if sell_price_cell:
-            sell_price = sell_price_cell.text.strip()
+        if sell_price_cell is not None:
+            sell_price = engine.text(sell_price_cell).strip()
 
             try:
                 raw_material['sell_price'] = int(re.sub(r'[^\d]', '', sell_price))
@@ -300,7 +761,134 @@ def generate_recipe_table_from_recipe_list(recipes: list) -> dict:
     return recipe_id_map
 
 
-def calculate_generated_recipe_properties(recipes: dict) -> dict:
+def build_recipe_dependency_graph(recipes: dict) -> dict:
+    """
+    Builds the graph of dependencies between recipes from each recipe's
+    materials, mapping each recipe ID to the IDs of the recipes that it uses
+    directly as materials.
+    """
+
+    return {
+        recipe_id: list(dict.fromkeys(
+            material['id']
+            for material in recipe['materials']
+            if material['id'] in recipes
+        ))
+        for recipe_id, recipe in recipes.items()
+    }
+
+
+class CircularRecipeDependencyError(ValueError):
+    """
+    Raised when recipes depend on each other in a cycle.
+    """
+
+    def __init__(self, recipe_ids: list):
+        super().__init__('Circular dependencies between recipes: ' + ', '.join(recipe_ids))
+        self.recipe_ids = recipe_ids
+
+
+def topologically_sort_recipes(dependency_graph: dict) -> list:
+    """
+    Orders the recipe IDs in the dependency graph so that every recipe comes
+    after all of the recipes that it depends on. Raises a
+    CircularRecipeDependencyError that lists the offending recipe IDs if the
+    recipes have circular dependencies.
+    """
+
+    remaining_dependencies = {
+        recipe_id: len(dependencies)
+        for recipe_id, dependencies in dependency_graph.items()
+    }
+
+    dependents = collections.defaultdict(list)
+    for recipe_id, dependencies in dependency_graph.items():
+        for dependency_id in dependencies:
+            dependents[dependency_id].append(recipe_id)
+
+    ready = collections.deque(
+        recipe_id
+        for recipe_id, count in remaining_dependencies.items()
+        if count == 0
+    )
+
+    order = []
+    while ready:
+        recipe_id = ready.popleft()
+        order.append(recipe_id)
+        for dependent_id in dependents[recipe_id]:
+            remaining_dependencies[dependent_id] -= 1
+            if remaining_dependencies[dependent_id] == 0:
+                ready.append(dependent_id)
+
+    if len(order) < len(dependency_graph):
+        raise CircularRecipeDependencyError(
+            _find_recipes_in_cycles(dependency_graph, set(order))
+        )
+
+    return order
+
+
+def _find_recipes_in_cycles(dependency_graph: dict, sorted_recipe_ids: set) -> list:
+    """
+    Narrows the recipes that could not be topologically sorted down to the
+    recipes that are part of a cycle, by discarding recipes that merely depend
+    on a cycle.
+    """
+
+    unsorted = {
+        recipe_id
+        for recipe_id in dependency_graph
+        if recipe_id not in sorted_recipe_ids
+    }
+
+    while True:
+        dependencies_of_unsorted = {
+            dependency_id
+            for recipe_id in unsorted
+            for dependency_id in dependency_graph[recipe_id]
+        }
+
+        in_cycles = unsorted & dependencies_of_unsorted
+        if in_cycles == unsorted:
+            return sorted(unsorted)
+
+        unsorted = in_cycles
+
+
+def _reachable_recipes(dependency_graph: dict, recipe_id: str) -> set:
+    """
+    Returns the IDs of the recipes that a recipe uses as materials, directly
+    or through the recipes that it uses, which include the recipe itself if
+    it's part of a cycle.
+    """
+
+    reachable = set()
+    pending = list(dependency_graph[recipe_id])
+    while pending:
+        dependency_id = pending.pop()
+        if dependency_id not in reachable:
+            reachable.add(dependency_id)
+            pending.extend(dependency_graph[dependency_id])
+
+    return reachable
+
+
+def _add_raw_material(raw_materials: dict, material: dict, quantity: int = 1):
+    raw_material = raw_materials.setdefault(
+        material['id'],
+        {
+            'name': material['name'],
+            'id': material['id'],
+            'uri': material['uri'],
+            'quantity': 0,
+        }
+    )
+
+    raw_material['quantity'] += quantity * material['quantity']
+
+
+def calculate_generated_recipe_properties(recipes: dict, recipe_ids: set = None) -> dict:
     """
     Performs in-place operations on the recipes table, modifying and returning
     the input recipes dict, generating properties that hold calculated fields,
@@ -310,58 +898,77 @@ def calculate_generated_recipe_properties(recipes: dict) -> dict:
     - The total number of crafting steps required for each recipe.
     - A list of the recipes that each recipe depends on, which includes each
       recipe itself.
+
+    Recipes are processed in topological order, so each recipe's properties
+    are calculated exactly once, after the properties of every recipe that it
+    depends on. Some recipes can be crafted from each other (e.g. document
+    stack <-> scattered papers). The recipes in such a cycle depend on each
+    other, but the materials that complete the cycle are neither crafted nor
+    raw materials, so they're left out of the raw materials and crafting
+    steps, and the value of the raw materials is unknown (see
+    `calculate_value_of_raw_materials`).
+
+    If `recipe_ids` is provided, only those recipes are recalculated. All
+    other recipes must already have their generated properties.
     """
-    adjusted_recipes = set()
-    def adjust_recipe(recipe: dict):
-        """
-        Recursive method that applies the generated properties to the input
-        recipe as well as the recipes that it depends on.
-        """
 
-        if recipe['id'] in adjusted_recipes:
-            return
+    dependency_graph = build_recipe_dependency_graph(recipes)
+    cycle_dependencies = {}
 
-        adjusted_recipes.add(recipe['id'])
+    try:
+        recipe_order = topologically_sort_recipes(dependency_graph)
+    except CircularRecipeDependencyError as error:
+        print(f"WARNING: {error}. The materials that complete the cycles are left out of these recipes' raw materials.")
 
-        depends_on = recipe.setdefault('depends_on', {recipe['id']})
-        raw_materials = recipe.setdefault('raw_materials', {})
+        cycle_dependencies = {
+            recipe_id: _reachable_recipes(dependency_graph, recipe_id)
+            for recipe_id in error.recipe_ids
+        }
 
-        def _add_raw_material(material: dict, quantity: int = 1):
-            raw_material = raw_materials.setdefault(
-                material['id'],
-                {
-                    'name': material['name'],
-                    'id': material['id'],
-                    'uri': material['uri'],
-                    'quantity': 0,
-                }
-            )
+        # Dependencies on a recipe that leads back to the recipe complete a
+        # cycle, and the graph is acyclic without them
+        dependency_graph = {
+            recipe_id: [
+                dependency_id
+                for dependency_id in dependencies
+                if recipe_id not in cycle_dependencies.get(dependency_id, ())
+            ]
+            for recipe_id, dependencies in dependency_graph.items()
+        }
 
-            raw_material['quantity'] += quantity * material['quantity']
+        recipe_order = topologically_sort_recipes(dependency_graph)
 
-        for material in recipe['materials']:
-            depends_on_recipe = recipes.get(material['id'], None)
-            if depends_on_recipe:
-                adjust_recipe(depends_on_recipe)
+    for recipe_id in recipe_order:
+        if recipe_ids is not None and recipe_id not in recipe_ids:
+            continue
 
-                for do in depends_on_recipe['depends_on']:
-                    depends_on.add(do)
+        recipe = recipes[recipe_id]
+        dependencies = dependency_graph[recipe_id]
 
-                recipe['total_crafting_steps'] += (
+        depends_on = {recipe_id} | cycle_dependencies.get(recipe_id, set())
+        raw_materials = {}
+        total_crafting_steps = 1
+
+        for material in recipe['materials']:
+            if material['id'] in dependencies:
+                depends_on_recipe = recipes[material['id']]
+                depends_on.update(depends_on_recipe['depends_on'])
+
+                total_crafting_steps += (
                     material['quantity'] *
                     depends_on_recipe['total_crafting_steps']
                 )
 
-                for _, raw_material in depends_on_recipe['raw_materials'].items():
-                    _add_raw_material(raw_material, material['quantity'])
+                for raw_material in depends_on_recipe['raw_materials'].values():
+                    _add_raw_material(raw_materials, raw_material, material['quantity'])
 
-            else:
-                _add_raw_material(material)
+            # Materials that complete a cycle are skipped
+            elif material['id'] not in recipes:
+                _add_raw_material(raw_materials, material)
 
-        recipe['depends_on'] = sorted(list(recipe['depends_on']))
-
-    for _, recipe in recipes.items():
-        adjust_recipe(recipe)
+        recipe['depends_on'] = sorted(depends_on)
+        recipe['raw_materials'] = raw_materials
+        recipe['total_crafting_steps'] = total_crafting_steps
 
     return recipes
 
@@ -425,14 +1032,30 @@ def generate_raw_materials_table(recipes: dict, raw_materials: list) -> dict:
     return raw_materials
 
 
-def calculate_value_of_raw_materials(recipes: dict, raw_materials: dict):
+def calculate_value_of_raw_materials(recipes: dict, raw_materials: dict, recipe_ids: set = None):
     """
     Calculates the value of the raw materials that comprise each recipe if the
     player were to sell the raw materials instead of crafting the recipe and
-    selling the result.
+    selling the result. If `recipe_ids` is provided, only those recipes are
+    recalculated.
+
+    The value is unknown if a raw material has no sell price, or if the
+    recipe or a recipe that it depends on is crafted from a recipe that
+    depends on it in turn, since the materials that complete such cycles
+    aren't counted (see `calculate_generated_recipe_properties`).
     """
 
+    def _completes_cycle(recipe_id: str, material_id: str) -> bool:
+        return material_id in recipes and recipe_id in recipes[material_id]['depends_on']
+
     def _calculate_value_of_raw_materials(recipe: dict) -> int:
+        if any(
+            _completes_cycle(depends_on_id, material['id'])
+            for depends_on_id in recipe['depends_on']
+            for material in recipes[depends_on_id]['materials']
+        ):
+            return None
+
         value_of_raw = 0
         for rm_id, rm_ref in recipe['raw_materials'].items():
             raw_material = raw_materials[rm_id]
@@ -441,26 +1064,469 @@ def calculate_value_of_raw_materials(recipes: dict, raw_materials: dict):
             value_of_raw += (rm_ref['quantity'] * raw_material['sell_price'])
         return value_of_raw
 
+    for recipe_id, recipe in recipes.items():
+        if recipe_ids is None or recipe_id in recipe_ids:
+            recipe['value_of_raw_materials'] = _calculate_value_of_raw_materials(recipe)
+
+
+def diff_tables(previous_table: dict, table: dict, properties: tuple = None) -> dict:
+    """
+    Compares two versions of a recipe or raw material table, returning the
+    sorted IDs of the entries that were added, removed, and modified. If
+    `properties` is provided, only those properties are compared.
+    """
+
+    def _differs(previous_entry: dict, entry: dict) -> bool:
+        if properties is None:
+            return previous_entry != entry
+
+        return any(
+            previous_entry.get(property_name, None) != entry.get(property_name, None)
+            for property_name in properties
+        )
+
+    return {
+        'added': sorted(_id for _id in table if _id not in previous_table),
+        'removed': sorted(_id for _id in previous_table if _id not in table),
+        'modified': sorted(
+            _id for _id, entry in table.items()
+            if _id in previous_table and _differs(previous_table[_id], entry)
+        ),
+    }
+
+
+def find_recipes_to_recalculate(recipes: dict, recipe_changes: dict) -> set:
+    """
+    Determines which recipes need their generated properties recalculated
+    after the changes described by `recipe_changes` (see `diff_tables`):
+    recipes that were added or modified, recipes that use an added or removed
+    recipe as a material, and every recipe that depends on any of those.
+    """
+
+    added_or_removed = set(recipe_changes['added']) | set(recipe_changes['removed'])
+    to_recalculate = set(recipe_changes['added']) | set(recipe_changes['modified'])
+
+    dependents = collections.defaultdict(set)
+    for recipe_id, recipe in recipes.items():
+        for material in recipe['materials']:
+            dependents[material['id']].add(recipe_id)
+            if material['id'] in added_or_removed:
+                to_recalculate.add(recipe_id)
+
+    pending = list(to_recalculate)
+    while pending:
+        for dependent_id in dependents[pending.pop()]:
+            if dependent_id not in to_recalculate:
+                to_recalculate.add(dependent_id)
+                pending.append(dependent_id)
+
+    return to_recalculate
+
+
+def update_raw_materials_table(
+    previous_raw_materials: dict,
+    recipes: dict,
+    raw_materials: list,
+    recipe_ids: set,
+) -> dict:
+    """
+    Patches the previous raw materials table instead of generating it from
+    scratch (see `generate_raw_materials_table`). `raw_materials` is the list
+    of freshly scraped raw materials and `recipe_ids` are the recipes that
+    were recalculated. Only the recalculated recipes are unpacked, the
+    `used_in` references of all other recipes are carried over.
+    """
+
+    scraped_raw_materials = generate_raw_materials_table({}, raw_materials)
+
+    raw_materials = {}
+
+    for raw_material_id, previous_raw_material in previous_raw_materials.items():
+        used_in = [
+            recipe_id
+            for recipe_id in previous_raw_material['used_in']
+            if recipe_id in recipes and recipe_id not in recipe_ids
+        ]
+
+        raw_material = scraped_raw_materials.get(raw_material_id, None)
+        if raw_material:
+            if used_in and not raw_material['uri']:
+                raw_material['uri'] = previous_raw_material['uri']
+            raw_material['used_in'] = used_in
+        elif used_in:
+            raw_materials[raw_material_id] = dict(previous_raw_material, used_in=used_in)
+
+    for raw_material_id, raw_material in scraped_raw_materials.items():
+        raw_materials.setdefault(raw_material_id, raw_material)
+
+    recalculated_recipes = {
+        recipe_id: recipe
+        for recipe_id, recipe in recipes.items()
+        if recipe_id in recipe_ids
+    }
+
+    for raw_material_id, raw_material in generate_raw_materials_table(recalculated_recipes, []).items():
+        existing_raw_material = raw_materials.get(raw_material_id, None)
+        if existing_raw_material:
+            if raw_material['uri'] and not existing_raw_material['uri']:
+                existing_raw_material['uri'] = raw_material['uri']
+            existing_raw_material['used_in'] = sorted(existing_raw_material['used_in'] + raw_material['used_in'])
+        else:
+            raw_materials[raw_material_id] = raw_material
+
+    # Match the ordering of generate_raw_materials_table, scraped raw
+    # materials first, followed by the order that recipes use them in, and
+    # keep the recipes' raw material references in sync with the table.
+    ordered_ids = list(scraped_raw_materials)
     for recipe in recipes.values():
-        recipe['value_of_raw_materials'] = _calculate_value_of_raw_materials(recipe)
+        for raw_material_id, raw_material_ref in recipe['raw_materials'].items():
+            raw_material_ref['uri'] = raw_materials[raw_material_id]['uri']
+            ordered_ids.append(raw_material_id)
+
+    return {
+        raw_material_id: raw_materials[raw_material_id]
+        for raw_material_id in dict.fromkeys(ordered_ids)
+    }
+
+
+def rebuild_recipe_data_incrementally(previous_data: dict, recipes: dict, raw_materials: list) -> tuple:
+    """
+    Rebuilds the recipe and raw material tables, reusing the generated
+    properties from `previous_data` (the contents of the previous
+    diy_recipes.json) for every recipe that isn't affected by the changes
+    since the previous scrape. `recipes` is the freshly scraped recipe table
+    and `raw_materials` is the freshly scraped list of raw materials.
+
+    Returns the new recipe table, the new raw materials table, and the set of
+    recipe IDs that were recalculated.
+    """
+
+    scraped_raw_material_ids = {raw_material['id'] for raw_material in raw_materials}
+    for raw_material_id, previous_raw_material in previous_data['raw_materials'].items():
+        # Only scraped raw materials have images. If one is no longer listed
+        # on the crafting materials page, its entry and every reference to it
+        # have to be inferred from the recipes again.
+        if previous_raw_material['image_url'] and raw_material_id not in scraped_raw_material_ids:
+            print(f'Raw material "{raw_material_id}" is no longer listed, recalculating all recipes.')
+            calculate_generated_recipe_properties(recipes)
+            raw_materials = generate_raw_materials_table(recipes, raw_materials)
+            calculate_value_of_raw_materials(recipes, raw_materials)
+            return recipes, raw_materials, set(recipes)
+
+    previous_recipes = previous_data['recipes']
+    recipe_changes = diff_tables(previous_recipes, recipes, SCRAPED_RECIPE_PROPERTIES)
+    recipe_ids = find_recipes_to_recalculate(recipes, recipe_changes)
+
+    for recipe_id, recipe in recipes.items():
+        if recipe_id not in recipe_ids:
+            for property_name in GENERATED_RECIPE_PROPERTIES:
+                recipe[property_name] = copy.deepcopy(previous_recipes[recipe_id][property_name])
+
+    calculate_generated_recipe_properties(recipes, recipe_ids)
+
+    raw_materials = update_raw_materials_table(
+        previous_data['raw_materials'],
+        recipes,
+        raw_materials,
+        recipe_ids,
+    )
+
+    raw_material_changes = diff_tables(
+        previous_data['raw_materials'],
+        raw_materials,
+        ('sell_price',),
+    )
+
+    for raw_material_id in raw_material_changes['added'] + raw_material_changes['modified']:
+        recipe_ids.update(raw_materials[raw_material_id]['used_in'])
+
+    calculate_value_of_raw_materials(recipes, raw_materials, recipe_ids)
+
+    return recipes, raw_materials, recipe_ids
+
+
+def generate_change_report(previous_data: dict, data: dict, recalculated_recipe_ids: set) -> dict:
+    """
+    Summarizes the differences between two versions of the recipe data.
+    """
+
+    recipe_changes = diff_tables(previous_data['recipes'], data['recipes'])
+    recipe_changes['recalculated'] = sorted(recalculated_recipe_ids)
+
+    return {
+        'previous_utc_datetime': previous_data['utc_datetime'],
+        'utc_datetime': data['utc_datetime'],
+        'recipes': recipe_changes,
+        'raw_materials': diff_tables(previous_data['raw_materials'], data['raw_materials']),
+    }
+
+
+COMPACT_DATA_MAGIC = b'ACRD'
+COMPACT_DATA_VERSION = 3
+
+# Integers that are None are stored as the smallest 32-bit integer, and string
+# references that are None are stored as -1.
+COMPACT_DATA_NONE = -2 ** 31
+
+# The sections of the compact data file, in order. Sections prefixed with
+# "recipe_" and "raw_material_" are columns of the recipe and raw material
+# tables. The materials, raw material requirements (a sparse recipe x raw
+# material quantity matrix), and depends_on lists of the recipes, as well as
+# the used_in lists of the raw materials, are stored in compressed sparse row
+# form: the entries for row `i` are at `[*_offsets[i], *_offsets[i + 1])`.
+# Every string is followed by a NUL separator.
+COMPACT_DATA_SECTIONS = (
+    ('strings', 'B'),
+    ('recipe_id', 'i'),
+    ('recipe_name', 'i'),
+    ('recipe_uri', 'i'),
+    ('recipe_has_page', 'b'),
+    ('recipe_image_url', 'i'),
+    ('recipe_source', 'i'),
+    ('recipe_sell_price', 'i'),
+    ('recipe_total_crafting_steps', 'i'),
+    ('recipe_value_of_raw_materials', 'i'),
+    ('material_offsets', 'i'),
+    ('material_id', 'i'),
+    ('material_name', 'i'),
+    ('material_uri', 'i'),
+    ('material_quantity', 'i'),
+    ('requirement_offsets', 'i'),
+    ('requirement_raw_material', 'i'),
+    ('requirement_quantity', 'i'),
+    ('requirement_name', 'i'),
+    ('requirement_uri', 'i'),
+    ('depends_on_offsets', 'i'),
+    ('depends_on_recipe', 'i'),
+    ('raw_material_id', 'i'),
+    ('raw_material_name', 'i'),
+    ('raw_material_uri', 'i'),
+    ('raw_material_image_url', 'i'),
+    ('raw_material_sell_price', 'i'),
+    ('used_in_offsets', 'i'),
+    ('used_in_recipe', 'i'),
+)
+
+
+def write_compact_recipe_data(data: dict, filename: str):
+    """
+    Writes the recipe data to a compact, columnar binary file that the GraphQL
+    backend can load instead of diy_recipes.json. Every string is stored once
+    in a string table (NUL-separated UTF-8) and referenced by index, and
+    recipes and raw materials reference each other by their position in their
+    tables, so none of the expanded `raw_materials` and `depends_on` lists
+    repeat any names or IDs, see COMPACT_DATA_SECTIONS.
+
+    The file starts with the magic bytes, the format version and the length
+    of a JSON header (little-endian uint32s), followed by the header itself.
+    The header holds the dataset metadata and the offset (relative to the
+    end of the header), typecode and length of each section. Sections are
+    little-endian arrays, aligned to 8 bytes.
+    """
+
+    strings = {}
+
+    def _string(value: str) -> int:
+        if value is None:
+            return -1
+
+        if '\0' in value:
+            raise ValueError(f'Strings cannot contain NUL characters: {value!r}')
+
+        return strings.setdefault(value, len(strings))
+
+    def _int(value: int) -> int:
+        return COMPACT_DATA_NONE if value is None else value
+
+    sections = {
+        section_name: array.array(typecode)
+        for section_name, typecode in COMPACT_DATA_SECTIONS
+    }
+
+    recipe_index = {
+        recipe_id: index
+        for index, recipe_id in enumerate(data['recipes'])
+    }
+
+    raw_material_index = {
+        raw_material_id: index
+        for index, raw_material_id in enumerate(data['raw_materials'])
+    }
+
+    for offsets_section in ('material_offsets', 'requirement_offsets', 'depends_on_offsets', 'used_in_offsets'):
+        sections[offsets_section].append(0)
+
+    for recipe in data['recipes'].values():
+        sections['recipe_id'].append(_string(recipe['id']))
+        sections['recipe_name'].append(_string(recipe['name']))
+        sections['recipe_uri'].append(_string(recipe['uri']))
+        sections['recipe_has_page'].append(int(recipe['has_page']))
+        sections['recipe_image_url'].append(_string(recipe['image_url']))
+        sections['recipe_source'].append(_string(recipe['source']))
+        sections['recipe_sell_price'].append(_int(recipe['sell_price']))
+        sections['recipe_total_crafting_steps'].append(_int(recipe['total_crafting_steps']))
+        sections['recipe_value_of_raw_materials'].append(_int(recipe['value_of_raw_materials']))
+
+        for material in recipe['materials']:
+            sections['material_id'].append(_string(material['id']))
+            sections['material_name'].append(_string(material['name']))
+            sections['material_uri'].append(_string(material['uri']))
+            sections['material_quantity'].append(material['quantity'])
+        sections['material_offsets'].append(len(sections['material_id']))
+
+        for raw_material_id, raw_material_ref in recipe['raw_materials'].items():
+            sections['requirement_raw_material'].append(raw_material_index[raw_material_id])
+            sections['requirement_quantity'].append(raw_material_ref['quantity'])
+            sections['requirement_name'].append(_string(raw_material_ref['name']))
+            sections['requirement_uri'].append(_string(raw_material_ref['uri']))
+        sections['requirement_offsets'].append(len(sections['requirement_raw_material']))
+
+        for depends_on_id in recipe['depends_on']:
+            sections['depends_on_recipe'].append(recipe_index[depends_on_id])
+        sections['depends_on_offsets'].append(len(sections['depends_on_recipe']))
+
+    for raw_material in data['raw_materials'].values():
+        sections['raw_material_id'].append(_string(raw_material['id']))
+        sections['raw_material_name'].append(_string(raw_material['name']))
+        sections['raw_material_uri'].append(_string(raw_material['uri']))
+        sections['raw_material_image_url'].append(_string(raw_material['image_url']))
+        sections['raw_material_sell_price'].append(_int(raw_material['sell_price']))
+
+        for recipe_id in raw_material['used_in']:
+            sections['used_in_recipe'].append(recipe_index[recipe_id])
+        sections['used_in_offsets'].append(len(sections['used_in_recipe']))
+
+    for value in strings:
+        sections['strings'].frombytes(value.encode('utf-8') + b'\0')
+
+    section_headers = {}
+    section_bytes = []
+    offset = 0
+    for section_name, section in sections.items():
+        if sys.byteorder == 'big':
+            section.byteswap()
+
+        contents = section.tobytes()
+        contents += bytes(-len(contents) % 8)
+        section_headers[section_name] = {
+            'offset': offset,
+            'typecode': section.typecode,
+            'length': len(section),
+        }
+        section_bytes.append(contents)
+        offset += len(contents)
+
+    header = json.dumps({
+        'wiki_base_url': data['wiki_base_url'],
+        'utc_datetime': data['utc_datetime'],
+        'recipe_count': len(data['recipes']),
+        'raw_material_count': len(data['raw_materials']),
+        'sections': section_headers,
+    }).encode('utf-8')
+    header += b' ' * (-(len(header) + 12) % 8)
+
+    temp_filename = f'{filename}.tmp'
+    with open(temp_filename, 'wb') as compact_file:
+        compact_file.write(COMPACT_DATA_MAGIC)
+        compact_file.write(struct.pack('<II', COMPACT_DATA_VERSION, len(header)))
+        compact_file.write(header)
+        for contents in section_bytes:
+            compact_file.write(contents)
+    os.replace(temp_filename, filename)
+
+
+def parse_args(args: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Scrapes the Animal Crossing Fandom Wiki to generate diy_recipes.json.",
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help="Number of headless browser sessions used to download pages concurrently.",
+    )
+
+    parser.add_argument(
+        '--max-age',
+        type=float,
+        default=24,
+        help="Maximum age, in hours, of a cached page snapshot before the page is downloaded again.",
+    )
+
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help="Download every page, even if it has a fresh snapshot in the cache.",
+    )
+
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help="Rebuild diy_recipes.json purely from cached page snapshots, without downloading anything.",
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        default=HTML_CACHE_LOCATION,
+        help="Directory used to store cached page snapshots.",
+    )
+
+    parser.add_argument(
+        '--parser',
+        choices=sorted(PARSER_ENGINES),
+        default=DEFAULT_PARSER_ENGINE,
+        help="HTML parser engine used to scrape the pages.",
+    )
+
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Only recalculate the recipes affected by changes since the previous diy_recipes.json.",
+    )
+
+    return parser.parse_args(args)
 
 
 if __name__ == '__main__':
+    args = parse_args()
+
+    html_pages = load_html_pages_with_cache(
+        WIKI_PAGES_DIY_RECIPES + [WIKI_PAGE_CRAFTING_MATERIALS],
+        HtmlSnapshotCache(args.cache_dir),
+        max_age=0 if args.refresh else args.max_age * 60 * 60,
+        offline=args.offline,
+        workers=args.workers,
+    )
+
     recipes = []
 
-    for URL in WIKI_PAGES_DIY_RECIPES:
-        recipes_html_contents = load_html_page(URL)
-        recipes += scrape_recipes_from_html_doc(recipes_html_contents)
+    for recipes_html_contents in html_pages[:-1]:
+        recipes += scrape_recipes_from_html_doc(recipes_html_contents, parser=args.parser)
 
     recipes = generate_recipe_table_from_recipe_list(recipes)
 
-    calculate_generated_recipe_properties(recipes)
+    crafting_materials_html_contents = html_pages[-1]
+    raw_materials = scrape_raw_materials_from_html_doc(crafting_materials_html_contents, parser=args.parser)
+
+    try:
+        with open(RECIPE_DATA_FILENAME) as recipe_json:
+            previous_data = json.load(recipe_json)
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous_data = None
 
-    crafting_materials_html_contents = load_html_page(WIKI_PAGE_CRAFTING_MATERIALS)
-    raw_materials = scrape_raw_materials_from_html_doc(crafting_materials_html_contents)
-    raw_materials = generate_raw_materials_table(recipes, raw_materials)
+    if args.incremental and previous_data:
+        recipes, raw_materials, recalculated_recipe_ids = rebuild_recipe_data_incrementally(
+            previous_data,
+            recipes,
+            raw_materials,
+        )
 
-    calculate_value_of_raw_materials(recipes, raw_materials)
+    else:
+        calculate_generated_recipe_properties(recipes)
+        raw_materials = generate_raw_materials_table(recipes, raw_materials)
+        calculate_value_of_raw_materials(recipes, raw_materials)
+        recalculated_recipe_ids = set(recipes)
 
     data = {
         'wiki_base_url': WIKI_BASE_URL,
@@ -469,5 +1535,18 @@ if __name__ == '__main__':
         'raw_materials': raw_materials,
     }
 
-    with open(os.path.join(FILE_LOCATION, 'diy_recipes.json'), 'w') as recipe_json:
+    with open(RECIPE_DATA_FILENAME, 'w') as recipe_json:
         json.dump(data, recipe_json, indent=2)
+
+    write_compact_recipe_data(data, COMPACT_RECIPE_DATA_FILENAME)
+
+    if previous_data:
+        change_report = generate_change_report(previous_data, data, recalculated_recipe_ids)
+        with open(CHANGE_REPORT_FILENAME, 'w') as change_report_json:
+            json.dump(change_report, change_report_json, indent=2)
+
+        for table_name in ('recipes', 'raw_materials'):
+            print(f'Changes to {table_name}:', ', '.join(
+                f'{len(ids)} {change}'
+                for change, ids in change_report[table_name].items()
+            ))
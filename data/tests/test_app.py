@@ -0,0 +1,238 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import unittest
+
+import app
+
+RECIPE_DATA_FILENAME = os.path.join(os.path.dirname(__file__), '..', 'diy_recipes.json')
+
+
+def scraped(data: dict) -> tuple:
+    """
+    Strips the recipe data down to what the scraping functions produce, the
+    recipe table with only the scraped properties and the list of raw
+    materials on the crafting materials page (the ones with images).
+    """
+
+    recipes = {
+        recipe_id: {
+            property_name: copy.deepcopy(recipe[property_name])
+            for property_name in app.SCRAPED_RECIPE_PROPERTIES
+        }
+        for recipe_id, recipe in data['recipes'].items()
+    }
+
+    raw_materials = [
+        {
+            property_name: raw_material[property_name]
+            for property_name in ('name', 'id', 'uri', 'image_url', 'sell_price')
+        }
+        for raw_material in data['raw_materials'].values()
+        if raw_material['image_url']
+    ]
+
+    return recipes, raw_materials
+
+
+def material(name: str, _id: str, quantity: int) -> dict:
+    return {'name': name, 'id': _id, 'uri': None, 'quantity': quantity}
+
+
+def quietly(function, *args):
+    # The rebuilds warn about the recipes that are crafted from each other
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def rebuild_recipe_data(recipes: dict, raw_materials: list) -> tuple:
+    app.calculate_generated_recipe_properties(recipes)
+    raw_materials = app.generate_raw_materials_table(recipes, raw_materials)
+    app.calculate_value_of_raw_materials(recipes, raw_materials)
+    return recipes, raw_materials
+
+
+class IncrementalRebuildTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(RECIPE_DATA_FILENAME) as recipe_json:
+            data = json.load(recipe_json)
+
+        # Start from a full rebuild, so that only the changes made by each
+        # test can differ
+        recipes, raw_materials = quietly(rebuild_recipe_data, *scraped(data))
+        cls.previous_data = {
+            'wiki_base_url': data['wiki_base_url'],
+            'utc_datetime': data['utc_datetime'],
+            'recipes': recipes,
+            'raw_materials': raw_materials,
+        }
+
+    def setUp(self):
+        self.recipes, self.raw_materials = scraped(self.previous_data)
+
+    def rebuild(self) -> set:
+        """
+        Rebuilds the scraped data incrementally, asserting that the result
+        matches a full rebuild, and returns the recalculated recipe IDs.
+        """
+
+        expected_recipes, expected_raw_materials = quietly(
+            rebuild_recipe_data,
+            copy.deepcopy(self.recipes),
+            copy.deepcopy(self.raw_materials),
+        )
+
+        recipes, raw_materials, recipe_ids = quietly(
+            app.rebuild_recipe_data_incrementally,
+            copy.deepcopy(self.previous_data),
+            self.recipes,
+            self.raw_materials,
+        )
+
+        self.assertEqual(recipes, expected_recipes)
+        self.assertEqual(raw_materials, expected_raw_materials)
+        self.assertEqual(list(raw_materials), list(expected_raw_materials))
+        return recipe_ids
+
+    def test_unchanged(self):
+        self.assertEqual(self.rebuild(), set())
+
+    def test_modified_materials(self):
+        self.recipes['ironwood_dresser']['materials'][0]['quantity'] += 1
+
+        self.assertEqual(self.rebuild(), {'ironwood_dresser', 'ironwood_cupboard', 'ironwood_kitchenette'})
+
+    def test_modified_scraped_property(self):
+        self.recipes['wooden_chair']['sell_price'] += 10
+
+        self.assertEqual(self.rebuild(), {'wooden_chair'})
+
+    def test_added_recipe(self):
+        self.recipes['ironwood_shelf'] = {
+            'name': 'Ironwood shelf',
+            'id': 'ironwood_shelf',
+            'uri': None,
+            'has_page': False,
+            'image_url': None,
+            'materials': [
+                material('ironwood dresser', 'ironwood_dresser', 1),
+                material('gold nugget', 'gold_nugget', 2),
+                material('moon rock', 'moon_rock', 3),
+            ],
+            'source': None,
+            'sell_price': None,
+        }
+
+        self.assertEqual(self.rebuild(), {'ironwood_shelf'})
+
+    def test_removed_recipe(self):
+        del self.recipes['ironwood_dresser']
+
+        self.assertEqual(self.rebuild(), {'ironwood_cupboard', 'ironwood_kitchenette'})
+
+    def test_removed_raw_material_reference(self):
+        # Clay is still listed, but no longer used by the recipe
+        self.recipes['pot']['materials'] = [
+            material_ref
+            for material_ref in self.recipes['pot']['materials']
+            if material_ref['id'] != 'clay'
+        ]
+
+        self.assertIn('pot', self.rebuild())
+
+    def test_modified_sell_price(self):
+        raw_material = next(rm for rm in self.raw_materials if rm['id'] == 'clay')
+        raw_material['sell_price'] += 1
+
+        self.assertEqual(self.rebuild(), set(self.previous_data['raw_materials']['clay']['used_in']))
+
+    def test_unlisted_raw_material(self):
+        self.raw_materials = [rm for rm in self.raw_materials if rm['id'] != 'clay']
+
+        self.assertEqual(self.rebuild(), set(self.recipes))
+
+
+class RecipeCycleTest(unittest.TestCase):
+    def recipe(self, _id: str, materials: list) -> dict:
+        return {'name': _id, 'id': _id, 'uri': None, 'materials': materials}
+
+    def test_cycle(self):
+        recipes = {
+            'document_stack': self.recipe('document_stack', [material('scattered papers', 'scattered_papers', 1)]),
+            'scattered_papers': self.recipe('scattered_papers', [material('document stack', 'document_stack', 1)]),
+            'paper_pile': self.recipe('paper_pile', [
+                material('document stack', 'document_stack', 2),
+                material('wood', 'wood', 3),
+            ]),
+            'chair': self.recipe('chair', [material('wood', 'wood', 4)]),
+        }
+        raw_materials = [{'name': 'wood', 'id': 'wood', 'uri': None, 'image_url': 'wood.png', 'sell_price': 60}]
+
+        recipes, raw_materials = quietly(rebuild_recipe_data, recipes, raw_materials)
+
+        # The recipes in the cycle depend on each other, but the materials
+        # that complete the cycle are neither crafted nor raw materials
+        for recipe_id in ('document_stack', 'scattered_papers'):
+            self.assertEqual(recipes[recipe_id]['depends_on'], ['document_stack', 'scattered_papers'])
+            self.assertEqual(recipes[recipe_id]['raw_materials'], {})
+            self.assertEqual(recipes[recipe_id]['total_crafting_steps'], 1)
+            self.assertIsNone(recipes[recipe_id]['value_of_raw_materials'])
+
+        self.assertEqual(recipes['paper_pile']['depends_on'], ['document_stack', 'paper_pile', 'scattered_papers'])
+        self.assertEqual(list(recipes['paper_pile']['raw_materials']), ['wood'])
+        self.assertEqual(recipes['paper_pile']['total_crafting_steps'], 3)
+        self.assertIsNone(recipes['paper_pile']['value_of_raw_materials'])
+        self.assertEqual(recipes['chair']['value_of_raw_materials'], 240)
+        self.assertEqual(list(raw_materials), ['wood'])
+
+
+class ChangeReportTest(unittest.TestCase):
+    def test_change_report(self):
+        previous_data = {
+            'utc_datetime': '2020-05-01 00:00:00+00:00',
+            'recipes': {
+                'axe': {'id': 'axe', 'sell_price': 625},
+                'flimsy_axe': {'id': 'flimsy_axe', 'sell_price': 200},
+                'stone_axe': {'id': 'stone_axe', 'sell_price': 200},
+            },
+            'raw_materials': {
+                'wood': {'id': 'wood', 'sell_price': 60},
+            },
+        }
+        data = {
+            'utc_datetime': '2020-05-02 00:00:00+00:00',
+            'recipes': {
+                'axe': {'id': 'axe', 'sell_price': 625},
+                'flimsy_axe': {'id': 'flimsy_axe', 'sell_price': 250},
+                'golden_axe': {'id': 'golden_axe', 'sell_price': 10000},
+            },
+            'raw_materials': {
+                'wood': {'id': 'wood', 'sell_price': 60},
+                'gold_nugget': {'id': 'gold_nugget', 'sell_price': 10000},
+            },
+        }
+
+        change_report = app.generate_change_report(previous_data, data, {'golden_axe', 'flimsy_axe'})
+
+        self.assertEqual(change_report, {
+            'previous_utc_datetime': '2020-05-01 00:00:00+00:00',
+            'utc_datetime': '2020-05-02 00:00:00+00:00',
+            'recipes': {
+                'added': ['golden_axe'],
+                'removed': ['stone_axe'],
+                'modified': ['flimsy_axe'],
+                'recalculated': ['flimsy_axe', 'golden_axe'],
+            },
+            'raw_materials': {
+                'added': ['gold_nugget'],
+                'removed': [],
+                'modified': [],
+            },
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
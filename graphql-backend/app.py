@@ -1,33 +1,73 @@
 import os
-import json
 from typing import List
 
 import flask
 import graphene
-import flask_graphql
+import numpy as np
 
+import backend.cost as cost
+import backend.dataset as dataset
+import backend.metrics as metrics
 import backend.models as models
+import backend.planner as planner
+import backend.search as search
+import backend.view as view
 
 __dir__ = os.path.dirname(__file__)
 
 
-RECIPE_DATA_FILENAME = os.path.join(__dir__, 'data', 'diy_recipes.json')
-with open(RECIPE_DATA_FILENAME) as rdfile:
-    RECIPE_DATA = json.load(rdfile)
+# Either diy_recipes.json or the compact diy_recipes.bin generated alongside it
+RECIPE_DATA_FILENAME = os.environ.get(
+    'RECIPE_DATA_FILENAME',
+    os.path.join(__dir__, 'data', 'diy_recipes.bin'),
+)
+
+# How often, in seconds, the data file is checked for changes. 0 disables
+# reloading the data file.
+RECIPE_DATA_RELOAD_INTERVAL = float(os.environ.get('RECIPE_DATA_RELOAD_INTERVAL', 30))
+
+# The maximum total size, in bytes, of the cached responses. 0 disables the
+# response cache.
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 64 * 1024 * 1024))
+
+# How long, in seconds, browsers and CDNs can cache GET responses for
+RESPONSE_MAX_AGE = int(os.environ.get('RESPONSE_MAX_AGE', 60 * 60))
+
+# The maximum number of automatic persisted queries that are remembered
+PERSISTED_QUERY_LIMIT = int(os.environ.get('PERSISTED_QUERY_LIMIT', 10000))
+
+# Times every request and resolver, and serves the timings at /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
 
+# Queries that take longer than this, in seconds, are logged with their
+# variables. 0 disables the slow query log.
+SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 1))
 
-RECIPES = RECIPE_DATA['recipes']
-RAW_MATERIALS = RECIPE_DATA['raw_materials']
-WIKI_BASE_URL = RECIPE_DATA['wiki_base_url']
+# Queries with a higher estimated cost, roughly the number of fields that
+# resolving them takes, are rejected before they're executed. 0 disables
+# query cost analysis.
+QUERY_COST_BUDGET = int(os.environ.get('QUERY_COST_BUDGET', 200000))
+
+
+DATASETS = dataset.DatasetReloader(
+    RECIPE_DATA_FILENAME,
+    interval=RECIPE_DATA_RELOAD_INTERVAL,
+)
 
 
 class Query(graphene.ObjectType):
     wiki_base_url = graphene.Field(
         graphene.String,
-        resolver=lambda self,info: WIKI_BASE_URL,
+        resolver=lambda self,info: current_dataset(info).wiki_base_url,
         description="Returns the base URL for the Animal Crossing Fandom Wiki.",
     )
 
+    data_version = graphene.Field(
+        graphene.String,
+        resolver=lambda self,info: current_dataset(info).version,
+        description="Returns the version of the recipe data, which changes whenever the data is updated.",
+    )
+
     raw_material = graphene.Field(
         models.RawMaterial,
         id=graphene.String(),
@@ -35,7 +75,7 @@ class Query(graphene.ObjectType):
     )
 
     def resolve_raw_material(self, info, id):
-        return models.get_raw_material(RAW_MATERIALS, id)
+        return current_dataset(info).models.raw_material(id)
 
     raw_materials = graphene.Field(
         graphene.List(models.RawMaterial),
@@ -43,11 +83,30 @@ class Query(graphene.ObjectType):
     )
 
     def resolve_raw_materials(self, info):
-        return [
-            models.convert_raw_material(rm)
-            for rm in
-            RAW_MATERIALS.values()
-        ]
+        return current_dataset(info).models.all_raw_materials()
+
+    class RawMaterialSortKey(graphene.Enum):
+        NAME = 'name'
+        SELL_PRICE = 'sell_price'
+
+    class RawMaterialConnection(graphene.relay.Connection):
+        class Meta:
+            node = models.RawMaterial
+
+        total_count = graphene.Int()
+        def resolve_total_count(self, info):
+            return len(self.iterable)
+
+    raw_materials_connection = graphene.relay.ConnectionField(
+        RawMaterialConnection,
+        sort_by=graphene.Argument(RawMaterialSortKey, description="Sorts the raw materials by this value, instead of the order of the raw material table. Raw materials without a value come last."),
+        descending=graphene.Boolean(default_value=False, description="Sorts the raw materials in descending order."),
+        description="Returns a page of raw materials, using cursor pagination.",
+    )
+
+    def resolve_raw_materials_connection(self, info, sort_by: str=None, descending: bool=False, **kwargs):
+        data = current_dataset(info)
+        return data.models.raw_materials(data.raw_material_index.sorted_ids(sort_by, descending))
 
     recipe = graphene.Field(
         models.Recipe,
@@ -56,31 +115,160 @@ class Query(graphene.ObjectType):
     )
 
     def resolve_recipe(self, info, id):
-        return models.get_recipe(RECIPES, RAW_MATERIALS, id)
+        return current_dataset(info).models.recipe(id)
+
+    class RawMaterialMatch(graphene.Enum):
+        ALL = 'all'
+        ANY = 'any'
+
+        @property
+        def description(self):
+            if self == Query.RawMaterialMatch.ALL:
+                return "Recipes must use all of the raw materials."
+            return "Recipes must use at least one of the raw materials."
 
     recipes = graphene.Field(
         graphene.List(models.Recipe),
         raw_material_id=graphene.String(description="A raw material ID, used to filter the results list to only include recipes that use the specified raw material."),
+        raw_material_ids=graphene.List(graphene.String, description="A list of raw material IDs, used to filter the results list to only include recipes that use the specified raw materials."),
+        raw_material_match=graphene.Argument(RawMaterialMatch, default_value=RawMaterialMatch.ALL.value, description="Whether recipes must use all or any of the raw materials in rawMaterialIds."),
+        direct_only=graphene.Boolean(default_value=False, description="Only match raw materials that are listed as materials of the recipe itself, rather than required by the recipes that it depends on."),
+        depends_on_recipe_id=graphene.String(description="A recipe ID, used to filter the results list to only include recipes that depend on the specified recipe."),
+        source=graphene.String(description="Filters the results list to only include recipes with a source that contains all of the words in this value."),
         recipe_ids=graphene.List(graphene.String, description="A list of recipe IDs, used to filter the list of results."),
         description="Returns a list of recipes. Has a few filter options.",
     )
 
-    def resolve_recipes(self, info, recipe_ids: list=None, raw_material_id: str=None):
+    def resolve_recipes(
+        self,
+        info,
+        recipe_ids: list=None,
+        raw_material_id: str=None,
+        raw_material_ids: list=None,
+        raw_material_match: str='all',
+        direct_only: bool=False,
+        depends_on_recipe_id: str=None,
+        source: str=None,
+    ):
+        data = current_dataset(info)
+        matching_recipe_ids = filter_recipes(
+            data,
+            raw_material_id=raw_material_id,
+            raw_material_ids=raw_material_ids,
+            raw_material_match=raw_material_match,
+            direct_only=direct_only,
+            depends_on_recipe_id=depends_on_recipe_id,
+            source=source,
+        )
+
+        if isinstance(recipe_ids, list):
+            return [
+                data.models.recipe(_id) for _id in recipe_ids
+                if matching_recipe_ids is None or _id in matching_recipe_ids
+            ]
+
+        if matching_recipe_ids is not None:
+            return [
+                data.models.recipe(_id) for _id in
+                data.recipe_index.in_table_order(matching_recipe_ids)
+            ]
+
+        return data.models.all_recipes()
+
+    class RecipeSortKey(graphene.Enum):
+        NAME = 'name'
+        SELL_PRICE = 'sell_price'
+        VALUE_OF_RAW_MATERIALS = 'value_of_raw_materials'
+        TOTAL_CRAFTING_STEPS = 'total_crafting_steps'
+        PROFIT_MARGIN = 'profit_margin'
+
+        @property
+        def description(self):
+            if self == Query.RecipeSortKey.PROFIT_MARGIN:
+                return "The sell price of the recipe, minus the value of its raw materials."
+            return None
+
+    class RecipeConnection(graphene.relay.Connection):
+        class Meta:
+            node = models.Recipe
+
+        total_count = graphene.Int()
+        def resolve_total_count(self, info):
+            return len(self.iterable)
+
+    recipes_connection = graphene.relay.ConnectionField(
+        RecipeConnection,
+        sort_by=graphene.Argument(RecipeSortKey, description="Sorts the recipes by this value, instead of the order of the recipe table. Recipes without a value come last."),
+        descending=graphene.Boolean(default_value=False, description="Sorts the recipes in descending order."),
+        raw_material_id=graphene.String(description="A raw material ID, used to filter the results list to only include recipes that use the specified raw material."),
+        raw_material_ids=graphene.List(graphene.String, description="A list of raw material IDs, used to filter the results list to only include recipes that use the specified raw materials."),
+        raw_material_match=graphene.Argument(RawMaterialMatch, default_value=RawMaterialMatch.ALL.value, description="Whether recipes must use all or any of the raw materials in rawMaterialIds."),
+        direct_only=graphene.Boolean(default_value=False, description="Only match raw materials that are listed as materials of the recipe itself, rather than required by the recipes that it depends on."),
+        depends_on_recipe_id=graphene.String(description="A recipe ID, used to filter the results list to only include recipes that depend on the specified recipe."),
+        source=graphene.String(description="Filters the results list to only include recipes with a source that contains all of the words in this value."),
+        recipe_ids=graphene.List(graphene.String, description="A list of recipe IDs, used to filter the list of results."),
+        description="Returns a page of recipes, using cursor pagination. Has the same filter options as recipes, and a few sort options.",
+    )
+
+    def resolve_recipes_connection(
+        self,
+        info,
+        sort_by: str=None,
+        descending: bool=False,
+        recipe_ids: list=None,
+        raw_material_id: str=None,
+        raw_material_ids: list=None,
+        raw_material_match: str='all',
+        direct_only: bool=False,
+        depends_on_recipe_id: str=None,
+        source: str=None,
+        **kwargs
+    ):
+        data = current_dataset(info)
+        matching_recipe_ids = filter_recipes(
+            data,
+            raw_material_id=raw_material_id,
+            raw_material_ids=raw_material_ids,
+            raw_material_match=raw_material_match,
+            direct_only=direct_only,
+            depends_on_recipe_id=depends_on_recipe_id,
+            source=source,
+        )
+
         if isinstance(recipe_ids, list):
-            recipe_subset_generator = (RECIPES[_id] for _id in recipe_ids)
-        else:
-            recipe_subset_generator = (recipe for recipe in RECIPES.values())
-
-        if raw_material_id:
-            recipe_subset_generator = (
-                recipe for recipe in recipe_subset_generator
-                if raw_material_id in recipe['raw_materials']
-            )
+            if matching_recipe_ids is None:
+                matching_recipe_ids = set(recipe_ids)
+            else:
+                matching_recipe_ids = matching_recipe_ids.intersection(recipe_ids)
+
+        return data.models.recipes(data.recipe_index.sorted.sorted_ids(sort_by, descending, matching_recipe_ids))
+
+    class SearchResponse(graphene.ObjectType):
+        recipe = graphene.Field(models.Recipe, description="The recipe that matched, if the hit is a recipe.")
+        raw_material = graphene.Field(models.RawMaterial, description="The raw material that matched, if the hit is a raw material.")
+        matched_field = graphene.String(description="Whether the query matched the \"name\" or the \"source\" of the hit.")
+        matched_text = graphene.String(description="The name or source that the query matched.")
+        score = graphene.Float(description="How well the hit matches the query. Higher is better.")
+
+    search = graphene.Field(
+        graphene.List(SearchResponse),
+        query=graphene.String(required=True, description="The text to search for. The last word can be partially typed, and misspelled words are matched to similar words."),
+        limit=graphene.Int(default_value=10, description=f"The maximum number of hits, up to {search.MAX_LIMIT}."),
+        description="Searches the names of the recipes and raw materials, and the sources of the recipes, and returns the best hits first.",
+    )
 
+    def resolve_search(self, info, query: str, limit: int=10):
+        data = current_dataset(info)
         return [
-            models.convert_recipe(RAW_MATERIALS, recipe)
-            for recipe in
-            recipe_subset_generator
+            Query.SearchResponse(
+                recipe=data.models.recipe(hit.id) if hit.kind == search.RECIPE else None,
+                raw_material=data.models.raw_material(hit.id) if hit.kind == search.RAW_MATERIAL else None,
+                matched_field=hit.field,
+                matched_text=hit.text,
+                score=hit.score,
+            )
+            for hit in
+            data.search_index.search(query, min(limit, search.MAX_LIMIT))
         ]
 
     class CraftableRecipeRawMaterialArg(graphene.InputObjectType):
@@ -109,61 +297,439 @@ class Query(graphene.ObjectType):
     craftable_recipes = graphene.Field(
         graphene.List(CraftableRecipeResponse),
         raw_materials=graphene.List(CraftableRecipeRawMaterialArg),
+        owned_recipe_ids=graphene.List(graphene.String, description="The IDs of the recipes that the player knows. If given, recipes that depend on a recipe that isn't in the list are excluded."),
         description="Returns a list of recipes that can be crafted based on a list of raw materials.",
     )
 
-    def resolve_craftable_recipes(self, info, raw_materials: List[CraftableRecipeRawMaterialArg]):
-        raw_material_quantities = {
+    def resolve_craftable_recipes(self, info, raw_materials: List[CraftableRecipeRawMaterialArg], owned_recipe_ids: list=None):
+        return Query.resolve_craftable_recipes_batch(self, info, [raw_materials], owned_recipe_ids)[0].craftable_recipes
+
+    class CraftableRecipesBatchResponse(graphene.ObjectType):
+        index = graphene.Int(description="The position of the inventory in the list of inventories.")
+        craftable_recipes = graphene.List(lambda: Query.CraftableRecipeResponse)
+
+    craftable_recipes_batch = graphene.Field(
+        graphene.List(CraftableRecipesBatchResponse),
+        inventories=graphene.List(graphene.List(CraftableRecipeRawMaterialArg)),
+        owned_recipe_ids=graphene.List(graphene.String, description="The IDs of the recipes that the player knows. If given, recipes that depend on a recipe that isn't in the list are excluded."),
+        description="Returns the recipes that can be crafted from each of a list of inventories of raw materials. All of the inventories are evaluated together.",
+    )
+
+    def resolve_craftable_recipes_batch(self, info, inventories: List[List[CraftableRecipeRawMaterialArg]], owned_recipe_ids: list=None):
+        data = current_dataset(info)
+        craftable_quantities = data.requirements.craftable_quantities(
+            data.requirements.inventory_matrix([
+                {
+                    rm.raw_material_id: rm.quantity
+                    for rm in
+                    raw_materials
+                }
+                for raw_materials in
+                inventories
+            ])
+        )
+
+        if owned_recipe_ids is not None:
+            craftable_quantities[:, ~available_recipes(data, owned_recipe_ids)] = 0
+
+        return [
+            Query.CraftableRecipesBatchResponse(
+                index=index,
+                craftable_recipes=[
+                    Query.CraftableRecipeResponse(
+                        quantity=int(inventory_craftable_quantities[position]),
+                        recipe=data.models.recipe(data.requirements.recipe_ids[position]),
+                    )
+                    for position in
+                    np.flatnonzero(inventory_craftable_quantities)
+                ],
+            )
+            for index, inventory_craftable_quantities in
+            enumerate(craftable_quantities)
+        ]
+
+    class CraftingPlanRawMaterialResponse(graphene.ObjectType):
+        raw_material = graphene.Field(models.RawMaterial)
+        quantity = graphene.Int()
+
+        total_sell_price = graphene.Int()
+        def resolve_total_sell_price(self, info):
+            if self.quantity is None or self.raw_material.sell_price is None:
+                return None
+
+            return self.quantity * self.raw_material.sell_price
+
+    class CraftingPlanResponse(graphene.ObjectType):
+        recipes = graphene.List(lambda: Query.CraftableRecipeResponse, description="The recipes to craft, and how many of each.")
+        leftover_raw_materials = graphene.List(lambda: Query.CraftingPlanRawMaterialResponse, description="The raw materials that are left over, to be sold as-is.")
+        crafted_sell_price = graphene.Int(description="The sell price of all of the crafted recipes.")
+        leftover_sell_price = graphene.Int(description="The sell price of all of the leftover raw materials.")
+        total_sell_price = graphene.Int(description="The sell price of the crafted recipes and the leftover raw materials.")
+        profit = graphene.Int(description="The bells earned by the plan, over selling all of the raw materials as-is.")
+        profit_per_crafting_step = graphene.Float(description="The profit of the plan divided by its total crafting steps. Null if the plan doesn't craft anything.")
+        total_crafting_steps = graphene.Int()
+        optimal = graphene.Boolean(description="Whether the plan is proven to earn the most bells. False if the search was stopped early, in which case the plan is the best one that was found.")
+
+    class CraftingPlanObjective(graphene.Enum):
+        TOTAL_SELL_PRICE = planner.OBJECTIVE_TOTAL_SELL_PRICE
+        PROFIT_PER_CRAFTING_STEP = planner.OBJECTIVE_PROFIT_PER_CRAFTING_STEP
+
+        @property
+        def description(self):
+            if self == Query.CraftingPlanObjective.TOTAL_SELL_PRICE:
+                return "The plan that earns the most bells."
+            return "The plan that earns the most bells per crafting step, over selling the raw materials as-is."
+
+    optimal_crafting_plan = graphene.Field(
+        CraftingPlanResponse,
+        raw_materials=graphene.List(CraftableRecipeRawMaterialArg),
+        labor_budget=graphene.Int(description="The maximum total crafting steps of the plan."),
+        objective=graphene.Argument(CraftingPlanObjective, default_value=CraftingPlanObjective.TOTAL_SELL_PRICE.value, description="What the plan optimizes for."),
+        owned_recipe_ids=graphene.List(graphene.String, description="The IDs of the recipes that the player knows. If given, recipes that depend on a recipe that isn't in the list are excluded."),
+        description="Returns the combination of recipes to craft from a list of raw materials that earns the most bells, when the crafted recipes and the leftover raw materials are sold.",
+    )
+
+    def resolve_optimal_crafting_plan(
+        self,
+        info,
+        raw_materials: List[CraftableRecipeRawMaterialArg],
+        labor_budget: int=None,
+        objective: str=planner.OBJECTIVE_TOTAL_SELL_PRICE,
+        owned_recipe_ids: list=None,
+    ):
+        data = current_dataset(info)
+        inventory = data.requirements.inventory_vector({
             rm.raw_material_id: rm.quantity
             for rm in
             raw_materials
-        }
-
-        craftable_recipes = {}
-        for recipe_id, recipe in RECIPES.items():
-            min_craftable_quantity = None
-            for raw_material_id, raw_material in recipe['raw_materials'].items():
-                quantity_required = raw_material['quantity']
-                quantity_on_hand = raw_material_quantities.get(raw_material_id, 0)
-                craftable_quantity = int(quantity_on_hand / quantity_required)
-                min_craftable_quantity = (
-                    craftable_quantity if min_craftable_quantity is None else
-                    min(min_craftable_quantity, craftable_quantity)
-                )
+        })
+
+        return convert_crafting_plan(data, data.planner.optimal_plan(
+            inventory,
+            labor_budget,
+            objective,
+            available_recipes(data, owned_recipe_ids),
+        ))
+
+    crafting_plan_frontier = graphene.Field(
+        graphene.List(CraftingPlanResponse),
+        raw_materials=graphene.List(CraftableRecipeRawMaterialArg),
+        labor_budget=graphene.Int(description="The maximum total crafting steps of the plans."),
+        owned_recipe_ids=graphene.List(graphene.String, description="The IDs of the recipes that the player knows. If given, recipes that depend on a recipe that isn't in the list are excluded."),
+        description="Returns the plans that trade off bells against crafting steps for a list of raw materials, ordered by total crafting steps. Each plan earns more than the plans before it, and is the best plan for some number of bells per crafting step.",
+    )
 
-            if min_craftable_quantity:
-                craftable_recipes[recipe_id] = min_craftable_quantity
+    def resolve_crafting_plan_frontier(
+        self,
+        info,
+        raw_materials: List[CraftableRecipeRawMaterialArg],
+        labor_budget: int=None,
+        owned_recipe_ids: list=None,
+    ):
+        data = current_dataset(info)
+        inventory = data.requirements.inventory_vector({
+            rm.raw_material_id: rm.quantity
+            for rm in
+            raw_materials
+        })
 
         return [
-            Query.CraftableRecipeResponse(
-                quantity=craftable_quantity,
-                recipe=models.get_recipe(RECIPES, RAW_MATERIALS, recipe_id),
+            convert_crafting_plan(data, plan)
+            for plan in
+            data.planner.pareto_frontier(inventory, labor_budget, available_recipes(data, owned_recipe_ids))
+        ]
+
+
+    class CraftingTargetArg(graphene.InputObjectType):
+        recipe_id = graphene.String()
+        quantity = graphene.Int()
+
+    class CraftingShortfallRawMaterialResponse(graphene.ObjectType):
+        raw_material = graphene.Field(models.RawMaterial)
+        required = graphene.Int(description="The quantity of the raw material that's required to craft the targets.")
+        on_hand = graphene.Int(description="The quantity of the raw material in the inventory.")
+        missing = graphene.Int(description="The quantity of the raw material that's required but not in the inventory.")
+
+    class CraftingShortfallResponse(graphene.ObjectType):
+        raw_materials = graphene.List(lambda: Query.CraftingShortfallRawMaterialResponse, description="Every raw material that's required to craft the targets.")
+        missing_raw_materials = graphene.List(lambda: Query.CraftingShortfallRawMaterialResponse, description="The raw materials that there aren't enough of in the inventory.")
+        intermediate_crafts = graphene.List(lambda: Query.CraftableRecipeResponse, description="The recipes that have to be crafted to be used as materials for the targets, and how many of each.")
+        total_crafting_steps = graphene.Int(description="The total crafting steps of the targets, including the intermediate crafts.")
+        can_craft = graphene.Boolean(description="Whether the inventory has all of the required raw materials.")
+
+    crafting_shortfall = graphene.Field(
+        CraftingShortfallResponse,
+        targets=graphene.List(CraftingTargetArg, description="The recipes to craft, and how many of each."),
+        raw_materials=graphene.List(CraftableRecipeRawMaterialArg),
+        description="Returns the raw materials that are missing from a list of raw materials to craft a list of recipes, along with the intermediate recipes that have to be crafted along the way.",
+    )
+
+    def resolve_crafting_shortfall(self, info, targets: List[CraftingTargetArg], raw_materials: List[CraftableRecipeRawMaterialArg]=None):
+        data = current_dataset(info)
+        requirements = data.requirements
+        target_quantities = np.maximum(requirements.recipe_vector({
+            target.recipe_id: target.quantity
+            for target in
+            targets
+        }), 0)
+        inventory = requirements.inventory_vector({
+            rm.raw_material_id: rm.quantity
+            for rm in
+            raw_materials or []
+        })
+
+        required = requirements.required_raw_materials(target_quantities)
+        missing = np.maximum(required - inventory, 0)
+        crafts = requirements.required_crafts(target_quantities)
+        intermediate_crafts = crafts - target_quantities
+
+        raw_material_responses = [
+            Query.CraftingShortfallRawMaterialResponse(
+                raw_material=data.models.raw_material(requirements.raw_material_ids[position]),
+                required=int(required[position]),
+                on_hand=int(inventory[position]),
+                missing=int(missing[position]),
             )
-            for recipe_id, craftable_quantity in
-            craftable_recipes.items()
+            for position in
+            np.flatnonzero(required)
         ]
 
+        return Query.CraftingShortfallResponse(
+            raw_materials=raw_material_responses,
+            missing_raw_materials=[
+                response
+                for response in
+                raw_material_responses
+                if response.missing
+            ],
+            intermediate_crafts=[
+                Query.CraftableRecipeResponse(
+                    quantity=int(intermediate_crafts[position]),
+                    recipe=data.models.recipe(requirements.recipe_ids[position]),
+                )
+                for position in
+                np.flatnonzero(intermediate_crafts)
+            ],
+            total_crafting_steps=int(crafts.sum()),
+            can_craft=not missing.any(),
+        )
+
+
+def current_dataset(info) -> dataset.Dataset:
+    """
+    Returns the dataset that the request started with, so that every
+    resolver in a request uses the same data, even if a newer dataset is
+    swapped in during the request. Queries that are executed without a
+    request use the current dataset.
+    """
+
+    if isinstance(info.context, dict) and 'dataset' in info.context:
+        return info.context['dataset']
+
+    return DATASETS.current
+
+
+def filter_recipes(
+    data: dataset.Dataset,
+    raw_material_id: str,
+    raw_material_ids: list,
+    raw_material_match: str,
+    direct_only: bool,
+    depends_on_recipe_id: str,
+    source: str,
+) -> set:
+    """
+    Returns the IDs of the recipes that match the filter arguments of the
+    recipes queries, or None if no filters were given.
+    """
+
+    if raw_material_id:
+        raw_material_ids = [raw_material_id] + (raw_material_ids or [])
+
+    return data.recipe_index.filter_recipes(
+        raw_material_ids=raw_material_ids,
+        match_all_raw_materials=(raw_material_match == Query.RawMaterialMatch.ALL.value),
+        direct_only=direct_only,
+        depends_on_recipe_id=depends_on_recipe_id,
+        source=source,
+    )
+
+
+def available_recipes(data: dataset.Dataset, owned_recipe_ids: list) -> np.ndarray:
+    """
+    Returns the mask of the recipes that can be crafted with the owned
+    recipes, or None if every recipe can be crafted.
+    """
+
+    if owned_recipe_ids is None:
+        return None
+
+    return data.requirements.available_recipes(owned_recipe_ids)
+
+
+def convert_crafting_plan(data: dataset.Dataset, plan: dict) -> Query.CraftingPlanResponse:
+    """
+    Converts a plan from the crafting planner to a CraftingPlanResponse.
+    """
+
+    return Query.CraftingPlanResponse(
+        recipes=[
+            Query.CraftableRecipeResponse(
+                quantity=int(plan['recipe_quantities'][position]),
+                recipe=data.models.recipe(data.requirements.recipe_ids[position]),
+            )
+            for position in
+            np.flatnonzero(plan['recipe_quantities'])
+        ],
+        leftover_raw_materials=[
+            Query.CraftingPlanRawMaterialResponse(
+                quantity=int(plan['leftover_raw_materials'][position]),
+                raw_material=data.models.raw_material(data.requirements.raw_material_ids[position]),
+            )
+            for position in
+            np.flatnonzero(plan['leftover_raw_materials'])
+        ],
+        crafted_sell_price=plan['crafted_sell_price'],
+        leftover_sell_price=plan['leftover_sell_price'],
+        total_sell_price=plan['total_sell_price'],
+        profit=plan['profit'],
+        profit_per_crafting_step=planner.profit_per_crafting_step(plan),
+        total_crafting_steps=plan['total_crafting_steps'],
+        optimal=plan['optimal'],
+    )
+
+
+def page_size(args: dict, total: int) -> int:
+    """
+    Returns the most items that can be on a page of a connection.
+    """
+
+    for argument in ('first', 'last'):
+        if args.get(argument) is not None:
+            return max(min(args[argument], total), 0)
+
+    return total
+
+
+def plan_search_size(args: dict) -> int:
+    """
+    Returns the number of raw materials in the inventory of a crafting plan
+    search, where each one counts once more for each doubling of its
+    quantity beyond `PLAN_SEARCH_QUANTITY`.
+    """
+
+    size = 0
+    for raw_material in args.get('raw_materials') or ():
+        quantity = max((raw_material or {}).get('quantity') or 0, 0)
+        size += max((quantity // PLAN_SEARCH_QUANTITY).bit_length(), 1)
+
+    return size
+
+
+# The cost of a crafting plan search per squared raw material in the
+# inventory, calibrated against the time that the searches take compared to
+# resolving a field
+PLAN_SEARCH_COST = 100
+FRONTIER_SEARCH_COST = 300
+
+# The searches' knapsack tables grow with the quantities of the raw
+# materials, so each raw material counts once more towards the cost for each
+# doubling of its quantity beyond this one
+PLAN_SEARCH_QUANTITY = 1024
+
+# Plans seldom have more than a few dozen corners on their frontier
+ESTIMATED_FRONTIER_SIZE = 50
+
+# The estimated lengths of the list fields, see `cost.QueryCostAnalyzer`.
+# Plans are assumed to craft no more kinds of recipes than there are raw
+# materials.
+QUERY_LIST_SIZES = {
+    'Query.rawMaterials': lambda args, data: len(data.raw_materials),
+    'Query.rawMaterialsConnection': lambda args, data: page_size(args, len(data.raw_materials)),
+    'Query.recipes': lambda args, data: min(len(args.get('recipe_ids') or data.recipes), len(data.recipes)),
+    'Query.recipesConnection': lambda args, data: page_size(args, len(data.recipes)),
+    'Recipe.materials': lambda args, data: data.max_materials,
+    'Recipe.rawMaterials': lambda args, data: data.max_raw_materials,
+    'Recipe.dependsOnRecipes': lambda args, data: data.max_depends_on,
+    'RawMaterial.usedInRecipes': lambda args, data: data.max_used_in,
+    'RawMaterialRef.usedInRecipes': lambda args, data: data.max_used_in,
+    'Query.search': lambda args, data: max(0, min(args.get('limit', 0), search.MAX_LIMIT)),
+    'Query.craftableRecipes': lambda args, data: len(data.recipes),
+    'Query.craftableRecipesBatch': lambda args, data: len(args.get('inventories') or ()),
+    'CraftableRecipesBatchResponse.craftableRecipes': lambda args, data: len(data.recipes),
+    'Query.craftingPlanFrontier': lambda args, data: ESTIMATED_FRONTIER_SIZE,
+    'CraftingPlanResponse.recipes': lambda args, data: len(data.raw_materials),
+    'CraftingPlanResponse.leftoverRawMaterials': lambda args, data: len(data.raw_materials),
+    'CraftingShortfallResponse.rawMaterials': lambda args, data: len(data.raw_materials),
+    'CraftingShortfallResponse.missingRawMaterials': lambda args, data: len(data.raw_materials),
+    'CraftingShortfallResponse.intermediateCrafts': lambda args, data: len(data.recipes),
+}
+
+# The estimated cost of the fields that do more work than resolving a field
+QUERY_FIELD_COSTS = {
+    'Query.craftableRecipes': lambda args, data: len(data.recipes),
+    'Query.craftableRecipesBatch': lambda args, data: len(data.recipes) * len(args.get('inventories') or ()),
+    'Query.optimalCraftingPlan': lambda args, data: PLAN_SEARCH_COST * plan_search_size(args) ** 2,
+    'Query.craftingPlanFrontier': lambda args, data: FRONTIER_SEARCH_COST * plan_search_size(args) ** 2,
+    'Query.craftingShortfall': lambda args, data: len(data.recipes),
+}
+
 
 schema = graphene.Schema(query=Query)
 
+# Responses are cached by the version of the dataset that they were served
+# from, so they only change when a new dataset is loaded.
+RESPONSE_CACHE = view.ResponseCache(RESPONSE_CACHE_SIZE) if RESPONSE_CACHE_SIZE else None
+PERSISTED_QUERIES = view.PersistedQueryRegistry(PERSISTED_QUERY_LIMIT)
+METRICS = metrics.Metrics(SLOW_QUERY_THRESHOLD) if METRICS_ENABLED else None
+QUERY_COST_ANALYZER = (
+    cost.QueryCostAnalyzer(QUERY_COST_BUDGET, QUERY_LIST_SIZES, QUERY_FIELD_COSTS)
+    if QUERY_COST_BUDGET else
+    None
+)
+
+DATASETS.start()
+
 app = flask.Flask(__name__)
 app.add_url_rule(
     '/',
-    view_func=flask_graphql.GraphQLView.as_view(
+    view_func=view.CachingGraphQLView.as_view(
         '',
         schema=schema,
-        graphiql=False
+        graphiql=False,
+        cache=RESPONSE_CACHE,
+        datasets=DATASETS,
+        persisted_queries=PERSISTED_QUERIES,
+        max_age=RESPONSE_MAX_AGE,
+        metrics=METRICS,
+        cost_analyzer=QUERY_COST_ANALYZER,
     )
 )
 
 app.add_url_rule(
     '/graphiql',
-    view_func=flask_graphql.GraphQLView.as_view(
+    view_func=view.CachingGraphQLView.as_view(
         'graphiql',
         schema=schema,
-        graphiql=True
+        graphiql=True,
+        cache=RESPONSE_CACHE,
+        datasets=DATASETS,
+        persisted_queries=PERSISTED_QUERIES,
+        max_age=RESPONSE_MAX_AGE,
+        metrics=METRICS,
+        cost_analyzer=QUERY_COST_ANALYZER,
     )
 )
 
+if METRICS is not None:
+    app.add_url_rule(
+        '/metrics',
+        'metrics',
+        lambda: flask.Response(
+            METRICS.render(RESPONSE_CACHE, DATASETS.current),
+            content_type=metrics.CONTENT_TYPE,
+        ),
+    )
+
 if __name__ == '__main__':
     app.run(debug=True)
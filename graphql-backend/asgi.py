@@ -0,0 +1,38 @@
+"""
+ASGI entry point for the GraphQL API, as an alternative to serving the Flask
+app in app.py with gunicorn's sync workers:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+"""
+
+import os
+
+import app
+import backend.async_view as async_view
+
+
+# The number of threads that run the CPU-heavy resolvers. Defaults to
+# Python's ThreadPoolExecutor default.
+RESOLVER_THREADS = int(os.environ.get('RESOLVER_THREADS', 0)) or None
+
+# The root query fields that are resolved in the thread pool, instead of on
+# the event loop.
+OFFLOADED_FIELDS = {
+    'craftableRecipes',
+    'craftableRecipesBatch',
+    'optimalCraftingPlan',
+    'craftingPlanFrontier',
+    'craftingShortfall',
+}
+
+application = async_view.AsyncGraphQLApp(
+    app.schema,
+    datasets=app.DATASETS,
+    cache=app.RESPONSE_CACHE,
+    persisted_queries=app.PERSISTED_QUERIES,
+    max_age=app.RESPONSE_MAX_AGE,
+    offload_fields=OFFLOADED_FIELDS,
+    max_workers=RESOLVER_THREADS,
+    metrics=app.METRICS,
+    cost_analyzer=app.QUERY_COST_ANALYZER,
+)
@@ -0,0 +1,304 @@
+import asyncio
+import collections.abc
+import concurrent.futures
+import functools
+import time
+import urllib.parse
+
+from graphql.execution.executors.asyncio import AsyncioExecutor
+from graphql.execution.middleware import MiddlewareManager
+from graphql_server import (
+    HttpQueryError,
+    default_format_error,
+    encode_execution_results,
+    get_graphql_params,
+    json_encode,
+    load_json_body,
+    run_http_query,
+)
+from werkzeug.http import http_date, parse_etags, quote_etag
+
+import backend.cost as cost
+import backend.metrics as metrics
+import backend.view as view
+
+
+class OffloadMiddleware:
+    """
+    GraphQL middleware that runs the resolvers of a few fields of the root
+    query type in a thread pool, instead of on the event loop. Every other
+    field is resolved on the event loop as usual.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor, field_names: set):
+        self.executor = executor
+        self.field_names = field_names
+
+    def resolve(self, next, root, info, **args):
+        if info.field_name in self.field_names and info.parent_type is info.schema.get_query_type():
+            return asyncio.get_event_loop().run_in_executor(
+                self.executor,
+                functools.partial(next, root, info, **args),
+            )
+
+        return next(root, info, **args)
+
+
+class AsyncGraphQLApp:
+    """
+    An ASGI application that serves a GraphQL schema at `/`, with the same
+    dataset snapshots, response cache, ETags and persisted queries as
+    `view.CachingGraphQLView`, so that one process can serve many
+    concurrent requests.
+
+    Light queries are resolved on the event loop, while the resolvers of the
+    fields in `offload_fields`, the CPU-heavy ones, run in a thread pool of
+    `max_workers` threads. Their NumPy operations release the GIL, so they
+    can run alongside each other and the event loop.
+
+    If `metrics` is set, requests are timed the same way as in the view, and
+    the metrics are served at `/metrics`. Queries are limited by the
+    `cost_analyzer`, if it's set, the same way as in the view.
+    """
+
+    def __init__(
+        self,
+        schema,
+        datasets=None,
+        cache: view.ResponseCache = None,
+        persisted_queries: view.PersistedQueryRegistry = None,
+        max_age: int = 0,
+        offload_fields: set = (),
+        max_workers: int = None,
+        pretty: bool = False,
+        metrics: metrics.Metrics = None,
+        cost_analyzer: cost.QueryCostAnalyzer = None,
+    ):
+        self.schema = schema
+        self.datasets = datasets
+        self.cache = cache
+        self.persisted_queries = persisted_queries
+        self.max_age = max_age
+        self.pretty = pretty
+        self.metrics = metrics
+        self.cost_analyzer = cost_analyzer
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='graphql')
+        self.offload = OffloadMiddleware(self.executor, set(offload_fields))
+        self.middleware = MiddlewareManager(self.offload, wrap_in_promise=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        status, headers, body = await self.handle(scope, receive)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers.items()
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope: dict, receive) -> tuple:
+        """
+        Returns the (status code, headers, body) of the response to an HTTP
+        request.
+        """
+
+        if scope['path'] == '/metrics' and self.metrics is not None:
+            body = self.metrics.render(self.cache, self.datasets.current if self.datasets is not None else None)
+            return 200, {'Content-Type': metrics.CONTENT_TYPE}, body.encode('utf-8')
+
+        if scope['path'] != '/':
+            return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+
+        if self.metrics is None:
+            return await self.handle_query(scope, receive, None)
+
+        timer = metrics.RequestTimer()
+        status, headers, body = await self.handle_query(scope, receive, timer)
+        self.metrics.observe_request(
+            timer,
+            status,
+            headers.get('X-Cache', 'none').lower(),
+        )
+
+        return status, headers, body
+
+    async def handle_query(self, scope: dict, receive, timer: metrics.RequestTimer) -> tuple:
+        method = scope['method']
+        request_headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1')
+            for name, value in scope['headers']
+        }
+        args = dict(urllib.parse.parse_qsl(scope['query_string'].decode('utf-8')))
+        body = await read_body(receive)
+
+        # Every resolver in the request uses the same dataset
+        dataset = self.datasets.current if self.datasets is not None else None
+        pretty = bool(self.pretty or args.get('pretty'))
+
+        try:
+            data = parse_body(request_headers.get('content-type', ''), body)
+            data = view.apply_persisted_query(self.persisted_queries, data, args)
+
+            params = None
+            if isinstance(data, collections.abc.Mapping):
+                params = get_graphql_params(data, args)
+                if timer is not None:
+                    timer.params = params
+
+            key = None
+            if method in ('GET', 'POST') and params is not None:
+                key = view.response_cache_key(
+                    self.cache,
+                    params,
+                    dataset.version if dataset is not None else None,
+                    pretty,
+                )
+
+            if key is None:
+                body, status = await self.execute(scope, data, args, dataset, pretty, timer)
+                return status, {'Content-Type': 'application/json'}, body
+
+            etag = view.response_etag(key)
+            if method in ('GET', 'HEAD') and parse_etags(request_headers.get('if-none-match')).contains(etag):
+                return 304, self.validators(method, etag, dataset), b''
+
+            headers = {'Content-Type': 'application/json'}
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                body, status = cached
+                headers['X-Cache'] = 'HIT'
+                cacheable = True
+            else:
+                body, status = await self.execute(scope, data, args, dataset, pretty, timer)
+                cacheable = view.cacheable_response(body, status)
+                if self.cache is not None:
+                    if cacheable:
+                        self.cache.put(key, body, status)
+                    headers['X-Cache'] = 'MISS'
+
+            if cacheable:
+                headers.update(self.validators(method, etag, dataset))
+            else:
+                headers['Cache-Control'] = 'no-store'
+
+            return status, headers, body
+
+        except HttpQueryError as error:
+            headers = dict(error.headers or {})
+            headers['Content-Type'] = 'application/json'
+            body = json_encode({'errors': [default_format_error(error)]})
+            return error.status_code, headers, body.encode('utf-8')
+
+    def validators(self, method: str, etag: str, dataset) -> dict:
+        headers = {'ETag': quote_etag(etag)}
+        if dataset is not None:
+            headers['Last-Modified'] = http_date(dataset.last_modified)
+        if method == 'GET' and self.max_age:
+            headers['Cache-Control'] = f'public, max-age={self.max_age}'
+
+        return headers
+
+    async def execute(
+        self,
+        scope: dict,
+        data,
+        args: dict,
+        dataset,
+        pretty: bool,
+        timer: metrics.RequestTimer = None,
+    ) -> tuple:
+        """
+        Executes a query, and returns the encoded (body, status code) of the
+        response. The request is timed if `timer` isn't None.
+        """
+
+        backend = None
+        if self.cost_analyzer is not None:
+            backend = cost.CostLimitBackend(self.cost_analyzer, dataset)
+
+        middleware = self.middleware
+        if timer is not None:
+            # The timing middleware is the innermost, so it times offloaded
+            # resolvers in their worker thread.
+            backend = timer.backend(self.cost_analyzer, dataset)
+            middleware = MiddlewareManager(
+                metrics.ResolverTimingMiddleware(timer),
+                self.offload,
+                wrap_in_promise=False,
+            )
+
+        execution_results, _ = run_http_query(
+            self.schema,
+            scope['method'].lower(),
+            data,
+            query_data=args,
+            executor=AsyncioExecutor(asyncio.get_event_loop()),
+            return_promise=True,
+            backend=backend,
+            middleware=middleware,
+            context_value={'request': scope, 'dataset': dataset},
+        )
+
+        # The backend only times execution until it's first suspended
+        start = time.perf_counter()
+        execution_results = [await result for result in execution_results]
+        if timer is not None:
+            timer.add_phase('execute', time.perf_counter() - start)
+
+        start = time.perf_counter()
+        body, status = encode_execution_results(
+            execution_results,
+            format_error=default_format_error,
+            encode=functools.partial(json_encode, pretty=pretty),
+        )
+        if timer is not None:
+            timer.add_phase('serialize', time.perf_counter() - start)
+
+        return body.encode('utf-8'), status
+
+
+async def read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            return body
+
+
+def parse_body(content_type: str, body: bytes):
+    """
+    Parses the body of a request based on its content type, the same way as
+    flask_graphql.
+    """
+
+    content_type = content_type.split(';')[0].strip()
+    if content_type == 'application/graphql':
+        return {'query': body.decode('utf-8')}
+
+    if content_type == 'application/json':
+        return load_json_body(body.decode('utf-8'))
+
+    if content_type == 'application/x-www-form-urlencoded':
+        return dict(urllib.parse.parse_qsl(body.decode('utf-8')))
+
+    return {}
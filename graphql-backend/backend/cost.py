@@ -0,0 +1,297 @@
+import collections
+import functools
+
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult, execute
+from graphql.execution.values import get_argument_values
+from graphql.language import ast
+from graphql.language.base import parse
+from graphql.type.definition import GraphQLList, get_nullable_type
+from graphql.validation import validate
+from promise import is_thenable
+
+# The estimated length of the list fields that have selections, but no
+# estimate of their own
+DEFAULT_LIST_SIZE = 10
+
+
+class QueryCostAnalyzer:
+    """
+    Estimates the cost of a query before it's executed, in roughly the
+    number of fields that resolving it takes, so that expensive queries can
+    be rejected up front.
+
+    Every field costs 1, plus its entry in `field_costs`, plus the number of
+    items in its list arguments. The cost of a field's selections is
+    multiplied by the estimated length of the field, which is its entry in
+    `list_sizes`, or `default_list_size` for list fields without one. Both
+    map "ParentType.fieldName" to a function of the field's arguments (by
+    their Python names) and the dataset. Aliased fields and fragments are
+    counted every time they're selected, so costs grow with the depth of the
+    query and with every alias. Introspection fields cost 1, since their
+    results are bounded by the size of the schema.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        list_sizes: dict = None,
+        field_costs: dict = None,
+        default_list_size: int = DEFAULT_LIST_SIZE,
+    ):
+        self.budget = budget
+        self.list_sizes = list_sizes or {}
+        self.field_costs = field_costs or {}
+        self.default_list_size = default_list_size
+
+    def query_cost(self, schema, document_ast: ast.Document, variables: dict, operation_name: str, dataset) -> int:
+        """
+        Returns the estimated cost of the operation in a validated query
+        document.
+        """
+
+        operations = [
+            definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.OperationDefinition)
+        ]
+        if operation_name is not None:
+            operations = [
+                operation
+                for operation in operations
+                if operation.name and operation.name.value == operation_name
+            ]
+        if len(operations) != 1:
+            # The operation is ambiguous or missing, which execution reports
+            return 0
+
+        operation = operations[0]
+        if operation.operation == 'mutation':
+            root_type = schema.get_mutation_type()
+        elif operation.operation == 'subscription':
+            root_type = schema.get_subscription_type()
+        else:
+            root_type = schema.get_query_type()
+
+        analysis = _Analysis(self, schema, document_ast, variables or {}, dataset)
+        return analysis.selection_set_cost(root_type, operation.selection_set)
+
+
+class _Analysis:
+    """
+    The state of estimating the cost of a single query. The costs of named
+    fragments are only computed once, so that fragments that spread other
+    fragments several times can't make the analysis itself expensive.
+    """
+
+    def __init__(self, analyzer: QueryCostAnalyzer, schema, document_ast: ast.Document, variables: dict, dataset):
+        self.analyzer = analyzer
+        self.schema = schema
+        self.variables = variables
+        self.dataset = dataset
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+        self.fragment_costs = {}
+
+    def selection_set_cost(self, parent_type, selection_set: ast.SelectionSet) -> int:
+        if selection_set is None:
+            return 0
+
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                cost += self.field_cost(parent_type, selection)
+
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                cost += self.selection_set_cost(fragment_type, selection.selection_set)
+
+            elif isinstance(selection, ast.FragmentSpread):
+                cost += self.fragment_cost(selection.name.value)
+
+        return cost
+
+    def fragment_cost(self, name: str) -> int:
+        if name not in self.fragment_costs:
+            # Guards against cycles, although validation rejects them
+            self.fragment_costs[name] = 0
+            fragment = self.fragments[name]
+            self.fragment_costs[name] = self.selection_set_cost(
+                self.schema.get_type(fragment.type_condition.name.value),
+                fragment.selection_set,
+            )
+
+        return self.fragment_costs[name]
+
+    def field_cost(self, parent_type, field: ast.Field) -> int:
+        field_name = field.name.value
+        field_definitions = getattr(parent_type, 'fields', {})
+        if field_name.startswith('__') or field_name not in field_definitions:
+            return 1
+
+        field_definition = field_definitions[field_name]
+        try:
+            args = get_argument_values(field_definition.args, field.arguments, self.variables)
+        except GraphQLError:
+            # Invalid variables are reported by execution
+            args = {}
+
+        key = f'{parent_type.name}.{field_name}'
+        cost = 1 + sum(_list_items(value) for value in args.values())
+        if key in self.analyzer.field_costs:
+            cost += self.analyzer.field_costs[key](args, self.dataset)
+
+        if field.selection_set is None:
+            return cost
+
+        if key in self.analyzer.list_sizes:
+            list_size = self.analyzer.list_sizes[key](args, self.dataset)
+        elif isinstance(get_nullable_type(field_definition.type), GraphQLList):
+            list_size = self.analyzer.default_list_size
+        else:
+            list_size = 1
+
+        field_type = field_definition.type
+        while hasattr(field_type, 'of_type'):
+            field_type = field_type.of_type
+
+        return cost + list_size * self.selection_set_cost(field_type, field.selection_set)
+
+
+def _list_items(value) -> int:
+    """
+    Returns the total number of items in the lists in an argument value.
+    """
+
+    if isinstance(value, (list, tuple)):
+        return len(value) + sum(_list_items(item) for item in value)
+
+    if isinstance(value, dict):
+        return sum(_list_items(item) for item in value.values())
+
+    return 0
+
+
+class CostExecutionResult(ExecutionResult):
+    """
+    An ExecutionResult that includes its extensions when it's serialized,
+    which graphql-core leaves out.
+    """
+
+    __slots__ = ()
+
+    def to_dict(self, format_error=None, dict_class=collections.OrderedDict):
+        response = super().to_dict(format_error, dict_class)
+        if self.extensions:
+            response['extensions'] = self.extensions
+
+        return response
+
+
+def with_extensions(result: ExecutionResult, extensions: dict) -> CostExecutionResult:
+    return CostExecutionResult(
+        data=result.data,
+        errors=result.errors,
+        invalid=result.invalid,
+        extensions={**result.extensions, **extensions},
+    )
+
+
+class CostLimitBackend(GraphQLCoreBackend):
+    """
+    A GraphQL backend that estimates the cost of queries after they're
+    validated, with the `QueryCostAnalyzer`, and rejects the ones that are
+    over its budget before they're executed. The cost and the budget are
+    returned in the `cost` extension of the response. Queries aren't analyzed
+    if `analyzer` is None.
+
+    Parsing, validation, cost analysis and execution are separate methods,
+    so that subclasses can hook into each of them.
+    """
+
+    def __init__(self, analyzer: QueryCostAnalyzer = None, dataset=None, executor=None):
+        super().__init__(executor)
+        self.analyzer = analyzer
+        self.dataset = dataset
+
+    def document_from_string(self, schema, document_string):
+        document_ast = self.parse(document_string)
+        return GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=functools.partial(self.validate_and_execute, schema, document_ast, **self.execute_params),
+        )
+
+    def parse(self, document_string: str) -> ast.Document:
+        return parse(document_string)
+
+    def validate(self, schema, document_ast: ast.Document) -> list:
+        return validate(schema, document_ast)
+
+    def analyze(self, schema, document_ast: ast.Document, variables: dict, operation_name: str) -> int:
+        return self.analyzer.query_cost(schema, document_ast, variables, operation_name, self.dataset)
+
+    def execute(self, schema, document_ast: ast.Document, **kwargs):
+        return execute(schema, document_ast, **kwargs)
+
+    def validate_and_execute(
+        self,
+        schema,
+        document_ast: ast.Document,
+        root_value=None,
+        context_value=None,
+        variable_values: dict = None,
+        operation_name: str = None,
+        **kwargs,
+    ):
+        # flask_graphql passes the root and context values by their
+        # deprecated aliases, which `execute` warns about
+        if root_value is None:
+            root_value = kwargs.pop('root', None)
+        if context_value is None:
+            context_value = kwargs.pop('context', None)
+        kwargs.update(
+            root_value=root_value,
+            context_value=context_value,
+            variable_values=variable_values,
+            operation_name=operation_name,
+        )
+
+        validation_errors = self.validate(schema, document_ast)
+        if validation_errors:
+            return ExecutionResult(errors=validation_errors, invalid=True)
+
+        if self.analyzer is None:
+            return self.execute(schema, document_ast, **kwargs)
+
+        cost = self.analyze(schema, document_ast, variable_values, operation_name)
+        extensions = {
+            'cost': {
+                'requestedQueryCost': cost,
+                'maximumAvailable': self.analyzer.budget,
+            },
+        }
+
+        if cost > self.analyzer.budget:
+            return CostExecutionResult(
+                errors=[GraphQLError(
+                    f'Query cost of {cost} exceeds the maximum of {self.analyzer.budget}. '
+                    'Select fewer fields, request smaller pages or split the query.'
+                )],
+                invalid=True,
+                extensions=extensions,
+            )
+
+        result = self.execute(schema, document_ast, **kwargs)
+        if is_thenable(result):
+            return result.then(lambda result: with_extensions(result, extensions))
+
+        return with_extensions(result, extensions)
@@ -0,0 +1,141 @@
+"""
+Loads the recipe data into Datasets, and reloads it when the data file
+changes.
+
+A reload builds the new Dataset while the current one is still serving
+requests, and the old one is only freed once the requests that use it are
+done. While a reload is in progress the process holds two datasets, so its
+peak memory is about twice the memory of one Dataset. Size workers for that
+peak, or disable reloading.
+"""
+
+import datetime
+import os
+import threading
+import time
+
+import backend.indexes as indexes
+import backend.matrix as matrix
+import backend.models as models
+import backend.planner as planner
+import backend.search as search
+import backend.storage as storage
+
+
+class Dataset:
+    """
+    A snapshot of the recipe data, along with everything that's derived from
+    it: the indexes, the search index, the requirement matrix, the crafting
+    planner and the models. A dataset is never modified after it's built,
+    so a request can keep using the dataset that it started with while a
+    newer one is swapped in.
+
+    `version` has to change whenever the data changes, since it's part of
+    the response cache keys and ETags.
+    """
+
+    def __init__(self, recipe_data: dict, version: str):
+        self.version = version
+        self.last_modified = datetime.datetime.fromisoformat(recipe_data['utc_datetime'])
+        self.recipes = recipe_data['recipes']
+        self.raw_materials = recipe_data['raw_materials']
+        self.wiki_base_url = recipe_data['wiki_base_url']
+        self.recipe_index = indexes.RecipeIndex(self.recipes)
+        self.raw_material_index = indexes.SortedIndex(self.raw_materials, indexes.RAW_MATERIAL_SORT_KEYS)
+        self.search_index = search.SearchIndex(self.recipes, self.raw_materials)
+        self.requirements = matrix.RequirementMatrix(self.recipes, self.raw_materials)
+        self.planner = planner.CraftingPlanner(self.recipes, self.raw_materials, self.requirements)
+        self.models = models.ModelStore(self.recipes, self.raw_materials)
+
+        # The longest lists of references between recipes and raw materials,
+        # which are the list sizes that query costs are estimated with
+        self.max_materials = max((len(recipe['materials']) for recipe in self.recipes.values()), default=0)
+        self.max_raw_materials = max((len(recipe['raw_materials']) for recipe in self.recipes.values()), default=0)
+        self.max_depends_on = max((len(recipe['depends_on']) for recipe in self.recipes.values()), default=0)
+        self.max_used_in = max((len(raw_material['used_in']) for raw_material in self.raw_materials.values()), default=0)
+
+
+def load_dataset(filename: str) -> Dataset:
+    """
+    Loads a data file into a Dataset, see `storage.load_recipe_data`. The
+    version of the dataset is the scrape time of the data, followed by the
+    SHA-256 hash of the data file.
+    """
+
+    digest = storage.file_digest(filename)
+    recipe_data = storage.load_recipe_data(filename)
+    return Dataset(recipe_data, f"{recipe_data['utc_datetime']}/{digest}")
+
+
+class DatasetReloader:
+    """
+    Holds the current Dataset, and reloads the data file in a background
+    thread when it changes, so that new data can be published without
+    restarting the server.
+
+    The new dataset is loaded and indexed before it replaces `current` in a
+    single assignment, so requests never wait for a reload and never see a
+    partially loaded dataset. Its models are built on demand, like the
+    models of the first dataset, rather than all of them before the swap.
+    Requests should read `current` once and use that snapshot for the rest
+    of the request.
+
+    Publish new data files by renaming them over the old one, rather than
+    writing to the old one in place, so that a reload never reads a
+    partially written file.
+    """
+
+    def __init__(self, filename: str, interval: float = 30):
+        self.filename = filename
+        self.interval = interval
+
+        self._file_stat = self._stat()
+        self.current = load_dataset(filename)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _stat(self) -> tuple:
+        stat = os.stat(self.filename)
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def reload(self) -> bool:
+        """
+        Loads the data file if it changed since it was last loaded, and swaps
+        it in if its version is new. Returns whether the dataset was
+        replaced.
+        """
+
+        with self._lock:
+            file_stat = self._stat()
+            if file_stat == self._file_stat:
+                return False
+
+            # Files that fail to load are only retried once they change again
+            self._file_stat = file_stat
+            dataset = load_dataset(self.filename)
+            if dataset.version == self.current.version:
+                return False
+
+            self.current = dataset
+            return True
+
+    def start(self):
+        """
+        Starts watching the data file for changes, every `interval` seconds.
+        Does nothing if the interval is 0, or if the watcher is already
+        running.
+        """
+
+        if not self.interval or self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._watch, name='dataset-reloader', daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reload()
+            except Exception as error:
+                print(f"WARNING: Failed to reload {self.filename}: {error}")
@@ -0,0 +1,211 @@
+import collections
+import re
+
+import numpy as np
+
+
+def tokenize_source(source: str) -> set:
+    """
+    Splits the text of a recipe's source into lowercase word tokens. Some of
+    the sources scraped from the wiki are multiple sources that were joined
+    without a separator ("Message in a bottleIsland resident"), so words are
+    also split where a lowercase letter is followed by an uppercase letter.
+    """
+
+    if not source:
+        return set()
+
+    source = re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', source)
+    return set(re.findall(r'[a-z0-9]+', source.lower()))
+
+
+def profit_margin(recipe: dict) -> int:
+    """
+    Returns how many more bells a recipe sells for than its raw materials, or
+    None if its sell price or the value of its raw materials is unknown.
+    """
+
+    if recipe['sell_price'] is None or recipe['value_of_raw_materials'] is None:
+        return None
+
+    return recipe['sell_price'] - recipe['value_of_raw_materials']
+
+
+RECIPE_SORT_KEYS = {
+    'name': lambda recipe: recipe['name'],
+    'sell_price': lambda recipe: recipe['sell_price'],
+    'value_of_raw_materials': lambda recipe: recipe['value_of_raw_materials'],
+    'total_crafting_steps': lambda recipe: recipe['total_crafting_steps'],
+    'profit_margin': profit_margin,
+}
+
+RAW_MATERIAL_SORT_KEYS = {
+    'name': lambda raw_material: raw_material['name'],
+    'sell_price': lambda raw_material: raw_material['sell_price'],
+}
+
+
+class SortedIndex:
+    """
+    The positions of the rows of a table, pre-sorted by each of a few sort
+    keys in both directions, so that sorted (and filtered) results are read
+    from an index array instead of sorting the rows on every request.
+
+    Rows are ordered by table position when their values are equal, and rows
+    without a value always come last.
+    """
+
+    def __init__(self, rows: dict, sort_keys: dict):
+        self.ids = list(rows)
+        self.positions = {
+            row_id: position
+            for position, row_id in enumerate(self.ids)
+        }
+
+        table_order = np.arange(len(self.ids))
+        self.orders = {}
+        for sort_key, get_value in sort_keys.items():
+            values = [get_value(row) for row in rows.values()]
+            missing = np.array([value is None for value in values], dtype=bool)
+
+            # Ranks let values of any type be sorted in both directions
+            present_values = sorted(set(value for value in values if value is not None))
+            value_ranks = {value: rank for rank, value in enumerate(present_values)}
+            ranks = np.array([value_ranks.get(value, 0) for value in values], dtype=np.int64)
+
+            self.orders[(sort_key, False)] = np.lexsort((table_order, ranks, missing))
+            self.orders[(sort_key, True)] = np.lexsort((table_order, -ranks, missing))
+
+    def sorted_ids(self, sort_key: str = None, descending: bool = False, ids=None) -> list:
+        """
+        Returns the IDs of the rows, sorted by the sort key, or in table order
+        if `sort_key` is None. If `ids` is given, only the rows with those IDs
+        are returned, and unknown IDs are ignored.
+        """
+
+        if sort_key is None:
+            order = np.arange(len(self.ids))
+            if descending:
+                order = order[::-1]
+        else:
+            order = self.orders[(sort_key, descending)]
+
+        if ids is not None:
+            selected = np.zeros(len(self.ids), dtype=bool)
+            selected[[
+                self.positions[row_id]
+                for row_id in ids
+                if row_id in self.positions
+            ]] = True
+            order = order[selected[order]]
+
+        return [self.ids[position] for position in order]
+
+
+class RecipeIndex:
+    """
+    Inverted indexes over the recipe table, built once when the data is
+    loaded, so that recipe filters can be answered with set intersections
+    instead of scanning every recipe:
+
+    - raw material ID -> IDs of the recipes that require it, directly or
+      through the recipes that they depend on
+    - material ID -> IDs of the recipes that use it directly as a material
+    - source token -> IDs of the recipes with a source that contains it
+    - recipe ID -> IDs of the other recipes that depend on it
+
+    The recipes are also pre-sorted by each of the `RECIPE_SORT_KEYS`, see
+    `SortedIndex`.
+    """
+
+    def __init__(self, recipes: dict):
+        self.recipe_positions = {}
+        self.by_raw_material = collections.defaultdict(set)
+        self.by_material = collections.defaultdict(set)
+        self.by_source_token = collections.defaultdict(set)
+        self.dependents = collections.defaultdict(set)
+
+        for position, (recipe_id, recipe) in enumerate(recipes.items()):
+            self.recipe_positions[recipe_id] = position
+
+            for raw_material_id in recipe['raw_materials']:
+                self.by_raw_material[raw_material_id].add(recipe_id)
+
+            for material in recipe['materials']:
+                self.by_material[material['id']].add(recipe_id)
+
+            for token in tokenize_source(recipe['source']):
+                self.by_source_token[token].add(recipe_id)
+
+            for depends_on_id in recipe['depends_on']:
+                if depends_on_id != recipe_id:
+                    self.dependents[depends_on_id].add(recipe_id)
+
+        self.sorted = SortedIndex(recipes, RECIPE_SORT_KEYS)
+
+        # Prevents lookups of unknown keys from growing the indexes
+        for index in (self.by_raw_material, self.by_material, self.by_source_token, self.dependents):
+            index.default_factory = None
+
+    def _lookup(self, index: dict, key: str) -> set:
+        return index.get(key, set())
+
+    def filter_recipes(
+        self,
+        raw_material_ids: list = None,
+        match_all_raw_materials: bool = True,
+        direct_only: bool = False,
+        depends_on_recipe_id: str = None,
+        source: str = None,
+    ) -> set:
+        """
+        Returns the IDs of the recipes that match all of the given filters,
+        or None if no filters were given.
+
+        - `raw_material_ids`: recipes that use all (or any, if
+          `match_all_raw_materials` is False) of the raw materials. If
+          `direct_only` is set, only materials that are listed in the recipe
+          itself count, otherwise raw materials that are required by the
+          recipes that it depends on count as well.
+        - `depends_on_recipe_id`: recipes that depend on the recipe, directly
+          or indirectly.
+        - `source`: recipes with a source that contains all of the words in
+          `source`, ignoring case.
+        """
+
+        matches = []
+
+        if raw_material_ids:
+            index = self.by_material if direct_only else self.by_raw_material
+            raw_material_matches = [
+                self._lookup(index, raw_material_id)
+                for raw_material_id in raw_material_ids
+            ]
+
+            if match_all_raw_materials:
+                matches += raw_material_matches
+            else:
+                matches.append(set().union(*raw_material_matches))
+
+        if depends_on_recipe_id:
+            matches.append(self._lookup(self.dependents, depends_on_recipe_id))
+
+        if source is not None:
+            matches += [
+                self._lookup(self.by_source_token, token)
+                for token in tokenize_source(source)
+            ]
+
+        if not matches:
+            return None
+
+        # Intersect starting from the smallest set
+        matches.sort(key=len)
+        return matches[0].intersection(*matches[1:])
+
+    def in_table_order(self, recipe_ids: set) -> list:
+        """
+        Sorts a set of recipe IDs by the order of the recipe table.
+        """
+
+        return sorted(recipe_ids, key=self.recipe_positions.__getitem__)
@@ -0,0 +1,61 @@
+from promise import Promise
+from promise.dataloader import DataLoader
+
+
+class RecipeLoader(DataLoader):
+    """
+    Loads recipe models by ID from a `models.ModelStore`, in batches. IDs
+    that aren't recipes load as None.
+    """
+
+    def __init__(self, models):
+        super().__init__()
+        self.models = models
+
+    def batch_load_fn(self, recipe_ids):
+        return Promise.resolve(self.models.recipes_by_id(recipe_ids))
+
+
+class RawMaterialLoader(DataLoader):
+    """
+    Loads raw material models by ID from a `models.ModelStore`, in batches.
+    IDs that aren't raw materials load as None.
+    """
+
+    def __init__(self, models):
+        super().__init__()
+        self.models = models
+
+    def batch_load_fn(self, raw_material_ids):
+        return Promise.resolve(self.models.raw_materials_by_id(raw_material_ids))
+
+
+class Loaders:
+    """
+    The loaders of a single request. Every recipe or raw material that's
+    referenced by ID anywhere in a query is loaded once, in batches with the
+    other references that are resolved at the same time, no matter how many
+    times it's referenced.
+    """
+
+    def __init__(self, models):
+        self.models = models
+        self.recipes = RecipeLoader(models)
+        self.raw_materials = RawMaterialLoader(models)
+
+
+def get_loaders(info, models) -> Loaders:
+    """
+    Returns the loaders of the request, which are created the first time
+    that they're needed and kept in the request's context. Queries that are
+    executed without a context dict get new loaders for every field.
+    """
+
+    if not isinstance(info.context, dict):
+        return Loaders(models)
+
+    loaders = info.context.get('loaders', None)
+    if loaders is None or loaders.models is not models:
+        loaders = info.context['loaders'] = Loaders(models)
+
+    return loaders
@@ -0,0 +1,231 @@
+import numpy as np
+
+
+CRAFTABLE_QUANTITIES_BLOCK_SIZE = 256
+
+
+class RequirementMatrix:
+    """
+    The total quantity of each raw material that is required to craft each
+    recipe, as a sparse recipe x raw material matrix in compressed sparse row
+    form: the requirements of recipe `i` are the raw material columns
+    `indices[indptr[i]:indptr[i + 1]]` with the quantities
+    `data[indptr[i]:indptr[i + 1]]`.
+
+    Built once when the data is loaded, so that questions about an inventory
+    of raw materials can be answered for every recipe at once with a few
+    vectorized operations.
+    """
+
+    def __init__(self, recipes: dict, raw_materials: dict):
+        self.recipe_ids = list(recipes)
+        self.raw_material_ids = list(raw_materials)
+        self.raw_material_positions = {
+            raw_material_id: position
+            for position, raw_material_id in enumerate(self.raw_material_ids)
+        }
+
+        indptr = [0]
+        indices = []
+        data = []
+        for recipe in recipes.values():
+            for raw_material_id, raw_material_ref in recipe['raw_materials'].items():
+                indices.append(self.raw_material_positions[raw_material_id])
+                data.append(raw_material_ref['quantity'])
+            indptr.append(len(indices))
+
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.data = np.array(data, dtype=np.float64)
+
+        # np.minimum.reduceat can't reduce empty segments, so recipes without
+        # any raw materials are excluded from the reductions.
+        self._has_requirements = self.indptr[1:] > self.indptr[:-1]
+        self._segment_starts = self.indptr[:-1][self._has_requirements]
+
+        # The recipes that each recipe depends on, including itself, in the
+        # same sparse form as the raw material requirements, so memory grows
+        # with the number of dependencies rather than with the square of the
+        # number of recipes. `depends_on` is already closed over the recipes'
+        # materials by the data pipeline.
+        recipe_positions = {
+            recipe_id: position
+            for position, recipe_id in enumerate(self.recipe_ids)
+        }
+        depends_on_indptr = [0]
+        depends_on_indices = []
+        for position, recipe in enumerate(recipes.values()):
+            depends_on_indices.append(position)
+            depends_on_indices.extend(
+                recipe_positions[depends_on_id]
+                for depends_on_id in recipe['depends_on']
+                if depends_on_id in recipe_positions and recipe_positions[depends_on_id] != position
+            )
+            depends_on_indptr.append(len(depends_on_indices))
+
+        self.recipe_positions = recipe_positions
+        self.depends_on_indptr = np.array(depends_on_indptr, dtype=np.int64)
+        self.depends_on_indices = np.array(depends_on_indices, dtype=np.int64)
+
+        # The number of crafts of each recipe that it takes to craft each
+        # recipe, including itself, in the same sparse form as the raw
+        # material requirements. Materials that are recipes are the recipes
+        # in `depends_on`, and each recipe depends on fewer recipes than the
+        # recipes that depend on it, so the recipes are built in that order.
+        # Recipes that can be crafted from each other depend on each other,
+        # and like in the data pipeline, the materials that complete the
+        # cycle aren't crafted, so each recipe in the cycle only takes one
+        # craft of itself, which matches its `total_crafting_steps`.
+        crafts = {}
+        for recipe_id in sorted(recipes, key=lambda recipe_id: len(recipes[recipe_id]['depends_on'])):
+            recipe = recipes[recipe_id]
+            recipe_crafts = {recipe_positions[recipe_id]: 1}
+            for material in recipe['materials']:
+                if material['id'] in crafts and recipe_id not in recipes[material['id']]['depends_on']:
+                    for position, quantity in crafts[material['id']].items():
+                        recipe_crafts[position] = recipe_crafts.get(position, 0) + material['quantity'] * quantity
+            crafts[recipe_id] = recipe_crafts
+
+        crafts_indptr = [0]
+        crafts_indices = []
+        crafts_data = []
+        for recipe_id in self.recipe_ids:
+            crafts_indices.extend(crafts[recipe_id].keys())
+            crafts_data.extend(crafts[recipe_id].values())
+            crafts_indptr.append(len(crafts_indices))
+
+        self.crafts_indptr = np.array(crafts_indptr, dtype=np.int64)
+        self.crafts_indices = np.array(crafts_indices, dtype=np.int64)
+        self.crafts_data = np.array(crafts_data, dtype=np.int64)
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.recipe_ids), len(self.raw_material_ids)
+
+    def to_dense(self, recipe_positions: np.ndarray = None) -> np.ndarray:
+        """
+        Returns the requirements as a dense recipe x raw material matrix, or
+        only the rows of the given recipe positions, in that order.
+        """
+
+        if recipe_positions is None:
+            recipe_positions = np.arange(len(self.recipe_ids))
+
+        lengths = np.diff(self.indptr)[recipe_positions]
+        rows = np.repeat(np.arange(len(recipe_positions)), lengths)
+        # The positions of the requirements of each row in `indices`
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        requirements = np.repeat(self.indptr[:-1][recipe_positions], lengths) + offsets
+
+        dense = np.zeros((len(recipe_positions), len(self.raw_material_ids)), dtype=np.float64)
+        dense[rows, self.indices[requirements]] = self.data[requirements]
+        return dense
+
+    def inventory_vector(self, raw_material_quantities: dict) -> np.ndarray:
+        """
+        Converts a dict of raw material IDs to quantities on hand to a vector
+        that is indexed by the matrix's raw material columns. Unknown raw
+        materials are ignored.
+        """
+
+        return self.inventory_matrix([raw_material_quantities])[0]
+
+    def inventory_matrix(self, inventories: list) -> np.ndarray:
+        """
+        Converts a list of inventories, each a dict of raw material IDs to
+        quantities on hand, to a matrix with one row per inventory and one
+        column per raw material. Unknown raw materials are ignored.
+        """
+
+        matrix = np.zeros((len(inventories), len(self.raw_material_ids)), dtype=np.float64)
+        for row, raw_material_quantities in enumerate(inventories):
+            for raw_material_id, quantity in raw_material_quantities.items():
+                position = self.raw_material_positions.get(raw_material_id, None)
+                if position is not None:
+                    matrix[row, position] = quantity or 0
+
+        return matrix
+
+    def recipe_vector(self, recipe_quantities: dict) -> np.ndarray:
+        """
+        Converts a dict of recipe IDs to quantities to a vector that is
+        indexed by the matrix's recipe rows. Unknown recipes are ignored.
+        """
+
+        vector = np.zeros(len(self.recipe_ids), dtype=np.int64)
+        for recipe_id, quantity in recipe_quantities.items():
+            position = self.recipe_positions.get(recipe_id, None)
+            if position is not None:
+                vector[position] += quantity or 0
+
+        return vector
+
+    def required_raw_materials(self, recipe_quantities: np.ndarray) -> np.ndarray:
+        """
+        Returns the total quantity of each raw material that's required to
+        craft the recipe quantities, indexed by raw material column.
+        """
+
+        return np.bincount(
+            self.indices,
+            weights=self.data * np.repeat(recipe_quantities, np.diff(self.indptr)),
+            minlength=len(self.raw_material_ids),
+        )
+
+    def required_crafts(self, recipe_quantities: np.ndarray) -> np.ndarray:
+        """
+        Returns the total number of crafts of each recipe that it takes to
+        craft the recipe quantities, including the recipes that are crafted
+        to be used as materials, indexed by recipe row.
+        """
+
+        return np.bincount(
+            self.crafts_indices,
+            weights=self.crafts_data * np.repeat(recipe_quantities, np.diff(self.crafts_indptr)),
+            minlength=len(self.recipe_ids),
+        ).astype(np.int64)
+
+    def available_recipes(self, owned_recipe_ids: list) -> np.ndarray:
+        """
+        Returns a mask of the recipes that can be crafted by a player that
+        only knows the given recipes, which are the recipes that only depend
+        on owned recipes, directly or indirectly. Unknown recipe IDs are
+        ignored.
+        """
+
+        owned = np.zeros(len(self.recipe_ids), dtype=bool)
+        for recipe_id in owned_recipe_ids:
+            position = self.recipe_positions.get(recipe_id, None)
+            if position is not None:
+                owned[position] = True
+
+        # Every recipe depends on itself, so none of the segments are empty
+        return np.logical_and.reduceat(owned[self.depends_on_indices], self.depends_on_indptr[:-1])
+
+    def craftable_quantities(self, inventory: np.ndarray) -> np.ndarray:
+        """
+        Calculates the maximum number of each recipe that can be crafted from
+        the inventory, in isolation, as the minimum over the recipe's raw
+        materials of `int(quantity_on_hand / quantity_required)`. Recipes that
+        don't require any raw materials can't be crafted.
+
+        `inventory` is either a single inventory vector, or a matrix of
+        inventories (see `inventory_matrix`), in which case the result has one
+        row of craftable quantities per inventory.
+        """
+
+        if inventory.ndim == 1:
+            return self.craftable_quantities(inventory[np.newaxis, :])[0]
+
+        craftable = np.zeros((len(inventory), len(self.recipe_ids)), dtype=np.int64)
+        if not len(self._segment_starts):
+            return craftable
+
+        # Bounds the size of the intermediate inventories x requirements
+        # matrix for large batches.
+        for start in range(0, len(inventory), CRAFTABLE_QUANTITIES_BLOCK_SIZE):
+            block = slice(start, start + CRAFTABLE_QUANTITIES_BLOCK_SIZE)
+            ratios = np.trunc(inventory[block][:, self.indices] / self.data)
+            craftable[block, self._has_requirements] = np.minimum.reduceat(ratios, self._segment_starts, axis=1)
+
+        return craftable
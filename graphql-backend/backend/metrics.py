@@ -0,0 +1,332 @@
+import bisect
+import collections
+import json
+import threading
+import time
+
+from graphql.backend.base import GraphQLBackend
+from graphql.execution.middleware import MiddlewareManager
+
+import backend.cost as cost
+
+# Upper bounds, in seconds, of the buckets of the duration histograms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PHASES = ('parse', 'validate', 'execute', 'serialize')
+
+# The content type of the Prometheus text format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The number of resolvers with the most total time that are included in the
+# slow query log
+SLOW_QUERY_RESOLVERS = 5
+
+
+class Histogram:
+    """
+    A Prometheus-style histogram of durations. Not thread-safe on its own,
+    `Metrics` guards every histogram with its lock.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: dict) -> list:
+        """
+        Returns the (name, labels, value) samples of the histogram, with
+        cumulative bucket counts.
+        """
+
+        samples = []
+        cumulative_count = 0
+        for upper_bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative_count += count
+            samples.append((f'{name}_bucket', {**labels, 'le': str(upper_bound)}, cumulative_count))
+
+        samples.append((f'{name}_sum', labels, self.sum))
+        samples.append((f'{name}_count', labels, self.count))
+        return samples
+
+
+class RequestTimer:
+    """
+    Collects the timings of a single request: the time spent in each phase
+    of handling the query, and the duration of every resolver call.
+    Resolvers can run on several threads when they're offloaded, see
+    `async_view.OffloadMiddleware`, so resolver timings are appended to a
+    list, which doesn't need a lock, and only summed up by field once the
+    request is done.
+
+    `params` are the `RequestParams` of the request, if it has any, for the
+    slow query log.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.params = None
+        self.phases = collections.defaultdict(float)
+        self.resolver_timings = []
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def add_phase(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    def resolvers(self) -> dict:
+        """
+        Returns the (number of calls, total seconds) of the resolver of each
+        field, by "ParentType.fieldName".
+        """
+
+        totals = collections.defaultdict(lambda: [0, 0.0])
+        for parent_type, field_name, seconds in self.resolver_timings:
+            total = totals[parent_type, field_name]
+            total[0] += 1
+            total[1] += seconds
+
+        return {
+            f'{parent_type}.{field_name}': tuple(total)
+            for (parent_type, field_name), total in totals.items()
+        }
+
+    def backend(self, analyzer: cost.QueryCostAnalyzer = None, dataset=None) -> GraphQLBackend:
+        return TimingBackend(self, analyzer, dataset)
+
+    def middleware(self) -> MiddlewareManager:
+        # Middleware is wrapped in promises by default, which is much slower
+        return MiddlewareManager(ResolverTimingMiddleware(self), wrap_in_promise=False)
+
+
+class ResolverTimingMiddleware:
+    """
+    Graphene middleware that records the time spent in the resolver of every
+    field in a `RequestTimer`, by "ParentType.fieldName".
+    """
+
+    def __init__(self, timer: RequestTimer):
+        self.timings = timer.resolver_timings
+
+    def resolve(self, next, root, info, **args):
+        start = time.perf_counter()
+        try:
+            return next(root, info, **args)
+        finally:
+            self.timings.append((info.parent_type.name, info.field_name, time.perf_counter() - start))
+
+
+class TimingBackend(cost.CostLimitBackend):
+    """
+    A GraphQL backend that records the time spent parsing, validating and
+    executing a query in a `RequestTimer`. Cost analysis counts as
+    validation. Queries that are executed asynchronously only record the time
+    until execution is suspended.
+    """
+
+    def __init__(self, timer: RequestTimer, analyzer: cost.QueryCostAnalyzer = None, dataset=None, executor=None):
+        super().__init__(analyzer, dataset, executor)
+        self.timer = timer
+
+    def parse(self, document_string):
+        start = time.perf_counter()
+        try:
+            return super().parse(document_string)
+        finally:
+            self.timer.add_phase('parse', time.perf_counter() - start)
+
+    def validate(self, schema, document_ast):
+        start = time.perf_counter()
+        try:
+            return super().validate(schema, document_ast)
+        finally:
+            self.timer.add_phase('validate', time.perf_counter() - start)
+
+    def analyze(self, schema, document_ast, variables, operation_name):
+        start = time.perf_counter()
+        try:
+            return super().analyze(schema, document_ast, variables, operation_name)
+        finally:
+            self.timer.add_phase('validate', time.perf_counter() - start)
+
+    def execute(self, schema, document_ast, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().execute(schema, document_ast, *args, **kwargs)
+        finally:
+            self.timer.add_phase('execute', time.perf_counter() - start)
+
+
+class Metrics:
+    """
+    Thread-safe request and resolver metrics for the GraphQL API, rendered
+    in the Prometheus text format by `render`:
+
+    - `graphql_request_duration_seconds`: a histogram of the duration of
+      requests, by status code and whether they were served from the response
+      cache.
+    - `graphql_phase_duration_seconds`: a histogram of the time spent
+      parsing, validating, executing and serializing queries.
+    - `graphql_resolver_duration_seconds`: the number of calls to and the
+      total time spent in the resolver of each field.
+
+    Requests that take longer than `slow_query_threshold` seconds are logged
+    with their query, variables and timings. 0 disables the slow query log.
+    """
+
+    def __init__(self, slow_query_threshold: float = 0, buckets: tuple = DEFAULT_BUCKETS):
+        self.slow_query_threshold = slow_query_threshold
+        self.buckets = buckets
+        self._request_durations = {}
+        self._phase_durations = {}
+        self._resolver_calls = collections.defaultdict(int)
+        self._resolver_seconds = collections.defaultdict(float)
+        self._slow_queries = 0
+        self._lock = threading.Lock()
+
+    def _histogram(self, histograms: dict, labels: tuple) -> Histogram:
+        histogram = histograms.get(labels, None)
+        if histogram is None:
+            histogram = histograms[labels] = Histogram(self.buckets)
+
+        return histogram
+
+    def observe_request(self, timer: RequestTimer, status_code: int, cache_status: str):
+        """
+        Records the timings of a finished request. `cache_status` is "hit",
+        "miss" or "none", if the response wasn't cacheable.
+        """
+
+        seconds = timer.elapsed()
+        resolvers = timer.resolvers()
+        with self._lock:
+            self._histogram(self._request_durations, (str(status_code), cache_status)).observe(seconds)
+            for phase, phase_seconds in timer.phases.items():
+                self._histogram(self._phase_durations, (phase,)).observe(phase_seconds)
+            for field, (calls, field_seconds) in resolvers.items():
+                self._resolver_calls[field] += calls
+                self._resolver_seconds[field] += field_seconds
+
+            slow = self.slow_query_threshold and seconds >= self.slow_query_threshold
+            if slow:
+                self._slow_queries += 1
+
+        if slow:
+            self.log_slow_query(timer, seconds, status_code, resolvers)
+
+    def log_slow_query(self, timer: RequestTimer, seconds: float, status_code: int, resolvers: dict):
+        params = timer.params
+        slowest_resolvers = sorted(resolvers, key=lambda field: resolvers[field][1], reverse=True)
+        print(f'WARNING: Slow query took {seconds:.3f}s: ' + json.dumps({
+            'status_code': status_code,
+            'query': params.query if params else None,
+            'variables': params.variables if params else None,
+            'operation_name': params.operation_name if params else None,
+            'phases': dict(timer.phases),
+            'resolvers': {
+                field: {
+                    'calls': resolvers[field][0],
+                    'seconds': resolvers[field][1],
+                }
+                for field in slowest_resolvers[:SLOW_QUERY_RESOLVERS]
+            },
+        }, default=str), flush=True)
+
+    def render(self, response_cache=None, dataset=None) -> str:
+        """
+        Renders the metrics in the Prometheus text format, along with the
+        statistics of the response cache and the version of the dataset.
+        """
+
+        families = []
+        with self._lock:
+            families.append((
+                'graphql_request_duration_seconds', 'histogram', 'Duration of GraphQL requests.',
+                [
+                    sample
+                    for (status_code, cache_status), histogram in sorted(self._request_durations.items())
+                    for sample in histogram.samples(
+                        'graphql_request_duration_seconds',
+                        {'status_code': status_code, 'cache': cache_status},
+                    )
+                ],
+            ))
+            families.append((
+                'graphql_phase_duration_seconds', 'histogram', 'Time spent in each phase of handling GraphQL queries.',
+                [
+                    sample
+                    for (phase,), histogram in sorted(self._phase_durations.items(), key=lambda item: PHASES.index(item[0][0]))
+                    for sample in histogram.samples('graphql_phase_duration_seconds', {'phase': phase})
+                ],
+            ))
+            families.append((
+                'graphql_resolver_duration_seconds', 'summary', 'Time spent in the resolver of each field.',
+                [
+                    sample
+                    for field in sorted(self._resolver_calls)
+                    for sample in (
+                        ('graphql_resolver_duration_seconds_sum', {'field': field}, self._resolver_seconds[field]),
+                        ('graphql_resolver_duration_seconds_count', {'field': field}, self._resolver_calls[field]),
+                    )
+                ],
+            ))
+            families.append((
+                'graphql_slow_queries_total', 'counter', 'Number of queries that were logged as slow.',
+                [('graphql_slow_queries_total', {}, self._slow_queries)],
+            ))
+
+        if response_cache is not None:
+            stats = response_cache.stats()
+            for stat, metric_type, help_text in (
+                ('hits', 'counter', 'Number of responses served from the response cache.'),
+                ('misses', 'counter', 'Number of cacheable responses that weren\'t in the response cache.'),
+                ('evictions', 'counter', 'Number of responses evicted from the response cache.'),
+                ('entries', 'gauge', 'Number of responses in the response cache.'),
+                ('size', 'gauge', 'Total size of the responses in the response cache, in bytes.'),
+            ):
+                name = f'graphql_response_cache_{stat}' + ('_total' if metric_type == 'counter' else '')
+                families.append((name, metric_type, help_text, [(name, {}, stats[stat])]))
+
+        if dataset is not None:
+            families.append((
+                'graphql_dataset_info', 'gauge', 'The version of the recipe data that is being served.',
+                [('graphql_dataset_info', {'version': dataset.version}, 1)],
+            ))
+
+        lines = []
+        for name, metric_type, help_text, samples in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'),
+        )
+        for name, value in labels.items()
+    ) + '}'
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return repr(value)
+
+    return str(value)
@@ -1,5 +1,9 @@
+import collections.abc
+
 import graphene
 
+import backend.loaders as loaders
+
 
 class RawMaterial(graphene.ObjectType):
     id = graphene.ID()
@@ -7,8 +11,16 @@ class RawMaterial(graphene.ObjectType):
     uri = graphene.String()
     image_url = graphene.String()
     used_in = graphene.List(graphene.String)
+    used_in_recipes = graphene.List(lambda: Recipe, description="The recipes that use the raw material, directly or through the recipes they're crafted from.")
     sell_price = graphene.Int()
 
+    # The ModelStore that the model belongs to, which the models that it
+    # references are loaded from
+    _models = None
+
+    def resolve_used_in_recipes(self, info):
+        return loaders.get_loaders(info, self._models).recipes.load_many(self.used_in)
+
 
 class Recipe(graphene.ObjectType):
     id = graphene.String()
@@ -20,6 +32,7 @@ class Recipe(graphene.ObjectType):
     sell_price = graphene.Int()
     total_crafting_steps = graphene.Int()
     depends_on = graphene.List(graphene.String)
+    depends_on_recipes = graphene.List(lambda: Recipe, description="The recipes that the recipe depends on: itself, and the recipes that it's crafted from, directly or through its other materials.")
     value_of_raw_materials = graphene.Int()
 
     class MaterialRef(graphene.ObjectType):
@@ -27,6 +40,16 @@ class Recipe(graphene.ObjectType):
         name = graphene.String()
         quantity = graphene.Int()
         uri = graphene.String()
+        recipe = graphene.Field(lambda: Recipe, description="The material's recipe, if the material is crafted.")
+        raw_material = graphene.Field(RawMaterial, description="The raw material, if the material isn't crafted.")
+
+        _models = None
+
+        def resolve_recipe(self, info):
+            return loaders.get_loaders(info, self._models).recipes.load(self.id)
+
+        def resolve_raw_material(self, info):
+            return loaders.get_loaders(info, self._models).raw_materials.load(self.id)
 
     class RawMaterialRef(RawMaterial):
         quantity = graphene.Int()
@@ -34,6 +57,47 @@ class Recipe(graphene.ObjectType):
     materials = graphene.List(MaterialRef)
     raw_materials = graphene.List(RawMaterialRef)
 
+    # The plain-dict recipe and raw materials that the nested fields are built
+    # from, only when they're requested.
+    _recipe = None
+    _raw_materials = None
+    _material_models = None
+    _raw_material_models = None
+    _models = None
+
+    def resolve_materials(self, info):
+        if self._material_models is None:
+            material_models = [
+                Recipe.MaterialRef(**material)
+                for material in self._recipe['materials']
+            ]
+            for material_model in material_models:
+                material_model._models = self._models
+
+            self._material_models = material_models
+
+        return self._material_models
+
+    def resolve_raw_materials(self, info):
+        if self._raw_material_models is None:
+            raw_material_models = [
+                Recipe.RawMaterialRef(
+                    **self._raw_materials[raw_material_id],
+                    quantity=raw_material_ref['quantity'],
+                )
+                for raw_material_id, raw_material_ref in
+                self._recipe['raw_materials'].items()
+            ]
+            for raw_material_model in raw_material_models:
+                raw_material_model._models = self._models
+
+            self._raw_material_models = raw_material_models
+
+        return self._raw_material_models
+
+    def resolve_depends_on_recipes(self, info):
+        return loaders.get_loaders(info, self._models).recipes.load_many(self.depends_on)
+
     estimated_sell_price = graphene.Field(
         graphene.Int,
         deprecation_reason="Superceded by valueOfRawMaterials property."
@@ -76,28 +140,130 @@ def get_recipe(recipes: dict, raw_materials: dict, recipe_id: str) -> Recipe:
 def convert_recipe(raw_materials: dict, recipe: dict) -> Recipe:
     """
     Converts the plain-dict recipe to a Recipe model. Requires the
-    raw_materials dictionary.
+    raw_materials dictionary. The `materials` and `raw_materials` of the
+    model are only converted when a query selects them.
     """
 
-    materials = [
-        Recipe.MaterialRef(**material)
-        for material in recipe['materials']
-    ]
-
-    raw_materials = [
-        Recipe.RawMaterialRef(
-            **raw_materials[raw_material_id],
-            quantity=raw_material_ref['quantity'],
-        )
-        for raw_material_id, raw_material_ref in
-        recipe['raw_materials'].items()
-    ]
-
-    return Recipe(**{
-        k: (
-            materials if k == 'materials' else
-            raw_materials if k == 'raw_materials' else
-            v
-        )
+    model = Recipe(**{
+        k: v
         for k,v in recipe.items()
+        if k not in ('materials', 'raw_materials')
     })
+
+    model._recipe = recipe
+    model._raw_materials = raw_materials
+    return model
+
+
+class ModelList(collections.abc.Sequence):
+    """
+    A read-only list of models that are only converted when they're accessed,
+    so that paginated queries only convert the models on the page.
+    """
+
+    def __init__(self, ids: list, get_model):
+        self._ids = ids
+        self._get_model = get_model
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get_model(_id) for _id in self._ids[index]]
+
+        return self._get_model(self._ids[index])
+
+
+class ModelStore:
+    """
+    Converts each recipe and raw material to a model the first time that it's
+    requested, and then shares the same model between every request, along
+    with the lists of all recipes and raw materials. Models are only built on
+    demand, so queries that only need a few recipes don't convert all of them.
+
+    The models are shared, so they must be treated as read-only. The recipes
+    and raw materials that models reference by ID are loaded from the store
+    that they belong to, see `loaders.Loaders`.
+    """
+
+    def __init__(self, recipes: dict, raw_materials: dict):
+        self._recipes = recipes
+        self._raw_materials = raw_materials
+        self._recipe_models = {}
+        self._raw_material_models = {}
+        self._all_recipes = None
+        self._all_raw_materials = None
+
+    def recipe(self, recipe_id: str) -> Recipe:
+        model = self._recipe_models.get(recipe_id, None)
+        if model is None:
+            model = get_recipe(self._recipes, self._raw_materials, recipe_id)
+            model._models = self
+            self._recipe_models[recipe_id] = model
+
+        return model
+
+    def raw_material(self, raw_material_id: str) -> RawMaterial:
+        model = self._raw_material_models.get(raw_material_id, None)
+        if model is None:
+            model = get_raw_material(self._raw_materials, raw_material_id)
+            model._models = self
+            self._raw_material_models[raw_material_id] = model
+
+        return model
+
+    def all_recipes(self) -> list:
+        """
+        Returns the models of every recipe, in the order of the recipe table.
+        """
+
+        if self._all_recipes is None:
+            self._all_recipes = [
+                self.recipe(recipe_id)
+                for recipe_id in self._recipes
+            ]
+
+        return self._all_recipes
+
+    def all_raw_materials(self) -> list:
+        """
+        Returns the models of every raw material, in the order of the raw
+        material table.
+        """
+
+        if self._all_raw_materials is None:
+            self._all_raw_materials = [
+                self.raw_material(raw_material_id)
+                for raw_material_id in self._raw_materials
+            ]
+
+        return self._all_raw_materials
+
+    def recipes(self, recipe_ids: list) -> ModelList:
+        return ModelList(recipe_ids, self.recipe)
+
+    def raw_materials(self, raw_material_ids: list) -> ModelList:
+        return ModelList(raw_material_ids, self.raw_material)
+
+    def recipes_by_id(self, recipe_ids: list) -> list:
+        """
+        Returns the model of each recipe ID, or None for IDs that aren't
+        recipes.
+        """
+
+        return [
+            self.recipe(recipe_id) if recipe_id in self._recipes else None
+            for recipe_id in recipe_ids
+        ]
+
+    def raw_materials_by_id(self, raw_material_ids: list) -> list:
+        """
+        Returns the model of each raw material ID, or None for IDs that aren't
+        raw materials.
+        """
+
+        return [
+            self.raw_material(raw_material_id) if raw_material_id in self._raw_materials else None
+            for raw_material_id in raw_material_ids
+        ]
@@ -0,0 +1,1100 @@
+import collections
+import heapq
+import itertools
+import math
+import threading
+import time
+
+import numpy as np
+
+import backend.matrix as matrix
+
+
+# Search limit for the branch and bound solver. Plans found within the limit
+# are always feasible, they just might not be proven optimal.
+DEFAULT_NODE_LIMIT = 200
+SIMPLEX_ITERATION_LIMIT = 5000
+LAGRANGIAN_ITERATION_LIMIT = 50
+
+# Wall-clock limit, in seconds, on finding a plan or a frontier, so that
+# queries stay interactive. Once it's reached, the best plans found so far
+# are returned, and they aren't proven optimal.
+DEFAULT_TIME_LIMIT = 0.25
+
+# Knapsack tables up to this capacity take a few milliseconds at most, so
+# they're completed even once the deadline has passed, which keeps the plans
+# that are returned when the time is up close to the best plans
+KNAPSACK_DEADLINE_CAPACITY = 4096
+
+# Hill climbs take a few dozen moves at most, unless the inventory is huge, so
+# they can make this many more once the deadline has passed
+IMPROVE_MOVES_AFTER_DEADLINE = 256
+
+# Search limits for the corners of the Pareto frontier between crafting
+# nothing and the most profitable plan, which can take dozens of searches
+HULL_NODE_LIMIT = 0
+HULL_LAGRANGIAN_ITERATION_LIMIT = 10
+
+# Cached hulls, per planner
+PLAN_CACHE_SIZE = 256
+
+# Recipes per block when candidates are compared with each other, which
+# bounds the size of the recipes x recipes x raw materials comparison
+DOMINANCE_BLOCK_SIZE = 64
+
+OBJECTIVE_TOTAL_SELL_PRICE = 'total_sell_price'
+OBJECTIVE_PROFIT_PER_CRAFTING_STEP = 'profit_per_crafting_step'
+
+_EPSILON = 1e-9
+_INTEGRALITY_TOLERANCE = 1e-6
+
+
+def solve_lp(c: np.ndarray, A: np.ndarray, b: np.ndarray) -> tuple:
+    """
+    Solves the linear program `maximize c.x subject to A.x <= b, x >= 0` for
+    `b >= 0` with the tableau simplex method. The origin is always feasible,
+    so no first phase is needed. Returns the optimal value, `x`, and the dual
+    value of each row of `A`.
+
+    Uses the largest coefficient rule to pick entering variables, and falls
+    back to Bland's rule, which can't cycle, after a run of degenerate pivots.
+    """
+
+    m, n = A.shape
+    if not n:
+        return 0.0, np.zeros(0), np.zeros(m)
+
+    tableau = np.zeros((m + 1, n + m + 1))
+    tableau[:m, :n] = A
+    tableau[:m, n:n + m] = np.eye(m)
+    tableau[:m, -1] = b
+    tableau[m, :n] = -c
+    basis = np.arange(n, n + m)
+
+    degenerate_pivots = 0
+    for _ in range(SIMPLEX_ITERATION_LIMIT):
+        reduced_costs = tableau[m, :-1]
+        if degenerate_pivots < m:
+            column = int(np.argmin(reduced_costs))
+            if reduced_costs[column] >= -_EPSILON:
+                break
+        else:
+            candidates = np.flatnonzero(reduced_costs < -_EPSILON)
+            if not len(candidates):
+                break
+            column = int(candidates[0])
+
+        entering = tableau[:m, column]
+        positive = entering > _EPSILON
+        if not positive.any():
+            raise ValueError('The linear program is unbounded.')
+
+        ratios = np.full(m, np.inf)
+        ratios[positive] = tableau[:m, -1][positive] / entering[positive]
+        min_ratio = ratios.min()
+
+        # Ties are broken by the lowest basic variable, as per Bland's rule
+        tied_rows = np.flatnonzero(ratios <= min_ratio + _EPSILON)
+        row = int(tied_rows[np.argmin(basis[tied_rows])])
+        degenerate_pivots = degenerate_pivots + 1 if min_ratio <= _EPSILON else 0
+
+        tableau[row] /= tableau[row, column]
+        pivot_column = tableau[:, column].copy()
+        pivot_column[row] = 0
+        tableau -= np.outer(pivot_column, tableau[row])
+        basis[row] = column
+
+    solution = np.zeros(n + m)
+    solution[basis] = tableau[:m, -1]
+    return tableau[m, -1], solution[:n], tableau[m, n:n + m].copy()
+
+
+def bounded_knapsack(
+    weights: np.ndarray,
+    values: np.ndarray,
+    bounds: np.ndarray,
+    capacity: int,
+    initial_values: np.ndarray = None,
+    deadline: float = None,
+) -> tuple:
+    """
+    Solves the bounded knapsack problem for every capacity from 0 to
+    `capacity` at once, with up to `bounds[i]` copies of item `i`. Returns the
+    best value for each capacity, and a function that returns the number of
+    copies of each item in the best solution for a capacity.
+
+    If `initial_values` is provided, it's the best value for each capacity of
+    another set of items, which are added to the problem.
+
+    Each item is split into copies of 1, 2, 4, ... of itself, which turns it
+    into a 0/1 knapsack problem with a logarithmic number of items. Once
+    `deadline` (see `time.monotonic`) has passed, no more split items are
+    added if `capacity` is over `KNAPSACK_DEADLINE_CAPACITY`, so the
+    solutions are still feasible, but not necessarily the best.
+    """
+
+    capacity = int(capacity)
+    if capacity <= KNAPSACK_DEADLINE_CAPACITY:
+        deadline = None
+    if initial_values is None:
+        best_values = np.zeros(capacity + 1)
+    else:
+        best_values = initial_values[:capacity + 1].copy()
+    split_items = []
+
+    for item, (weight, value, bound) in enumerate(zip(weights, values, bounds)):
+        weight, bound = int(round(weight)), int(bound)
+        copies = 1
+        while bound > 0 and weight * min(copies, bound) <= capacity and not _expired(deadline):
+            copies = min(copies, bound)
+            bound -= copies
+            split_weight = weight * copies
+            with_item = best_values[:-split_weight] + value * copies
+            improves = with_item > best_values[split_weight:] + _EPSILON
+            best_values[split_weight:] = np.where(improves, with_item, best_values[split_weight:])
+
+            # improves[i] is whether the split item is taken at capacity
+            # i + split_weight
+            split_items.append((item, copies, split_weight, improves))
+            copies *= 2
+
+    def solution(capacity: int) -> np.ndarray:
+        quantities = np.zeros(len(weights), dtype=np.int64)
+        for item, copies, split_weight, improves in reversed(split_items):
+            if capacity >= split_weight and improves[capacity - split_weight]:
+                quantities[item] += copies
+                capacity -= split_weight
+        return quantities
+
+    return best_values, solution
+
+
+class CraftingPlanner:
+    """
+    Finds the combination of recipes that earns the most bells from an
+    inventory of raw materials, when everything that's crafted is sold, along
+    with any raw materials that are left over. Selling a raw material as-is is
+    the "null recipe", so crafting a recipe is only worthwhile if it sells for
+    more than the raw materials that it requires. Raw materials without a sell
+    price can't be sold, so they're treated as worthless unless crafted.
+
+    This is an integer program, since recipes compete for the same raw
+    materials, see `_CraftingProblem`.
+
+    Crafting takes labor, measured in crafting steps, so plans can also be
+    limited to a labor budget, or traded off against labor, see
+    `_ConvexHull`. Hulls are cached by inventory, since the frontier and the
+    labor budget plans for an inventory are built from the same hull.
+    """
+
+    def __init__(self, recipes: dict, raw_materials: dict, requirements: matrix.RequirementMatrix):
+        self.requirements = requirements
+
+        self.recipe_sell_prices = np.array([
+            recipe['sell_price'] or 0
+            for recipe in recipes.values()
+        ], dtype=np.float64)
+
+        self.raw_material_sell_prices = np.array([
+            raw_material['sell_price'] or 0
+            for raw_material in raw_materials.values()
+        ], dtype=np.float64)
+
+        # The bells earned by crafting and selling each recipe, instead of
+        # selling its raw materials. Requirements stay sparse, only the rows
+        # of the recipes that a search considers are made dense.
+        self.recipe_profits = self.recipe_sell_prices - np.bincount(
+            np.repeat(np.arange(len(requirements.recipe_ids)), np.diff(requirements.indptr)),
+            weights=requirements.data * self.raw_material_sell_prices[requirements.indices],
+            minlength=len(requirements.recipe_ids),
+        )
+
+        self.recipe_crafting_steps = np.array([
+            recipe['total_crafting_steps'] or 0
+            for recipe in recipes.values()
+        ], dtype=np.int64)
+
+        # Caches are per planner, rather than shared by the class
+        self._hulls = collections.OrderedDict()
+        self._hulls_lock = threading.Lock()
+
+    def optimal_plan(
+        self,
+        inventory: np.ndarray,
+        labor_budget: int = None,
+        objective: str = OBJECTIVE_TOTAL_SELL_PRICE,
+        available: np.ndarray = None,
+        node_limit: int = DEFAULT_NODE_LIMIT,
+        time_limit: float = DEFAULT_TIME_LIMIT,
+    ) -> dict:
+        """
+        Returns the best plan for the inventory vector (see
+        `RequirementMatrix.inventory_vector`) that takes at most
+        `labor_budget` crafting steps, as a dict with:
+
+        - `recipe_quantities`: the number of each recipe to craft, indexed by
+          recipe position
+        - `leftover_raw_materials`: the quantity of each raw material that's
+          left to sell, indexed by raw material position
+        - `crafted_sell_price`, `leftover_sell_price` and `total_sell_price`
+        - `profit`: the bells earned over selling all of the raw materials
+        - `total_crafting_steps`
+        - `optimal`: False if the search stopped before the plan was proven
+          optimal
+
+        The best plan is the one that earns the most bells, or the one that
+        earns the most bells per crafting step for
+        `OBJECTIVE_PROFIT_PER_CRAFTING_STEP`. If `available` is given, it's a
+        mask of the recipes that can be crafted (see
+        `RequirementMatrix.available_recipes`). The search stops after
+        `time_limit` seconds, or never if it's None.
+        """
+
+        deadline = _deadline(time_limit)
+        inventory = np.maximum(np.floor(inventory), 0)
+        hull = self._hull(inventory.tobytes(), _available_key(available), node_limit, deadline)
+
+        if objective == OBJECTIVE_PROFIT_PER_CRAFTING_STEP:
+            return self._best_plan_per_crafting_step(hull, inventory, labor_budget, deadline)
+
+        if objective != OBJECTIVE_TOTAL_SELL_PRICE:
+            raise ValueError(f'Unknown crafting plan objective: {objective}')
+
+        most_profitable = hull.most_profitable
+        plan = self._plan(inventory, most_profitable.recipe_quantities, most_profitable.optimal)
+        if labor_budget is None or plan['total_crafting_steps'] <= labor_budget:
+            return plan
+
+        return self._plan_within_budget(hull, inventory, labor_budget, deadline)
+
+    def pareto_frontier(
+        self,
+        inventory: np.ndarray,
+        labor_budget: int = None,
+        available: np.ndarray = None,
+        node_limit: int = DEFAULT_NODE_LIMIT,
+        time_limit: float = DEFAULT_TIME_LIMIT,
+    ) -> list:
+        """
+        Returns the plans for the inventory vector that trade off profit
+        against crafting steps, ordered by crafting steps, from crafting
+        nothing to the plan that earns the most bells. Each plan earns more
+        than all of the plans before it, and is the best plan for some price
+        per crafting step, which makes these the corners of the Pareto
+        frontier of (profit, crafting steps). If `labor_budget` is given, only
+        plans within the budget are returned, along with the best plan for the
+        budget itself. `available` and `time_limit` are the same as for
+        `optimal_plan`.
+
+        The plans between the first and the last one are searched for with
+        less effort than `node_limit` (see `HULL_NODE_LIMIT`), since there can
+        be dozens of them, so they're less likely to be proven optimal.
+        """
+
+        deadline = _deadline(time_limit)
+        inventory = np.maximum(np.floor(inventory), 0)
+        hull = self._hull(inventory.tobytes(), _available_key(available), node_limit, deadline)
+        points, _ = hull.expand(
+            lambda left, right: labor_budget is None or left.steps <= labor_budget,
+            deadline,
+        )
+
+        plans = [
+            self._plan(inventory, point.recipe_quantities, point.optimal)
+            for point in points
+        ]
+
+        if labor_budget is not None:
+            plans = [plan for plan in plans if plan['total_crafting_steps'] <= labor_budget]
+            if hull.most_profitable.steps > labor_budget:
+                plans.append(self._plan_within_budget(hull, inventory, labor_budget, deadline))
+
+        return _undominated_plans(plans)
+
+    def _best_plan_per_crafting_step(self, hull: '_ConvexHull', inventory: np.ndarray, labor_budget: int, deadline: float) -> dict:
+        """
+        The plan that earns the most bells per crafting step is the first
+        corner of the hull after crafting nothing, since the hull is concave.
+        Within a labor budget that's smaller than that plan, it's either a
+        corner of the hull or the best plan for the budget.
+        """
+
+        points, _ = hull.expand(
+            lambda left, right: left.steps == 0 or (labor_budget is not None and left.steps <= labor_budget < right.steps),
+            deadline,
+        )
+
+        plans = [
+            self._plan(inventory, point.recipe_quantities, point.optimal)
+            for point in points
+            if labor_budget is None or point.steps <= labor_budget
+        ]
+        if labor_budget is not None and hull.most_profitable.steps > labor_budget:
+            plans.append(self._plan_within_budget(hull, inventory, labor_budget, deadline))
+
+        return max(plans, key=lambda plan: (profit_per_crafting_step(plan) or 0, plan['profit']))
+
+    def _plan_within_budget(self, hull: '_ConvexHull', inventory: np.ndarray, labor_budget: int, deadline: float) -> dict:
+        """
+        Returns the best plan that takes at most `labor_budget` crafting
+        steps. The labor budget is handled by Lagrangian relaxation: the
+        corners of the hull on either side of the budget bound the best profit
+        for the budget. The plan is found with a local search over every
+        recipe with the labor budget as a constraint, starting from the corner
+        below the budget, and from the corner above it with recipes removed
+        until it's within the budget.
+        """
+
+        points, edges_proven = hull.expand(
+            lambda left, right: left.steps <= labor_budget < right.steps,
+            deadline,
+        )
+        below = max(
+            position
+            for position, point in enumerate(points)
+            if point.steps <= labor_budget
+        )
+        below, above, edge_proven = points[below], points[below + 1], edges_proven[below]
+
+        upper_bounds = self._upper_bounds(inventory, hull.available_key)
+        candidates = np.flatnonzero((self.recipe_profits > 0) & (upper_bounds > 0))
+        requirements = self.requirements.to_dense(candidates)
+        constrained = np.flatnonzero(requirements.any(axis=0))
+        steps = self.recipe_crafting_steps[candidates]
+
+        # The labor budget also limits how many of each recipe can be
+        # crafted, and with that how much of each raw material can be used
+        upper = np.where(
+            steps > 0,
+            np.minimum(upper_bounds[candidates], labor_budget // np.maximum(steps, 1)),
+            upper_bounds[candidates],
+        )
+        A = np.vstack([requirements[:, constrained].T, steps])
+        problem = _CraftingProblem(
+            self.recipe_profits[candidates],
+            A,
+            np.minimum(np.append(inventory[constrained], labor_budget), A @ upper),
+            upper,
+            deadline,
+        )
+
+        # Removes the recipes that earn the least per crafting step from the
+        # corner above the budget
+        profits_per_step = self.recipe_profits[candidates] / np.maximum(steps, 1)
+        reduced = above.recipe_quantities[candidates].copy()
+        while reduced @ steps > labor_budget:
+            crafted = np.flatnonzero((reduced > 0) & (steps > 0))
+            least = crafted[np.argmin(profits_per_step[crafted])]
+            reduced[least] -= min(reduced[least], -(-(reduced @ steps - labor_budget) // steps[least]))
+
+        best, best_value = None, -np.inf
+        for start in (below.recipe_quantities[candidates], reduced):
+            multi_quantities, value = problem.improve(
+                start[problem.multis].astype(np.float64),
+                np.zeros(len(problem.multis)),
+                problem.upper[problem.multis],
+                deadline,
+            )
+            if value > best_value:
+                best, best_value = multi_quantities, value
+
+        recipe_quantities = np.zeros(len(self.recipe_profits), dtype=np.int64)
+        recipe_quantities[candidates] = problem.solution(best)
+
+        # The hull between the corners on either side of the budget
+        bound = below.profit + (above.profit - below.profit) * (labor_budget - below.steps) / (above.steps - below.steps)
+        optimal = edge_proven and recipe_quantities @ self.recipe_profits >= math.floor(bound + _INTEGRALITY_TOLERANCE)
+
+        return self._plan(inventory, recipe_quantities, bool(optimal))
+
+    def _upper_bounds(self, inventory: np.ndarray, available_key: bytes) -> np.ndarray:
+        """
+        Returns the craftable quantity of each recipe, or 0 for the recipes
+        that aren't available.
+        """
+
+        upper_bounds = self.requirements.craftable_quantities(inventory)
+        if available_key is not None:
+            upper_bounds[~np.frombuffer(available_key, dtype=bool)] = 0
+
+        return upper_bounds
+
+    def _candidates(self, upper_bounds: np.ndarray, profits: np.ndarray) -> np.ndarray:
+        """
+        Returns the positions of the recipes that are worth crafting, for the
+        given craftable quantity and profit of each recipe, leaving out recipes
+        that are dominated by another recipe that doesn't require more of any
+        raw material or take more crafting steps, and earns at least as much.
+        """
+
+        candidates = np.flatnonzero((profits > 0) & (upper_bounds > 0))
+
+        # Only the raw materials that the candidates require are compared. Of
+        # recipes that are identical in those, their crafting steps and their
+        # profit, only the first one is kept.
+        requirements = self.requirements.to_dense(candidates)
+        requirements = requirements[:, requirements.any(axis=0)]
+        steps = self.recipe_crafting_steps[candidates]
+        candidate_profits = profits[candidates]
+        first = {}
+        for position, row in enumerate(np.column_stack((requirements, steps, candidate_profits))):
+            first.setdefault(row.tobytes(), position)
+        first = np.fromiter(first.values(), dtype=np.int64, count=len(first))
+
+        # A recipe can only be dominated by recipes that come before it in
+        # this order, and since dominance is transitive, only by the recipes
+        # that are kept, so each block of recipes is compared with the kept
+        # recipes and with the recipes before it in the block.
+        order = first[np.lexsort((-candidate_profits[first], steps[first], requirements[first].sum(axis=1)))]
+        kept = np.zeros(0, dtype=np.int64)
+        for start in range(0, len(order), DOMINANCE_BLOCK_SIZE):
+            block = order[start:start + DOMINANCE_BLOCK_SIZE]
+            others = np.concatenate((kept, block))
+
+            # dominates[i, j] is whether recipe i dominates recipe j of the block
+            dominates = (requirements[others, np.newaxis, :] <= requirements[np.newaxis, block, :]).all(axis=2)
+            dominates &= steps[others, np.newaxis] <= steps[np.newaxis, block]
+            dominates &= candidate_profits[others, np.newaxis] >= candidate_profits[np.newaxis, block]
+            dominates[len(kept):] &= np.tri(len(block), k=-1, dtype=bool).T
+
+            kept = np.concatenate((kept, block[~dominates.any(axis=0)]))
+
+        return candidates[np.sort(kept)]
+
+    def _solve(
+        self,
+        inventory_key: bytes,
+        available_key: bytes,
+        profit_scale: int,
+        step_cost: int,
+        node_limit: int,
+        share_iterations: int = LAGRANGIAN_ITERATION_LIMIT,
+        starts: tuple = (),
+        deadline: float = None,
+    ) -> tuple:
+        """
+        Finds the recipe quantities that maximize
+        `profit_scale * profit - step_cost * crafting steps` for the inventory,
+        starting from the plans in `starts`, until `deadline` (see
+        `time.monotonic`). The inventory, the available recipes and the
+        starting recipe quantities are passed as `np.ndarray.tobytes` of the
+        vectors, like the keys of the hulls. Returns the recipe quantities
+        and whether they're proven optimal.
+        """
+
+        inventory = np.frombuffer(inventory_key)
+        upper_bounds = self._upper_bounds(inventory, available_key)
+        profits = profit_scale * self.recipe_profits - step_cost * self.recipe_crafting_steps
+        candidates = self._candidates(upper_bounds, profits)
+
+        # Only the raw materials that the candidates require are constrained
+        requirements = self.requirements.to_dense(candidates)
+        constrained = np.flatnonzero(requirements.any(axis=0))
+        A = requirements[:, constrained].T
+        b, reserved = _reserve_surplus(profits[candidates], A, inventory[constrained], upper_bounds[candidates])
+        problem = _CraftingProblem(profits[candidates], A, b, upper_bounds[candidates], deadline)
+        starts = [np.frombuffer(start, dtype=np.int64)[candidates] for start in starts]
+        quantities, optimal = problem.solve(node_limit, starts, share_iterations, deadline)
+
+        recipe_quantities = np.zeros(len(self.recipe_profits), dtype=np.int64)
+        recipe_quantities[candidates] = quantities + reserved
+        recipe_quantities.setflags(write=False)
+        return recipe_quantities, optimal
+
+    def _hull(self, inventory_key: bytes, available_key: bytes, node_limit: int, deadline: float) -> '_ConvexHull':
+        """
+        Returns the cached hull for the inventory, or builds it. Hulls that
+        ran out of time while they were built aren't cached, so that their
+        most profitable plan is searched for again by the next request.
+        """
+
+        key = (inventory_key, available_key, node_limit)
+        with self._hulls_lock:
+            hull = self._hulls.get(key, None)
+            if hull is not None:
+                self._hulls.move_to_end(key)
+                return hull
+
+        hull = _ConvexHull(self, inventory_key, available_key, node_limit, deadline)
+        if _expired(deadline):
+            return hull
+
+        with self._hulls_lock:
+            self._hulls[key] = hull
+            if len(self._hulls) > PLAN_CACHE_SIZE:
+                self._hulls.popitem(last=False)
+
+        return hull
+
+    def _plan(self, inventory: np.ndarray, recipe_quantities: np.ndarray, optimal: bool) -> dict:
+        leftover_raw_materials = inventory - self.requirements.required_raw_materials(recipe_quantities)
+        crafted_sell_price = int(recipe_quantities @ self.recipe_sell_prices)
+        leftover_sell_price = int(leftover_raw_materials @ self.raw_material_sell_prices)
+
+        return {
+            'recipe_quantities': recipe_quantities,
+            'leftover_raw_materials': np.rint(leftover_raw_materials).astype(np.int64),
+            'crafted_sell_price': crafted_sell_price,
+            'leftover_sell_price': leftover_sell_price,
+            'total_sell_price': crafted_sell_price + leftover_sell_price,
+            'profit': int(recipe_quantities @ self.recipe_profits),
+            'total_crafting_steps': int(recipe_quantities @ self.recipe_crafting_steps),
+            'optimal': optimal,
+        }
+
+
+_HullPoint = collections.namedtuple('_HullPoint', ['profit', 'steps', 'recipe_quantities', 'optimal'])
+
+
+class _ConvexHull:
+    """
+    The corners of the upper convex hull of (crafting steps, profit) over
+    every plan for an inventory, from crafting nothing to the plan that earns
+    the most bells. Every corner is the best plan for some price per crafting
+    step, and the best plan for a labor budget is bounded by the edge of the
+    hull above the budget.
+
+    Starts out as a single edge, and edges are split lazily: between two
+    corners, the best plan at the price per crafting step where they're
+    equally good is either above the edge, and becomes a new corner, or the
+    edge is resolved. That's the dichotomic search for the supported points
+    of a bi-objective problem.
+    """
+
+    def __init__(self, planner: CraftingPlanner, inventory_key: bytes, available_key: bytes, node_limit: int, deadline: float):
+        self.planner = planner
+        self.inventory_key = inventory_key
+        self.available_key = available_key
+        self.lock = threading.Lock()
+
+        nothing = np.zeros(len(planner.recipe_profits), dtype=np.int64)
+        nothing.setflags(write=False)
+        most_profitable = self._point(*planner._solve(inventory_key, available_key, 1, 0, node_limit, deadline=deadline))
+
+        # Plans that earn the same can take very different numbers of crafting
+        # steps. With one bell worth more than every crafting step of the
+        # plan, plans that earn less can't be better, and of the plans that
+        # earn the same, the one with the fewest crafting steps is best.
+        fewest_steps = self._point(*planner._solve(
+            inventory_key, available_key, most_profitable.steps + 1, 1, HULL_NODE_LIMIT, HULL_LAGRANGIAN_ITERATION_LIMIT,
+            (most_profitable.recipe_quantities.tobytes(),), deadline,
+        ))
+        if (fewest_steps.profit, -fewest_steps.steps) > (most_profitable.profit, -most_profitable.steps):
+            most_profitable = fewest_steps._replace(optimal=most_profitable.optimal)
+
+        self.most_profitable = most_profitable
+        self.points = [self._point(nothing, True)]
+        if self.most_profitable.steps > 0:
+            self.points.append(self.most_profitable)
+
+        # Whether each edge has been resolved, and if so whether it's proven
+        # that no plan is above it, by position of its left corner
+        self.edges_resolved = [False] * (len(self.points) - 1)
+        self.edges_proven = [False] * (len(self.points) - 1)
+
+    def _point(self, recipe_quantities: np.ndarray, optimal: bool) -> _HullPoint:
+        return _HullPoint(
+            int(recipe_quantities @ self.planner.recipe_profits),
+            int(recipe_quantities @ self.planner.recipe_crafting_steps),
+            recipe_quantities,
+            optimal,
+        )
+
+    def expand(self, edge_filter, deadline: float = None) -> tuple:
+        """
+        Splits the edges that `edge_filter(left, right)` returns True for,
+        until they're all resolved or the deadline passes. Edges that are
+        left unresolved aren't proven, and can be split by a later call.
+        Returns copies of the corners and of whether each edge is proven,
+        since other threads can split the hull.
+        """
+
+        with self.lock:
+            position = 0
+            while position < len(self.points) - 1 and not _expired(deadline):
+                left, right = self.points[position:position + 2]
+                if self.edges_resolved[position] or not edge_filter(left, right):
+                    position += 1
+                    continue
+
+                # Both corners are equally good at this price per crafting
+                # step, so the search only has to find a plan that's better
+                # than them
+                profit_scale = right.steps - left.steps
+                step_cost = right.profit - left.profit
+                middle = self._point(*self.planner._solve(
+                    self.inventory_key, self.available_key, profit_scale, step_cost, HULL_NODE_LIMIT, HULL_LAGRANGIAN_ITERATION_LIMIT,
+                    (left.recipe_quantities.tobytes(), right.recipe_quantities.tobytes()), deadline,
+                ))
+
+                edge_value = profit_scale * left.profit - step_cost * left.steps
+                middle_value = profit_scale * middle.profit - step_cost * middle.steps
+                if middle_value > edge_value and left.steps < middle.steps < right.steps:
+                    self.points.insert(position + 1, middle)
+                    self.edges_resolved.insert(position, False)
+                    self.edges_proven.insert(position, False)
+                else:
+                    self.edges_resolved[position] = True
+                    self.edges_proven[position] = middle.optimal
+                    position += 1
+
+            return list(self.points), list(self.edges_proven)
+
+
+def _deadline(time_limit: float) -> float:
+    if time_limit is None:
+        return None
+
+    return time.monotonic() + time_limit
+
+
+def _expired(deadline: float) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _available_key(available: np.ndarray) -> bytes:
+    if available is None:
+        return None
+
+    return np.asarray(available, dtype=bool).tobytes()
+
+
+def _undominated_plans(plans: list) -> list:
+    """
+    Sorts plans by crafting steps, and drops the plans that don't earn more
+    than a plan with fewer crafting steps.
+    """
+
+    undominated = []
+    for plan in sorted(plans, key=lambda plan: (plan['total_crafting_steps'], -plan['profit'])):
+        if not undominated or plan['profit'] > undominated[-1]['profit']:
+            undominated.append(plan)
+
+    return undominated
+
+
+def profit_per_crafting_step(plan: dict) -> float:
+    """
+    Returns the bells that a plan earns per crafting step, over selling all of
+    the raw materials, or None if the plan doesn't craft anything.
+    """
+
+    if not plan['total_crafting_steps']:
+        return None
+
+    return plan['profit'] / plan['total_crafting_steps']
+
+
+def _reserve_surplus(c: np.ndarray, A: np.ndarray, b: np.ndarray, upper: np.ndarray) -> tuple:
+    """
+    Shrinks the raw materials `b` of a `_CraftingProblem` to what has to be
+    searched over, since its knapsack tables are as large as the quantity of
+    each raw material. Returns the shrunk raw materials, and the quantity of
+    each recipe that's crafted from the rest.
+
+    The recipes that require multiple raw materials can't use more than
+    `A @ upper` of them. Of the recipes that only require one raw material,
+    fewer than `w` of the ones other than the one that earns the most per
+    raw material, which requires `w` of it, are ever needed: any `w` of them
+    have a subset that requires a multiple of `w`, which can be swapped for
+    that recipe. So the raw material beyond those is crafted into that
+    recipe, and without such recipes, it's left over.
+    """
+
+    b = b.copy()
+    reserved = np.zeros(len(c), dtype=np.int64)
+    singles = (A > 0).sum(axis=0) == 1
+
+    for row in range(len(b)):
+        multi_usage = A[row, ~singles] @ upper[~singles]
+        items = np.flatnonzero(singles & (A[row] > 0))
+        if not len(items):
+            b[row] = min(b[row], multi_usage)
+            continue
+
+        weights = A[row, items]
+        best = np.argmax(c[items] / weights)
+        surplus = b[row] - multi_usage - (weights[best] - 1) * (weights.max() + 1)
+        copies = max(math.floor(surplus / weights[best]), 0)
+        reserved[items[best]] = copies
+        b[row] -= copies * weights[best]
+
+    return b, reserved
+
+
+class _CraftingProblem:
+    """
+    Maximizes `c.x` subject to `A.x <= b` and `0 <= x <= upper`, with `x`
+    integer, `A >= 0`, and integer objective coefficients, where the columns
+    are recipes and the rows are raw materials.
+
+    Most recipes only require a single raw material, and only compete with
+    the other recipes that require the same raw material. For each raw
+    material, the best value of those recipes for every quantity of the raw
+    material is solved exactly up front as a knapsack problem, so only the
+    recipes that require multiple raw materials need to be searched over.
+
+    The search starts from a local search around the rounded down linear
+    relaxation. The linear relaxation is usually a weak bound, since most
+    recipes sell for about double the value of their raw materials, so the
+    hard part is proving that leftover raw materials can't be used up any
+    better. That's done with a decomposition of the objective into one
+    knapsack problem per raw material (see `_decomposition_bound`), which is
+    tightened at the root with the subgradient method. If that isn't enough,
+    best-first branch and bound splits the recipe that the raw materials'
+    knapsack solutions disagree the most about.
+    """
+
+    def __init__(self, c: np.ndarray, A: np.ndarray, b: np.ndarray, upper: np.ndarray, deadline: float = None):
+        self.c = c
+        self.A = A
+        self.b = b
+        self.upper = upper.astype(np.float64)
+
+        # Objective values are multiples of this, so bounds can be rounded
+        # down to a multiple of it
+        self.granularity = float(np.gcd.reduce(np.rint(c).astype(np.int64))) if len(c) else 1.0
+
+        requirement_counts = (A > 0).sum(axis=0)
+        self.singles = np.flatnonzero(requirement_counts == 1)
+        self.multis = np.flatnonzero(requirement_counts > 1)
+        self.multi_requirements = A[:, self.multis].T
+
+        # Once the deadline passes, the tables are left incomplete, which
+        # still gives feasible plans, but `solve` doesn't tighten its bound
+        # with them
+        self.single_values = []
+        self.single_solutions = []
+        for row in range(len(b)):
+            items = self.singles[A[row, self.singles] > 0]
+            values, solution = bounded_knapsack(A[row, items], c[items], self.upper[items], b[row], deadline=deadline)
+            self.single_values.append(values)
+            self.single_solutions.append((items, solution))
+        self.singles_solved = (b <= KNAPSACK_DEADLINE_CAPACITY).all() or not _expired(deadline)
+
+    def _single_values(self, remaining: np.ndarray) -> np.ndarray:
+        """
+        Returns the best value of the single raw material recipes for each
+        vector of remaining raw materials, along the last axis of `remaining`,
+        or -inf if any of the raw materials are overused.
+        """
+
+        feasible = (remaining > -_INTEGRALITY_TOLERANCE).all(axis=-1)
+        remaining = np.clip(np.rint(remaining), 0, self.b).astype(np.int64)
+
+        values = np.zeros(remaining.shape[:-1])
+        for row, single_values in enumerate(self.single_values):
+            values += single_values[remaining[..., row]]
+
+        return np.where(feasible, values, -np.inf)
+
+    def evaluate(self, multi_quantities: np.ndarray) -> float:
+        """
+        Returns the best objective value for the quantities of the recipes
+        that require multiple raw materials, or -inf if they're infeasible.
+        """
+
+        remaining = self.b - multi_quantities @ self.multi_requirements
+        return multi_quantities @ self.c[self.multis] + self._single_values(remaining)
+
+    def solution(self, multi_quantities: np.ndarray) -> np.ndarray:
+        x = np.zeros(len(self.c), dtype=np.int64)
+        x[self.multis] = np.rint(multi_quantities)
+
+        remaining = np.rint(self.b - multi_quantities @ self.multi_requirements).astype(np.int64)
+        for row, (items, solution) in enumerate(self.single_solutions):
+            x[items] = solution(remaining[row])
+
+        return x
+
+    def improve(self, multi_quantities: np.ndarray, lower: np.ndarray, upper: np.ndarray, deadline: float = None) -> tuple:
+        """
+        Hill climbs from `multi_quantities` by crafting one more or one less of
+        a recipe, or swapping one recipe for another, until no move improves
+        the objective value. Swaps take the most time to evaluate, so they
+        aren't tried once `deadline` has passed, and the climb stops after
+        IMPROVE_MOVES_AFTER_DEADLINE more moves. Returns the quantities and
+        their value.
+        """
+
+        c = self.c[self.multis]
+        requirements = self.multi_requirements
+        can_add = lambda x: x + 1 <= upper
+        can_remove = lambda x: x - 1 >= lower
+
+        value = self.evaluate(multi_quantities)
+        moves_after_deadline = 0
+        while len(c):
+            if _expired(deadline):
+                moves_after_deadline += 1
+                if moves_after_deadline > IMPROVE_MOVES_AFTER_DEADLINE:
+                    break
+
+            remaining = self.b - multi_quantities @ requirements
+            crafted_value = multi_quantities @ c
+
+            add_values = np.where(
+                can_add(multi_quantities),
+                crafted_value + c + self._single_values(remaining - requirements),
+                -np.inf,
+            )
+            remove_values = np.where(
+                can_remove(multi_quantities),
+                crafted_value - c + self._single_values(remaining + requirements),
+                -np.inf,
+            )
+
+            move = np.zeros(len(c))
+            if max(add_values.max(), remove_values.max()) > value + _EPSILON:
+                if add_values.max() >= remove_values.max():
+                    move[np.argmax(add_values)] = 1
+                else:
+                    move[np.argmax(remove_values)] = -1
+            elif _expired(deadline):
+                break
+            else:
+                # Swapping one of recipe i for one of recipe j
+                swap_values = np.where(
+                    can_add(multi_quantities)[:, np.newaxis] & can_remove(multi_quantities)[np.newaxis, :],
+                    crafted_value + c[:, np.newaxis] - c[np.newaxis, :] + self._single_values(
+                        remaining - requirements[:, np.newaxis, :] + requirements[np.newaxis, :, :]
+                    ),
+                    -np.inf,
+                )
+                np.fill_diagonal(swap_values, -np.inf)
+                i, j = np.unravel_index(np.argmax(swap_values), swap_values.shape)
+                if swap_values[i, j] <= value + _EPSILON:
+                    break
+                move[i], move[j] = 1, -1
+
+            multi_quantities = multi_quantities + move
+            value = self.evaluate(multi_quantities)
+
+        return multi_quantities, value
+
+    def _relaxation(self, lower: np.ndarray, upper: np.ndarray) -> tuple:
+        """
+        Solves the linear relaxation of a node of the search, where the
+        quantities of the recipes that require multiple raw materials are
+        limited to `lower` and `upper`. Lower bounds are substituted out
+        (`x = lower + y`) so that the right hand side stays non-negative, and
+        upper bounds that are tighter than what the raw materials already
+        allow become extra rows.
+
+        Returns the bound, the relaxed quantities of the multiple raw material
+        recipes, and the dual values of the raw materials, or None if the node
+        is infeasible.
+        """
+
+        remaining = self.b - lower @ self.multi_requirements
+        if (remaining < -_INTEGRALITY_TOLERANCE).any():
+            return None
+        remaining = np.maximum(remaining, 0)
+
+        free_multis = np.flatnonzero(upper > lower)
+        bounded_multis = free_multis[upper[free_multis] < self.upper[self.multis][free_multis]]
+        columns = np.concatenate([self.multis[free_multis], self.singles])
+
+        A_node = np.vstack([
+            self.A[:, columns],
+            np.eye(len(columns))[np.searchsorted(free_multis, bounded_multis)],
+        ])
+        b_node = np.concatenate([remaining, upper[bounded_multis] - lower[bounded_multis]])
+        value, y, duals = solve_lp(self.c[columns], A_node, b_node)
+
+        relaxed = lower.astype(np.float64)
+        relaxed[free_multis] += y[:len(free_multis)]
+        return lower @ self.c[self.multis] + value, relaxed, duals[:len(remaining)]
+
+    def _decomposition_bound(self, shares: np.ndarray, lower: np.ndarray, upper: np.ndarray, deadline: float = None) -> tuple:
+        """
+        An upper bound on the objective value of a node of the search, from
+        splitting the objective coefficient of each recipe that requires
+        multiple raw materials into `shares` across its raw materials. Each raw
+        material then becomes an independent knapsack problem, on top of its
+        single raw material recipes, where the quantities of the multiple raw
+        material recipes don't have to agree with each other.
+
+        Returns the bound and the quantity of each recipe in the solution of
+        each raw material's knapsack problem. If `deadline` passes before the
+        knapsack problems are solved (see `bounded_knapsack`), the bound is
+        infinite.
+        """
+
+        remaining = self.b - lower @ self.multi_requirements
+        bound = lower @ self.c[self.multis]
+        quantities = np.zeros(shares.shape)
+        solved = self.singles_solved
+
+        for row in range(len(self.b)):
+            items = np.flatnonzero((shares[row] > 0) & (upper > lower))
+            capacity = math.floor(remaining[row] + _INTEGRALITY_TOLERANCE)
+            values, solution = bounded_knapsack(
+                self.multi_requirements[items, row],
+                shares[row, items],
+                upper[items] - lower[items],
+                capacity,
+                self.single_values[row],
+                deadline,
+            )
+            bound += values[-1]
+            quantities[row, items] = solution(capacity)
+            solved = solved and (capacity <= KNAPSACK_DEADLINE_CAPACITY or not _expired(deadline))
+
+        if not solved:
+            bound = np.inf
+
+        return bound, lower + quantities
+
+    def _initial_shares(self, duals: np.ndarray) -> np.ndarray:
+        """
+        Splits the objective coefficients for `_decomposition_bound` in
+        proportion to the raw materials' dual values.
+        """
+
+        requires = self.multi_requirements.T > 0
+        dual_values = self.multi_requirements.T * np.maximum(duals, 0)[:, np.newaxis]
+        column_dual_values = dual_values.sum(axis=0)
+        return np.where(
+            column_dual_values > _EPSILON,
+            dual_values / np.maximum(column_dual_values, _EPSILON),
+            requires / requires.sum(axis=0),
+        ) * self.c[self.multis]
+
+    def _optimize_shares(self, shares: np.ndarray, lower: np.ndarray, upper: np.ndarray, iterations: int, can_improve, deadline: float = None) -> tuple:
+        """
+        Improves a split of the objective coefficients for
+        `_decomposition_bound` with the subgradient method: shares are moved
+        towards the raw materials whose knapsack solutions craft fewer of a
+        recipe than the others. Stops early once the bound proves that the
+        best known plan can't be improved on, or once the deadline passes.
+        Each iteration's knapsack solutions are also turned into a feasible
+        plan, where each recipe's quantity is the least that any raw
+        material's solution crafts.
+
+        Returns the shares with the lowest bound, and the bound.
+        """
+
+        requires = self.multi_requirements.T > 0
+        best_shares, best_bound = shares, np.inf
+        step_scale, stalled_iterations = 1.0, 0
+        for _ in range(iterations):
+            bound, quantities = self._decomposition_bound(shares, lower, upper, deadline)
+            if bound < best_bound - _EPSILON:
+                best_shares, best_bound = shares, bound
+                stalled_iterations = 0
+            else:
+                stalled_iterations += 1
+                if stalled_iterations >= 3:
+                    step_scale, stalled_iterations = step_scale / 2, 0
+
+            self._update_best(np.where(requires, quantities, np.inf).min(axis=0))
+            if not can_improve(best_bound) or _expired(deadline):
+                break
+
+            mean_quantities = (quantities * requires).sum(axis=0) / requires.sum(axis=0)
+            subgradient = (quantities - mean_quantities) * requires
+            if not subgradient.any():
+                break
+
+            # Polyak step size, with the best known plan as the target
+            step = step_scale * max(bound - self.best_value, self.granularity) / (subgradient ** 2).sum()
+            shares = np.maximum(shares - step * subgradient, 0) * requires
+            shares *= self.c[self.multis] / shares.sum(axis=0)
+
+        return best_shares, best_bound
+
+    def _update_best(self, multi_quantities: np.ndarray):
+        value = self.evaluate(multi_quantities)
+        if value > self.best_value:
+            self.best, self.best_value = multi_quantities, value
+
+    def solve(self, node_limit: int, starts: list = (), share_iterations: int = LAGRANGIAN_ITERATION_LIMIT, deadline: float = None) -> tuple:
+        """
+        Returns the best `x` that was found and whether it's proven optimal.
+        The search also starts from each of the feasible `x` in `starts`. Once
+        `deadline` (see `time.monotonic`) has passed, the local searches don't
+        try swaps, the bound isn't tightened and no nodes are searched.
+        """
+
+        n = len(self.multis)
+        lower = np.zeros(n)
+        upper = self.upper[self.multis]
+
+        def can_improve(bound: float) -> bool:
+            if bound == np.inf:
+                return True
+
+            return math.floor((bound + _INTEGRALITY_TOLERANCE) / self.granularity) * self.granularity > self.best_value
+
+        bound, relaxed, duals = self._relaxation(lower, upper)
+        self.best, self.best_value = self.improve(np.zeros(n), lower, upper, deadline)
+        self._update_best(self.improve(np.floor(relaxed + _INTEGRALITY_TOLERANCE), lower, upper, deadline)[0])
+        for start in starts:
+            self._update_best(self.improve(start[self.multis].astype(np.float64), lower, upper, deadline)[0])
+        if not can_improve(bound):
+            return self.solution(self.best), True
+        if _expired(deadline):
+            return self.solution(self.best), False
+
+        shares, share_bound = self._optimize_shares(
+            self._initial_shares(duals), lower, upper, share_iterations, can_improve, deadline,
+        )
+        if not can_improve(share_bound):
+            return self.solution(self.best), True
+
+        requires = self.multi_requirements.T > 0
+
+        # The counter breaks ties between nodes with the same bound
+        counter = itertools.count()
+        heap = [(-min(bound, share_bound), next(counter), lower, upper, shares)]
+        nodes = 0
+        while heap:
+            if nodes >= node_limit or _expired(deadline):
+                return self.solution(self.best), False
+            nodes += 1
+
+            _, _, lower, upper, shares = heapq.heappop(heap)
+            relaxation = self._relaxation(lower, upper)
+            if relaxation is None:
+                continue
+
+            bound, relaxed, _ = relaxation
+            if not can_improve(bound):
+                continue
+
+            share_bound, quantities = self._decomposition_bound(shares, lower, upper, deadline)
+            if not can_improve(share_bound):
+                continue
+
+            if (lower == upper).all():
+                self._update_best(lower)
+                continue
+
+            self._update_best(np.clip(np.floor(relaxed + _INTEGRALITY_TOLERANCE), lower, upper))
+            self._update_best(np.where(requires, quantities, np.inf).min(axis=0))
+
+            # Branches on the recipe that the raw materials' knapsack
+            # solutions disagree the most about
+            spread = np.where(requires, quantities, -np.inf).max(axis=0) - np.where(requires, quantities, np.inf).min(axis=0)
+            if spread.max() > 0:
+                j = int(np.argmax(spread))
+                split = math.floor((quantities[:, j] * requires[:, j]).sum() / requires[:, j].sum())
+                split = min(max(split, int(lower[j])), int(upper[j]) - 1)
+            else:
+                fractionality = np.abs(relaxed - np.round(relaxed))
+                if fractionality.max() > _INTEGRALITY_TOLERANCE:
+                    j = int(np.argmax(np.where(fractionality > _INTEGRALITY_TOLERANCE, -np.abs(fractionality - 0.5), -np.inf)))
+                    split = math.floor(relaxed[j])
+                else:
+                    j = int(np.argmax(upper - lower))
+                    split = min(max(int(round(relaxed[j])), lower[j] + 1), upper[j]) - 1
+
+            down_upper = upper.copy()
+            down_upper[j] = split
+            up_lower = lower.copy()
+            up_lower[j] = split + 1
+            for child_lower, child_upper in ((lower, down_upper), (up_lower, upper)):
+                heapq.heappush(heap, (-min(bound, share_bound), next(counter), child_lower, child_upper, shares))
+
+        return self.solution(self.best), True
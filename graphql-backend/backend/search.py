@@ -0,0 +1,277 @@
+import bisect
+import collections
+import re
+
+import numpy as np
+
+# The relative weight of matches in each field that's searched
+NAME_WEIGHT = 1.0
+SOURCE_WEIGHT = 0.5
+
+# Query tokens that match an indexed token by prefix score between these,
+# depending on how much of the indexed token they cover. Exact matches
+# score 1.
+MIN_PREFIX_SCORE = 0.5
+MAX_PREFIX_SCORE = 0.9
+
+# Query tokens without any prefix matches are matched to indexed tokens,
+# or to the start of longer indexed tokens, that share at least this
+# fraction of their trigrams (by the Dice coefficient), scaled down by
+# `FUZZY_SCORE`, and by the prefix score for the start of longer tokens.
+MIN_FUZZY_SIMILARITY = 0.4
+FUZZY_SCORE = 0.6
+
+# Added to hits whose whole text starts with the whole query
+PREFIX_BONUS = 0.5
+
+# The most hits that a search can return
+MAX_LIMIT = 100
+
+SearchHit = collections.namedtuple('SearchHit', ['kind', 'id', 'field', 'text', 'score'])
+
+RECIPE = 'recipe'
+RAW_MATERIAL = 'raw_material'
+
+
+def tokenize(value: str) -> list:
+    """
+    Splits a query or a source into lowercase word tokens, in order. Words
+    are runs of letters and digits, which are the parts of the IDs of the
+    recipes and raw materials, so query tokens match the tokens of names,
+    which are the parts of their IDs. Like `indexes.tokenize_source`, words
+    are also split where a lowercase letter is followed by an uppercase
+    letter, since some scraped sources were joined without a separator.
+    """
+
+    if not value:
+        return []
+
+    value = re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', value)
+    return [token for token in re.split(r'[\W_]+', value.lower()) if token]
+
+
+def trigrams(token: str) -> set:
+    """
+    Returns the trigrams of a token, padded so that tokens of one or two
+    characters have trigrams too, and so that the start and end of a token
+    weigh more.
+    """
+
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_score(length: int, token_lengths):
+    """
+    Returns the score of a query token of `length` characters that prefixes
+    indexed tokens of `token_lengths` characters, either a length or an array
+    of lengths.
+    """
+
+    return np.where(
+        token_lengths == length,
+        1.0,
+        MIN_PREFIX_SCORE + (MAX_PREFIX_SCORE - MIN_PREFIX_SCORE) * length / token_lengths,
+    )
+
+
+class _TrieNode:
+    """
+    A node of the token trie. `documents` are the documents of every token
+    that starts with the node's prefix, and `lengths` are the lengths of
+    those tokens, which become arrays once the trie is built.
+    """
+
+    __slots__ = ('children', 'documents', 'lengths')
+
+    def __init__(self):
+        self.children = {}
+        self.documents = []
+        self.lengths = []
+
+    def freeze(self):
+        self.documents = np.array(self.documents, dtype=np.int32)
+        self.lengths = np.array(self.lengths, dtype=np.float64)
+        for child in self.children.values():
+            child.freeze()
+
+
+class SearchIndex:
+    """
+    A full text index of the names of the recipes and raw materials, and of
+    the sources of the recipes, for searching as the user types.
+
+    Names are split into tokens by their IDs, which the data pipeline
+    normalized, and sources and queries into the same kind of word tokens.
+    Every token is stored in a prefix trie, in which each node has the
+    documents of every token that starts with its prefix, so the documents
+    that a (partially typed) query token matches are found in as many steps
+    as the query token has characters. Query tokens that don't prefix any
+    token, typically because they're misspelled, are matched to the tokens,
+    or the starts of tokens, that they share the most trigrams with instead.
+
+    Hits are ranked by how well every query token matches one of their
+    tokens, scaled by the fraction of the query tokens that they match and
+    weighted by the field, with a bonus for texts that start with the whole
+    query. Each recipe or raw material is returned once, for its best
+    matching field. Scores are computed for every document at once with
+    NumPy, so even one-letter queries, which match most documents, take
+    well under a millisecond.
+    """
+
+    def __init__(self, recipes: dict, raw_materials: dict):
+        # The recipes and raw materials, and the (entity, field, text,
+        # tokens, weight) of each document of their names and sources. Names
+        # are tokenized by their IDs, which the data pipeline normalized.
+        self.entities = []
+        documents = []
+        for raw_material_id, raw_material in raw_materials.items():
+            self.entities.append((RAW_MATERIAL, raw_material_id))
+            documents.append((len(self.entities) - 1, 'name', raw_material['name'], raw_material_id.split('_'), NAME_WEIGHT))
+        for recipe_id, recipe in recipes.items():
+            self.entities.append((RECIPE, recipe_id))
+            documents.append((len(self.entities) - 1, 'name', recipe['name'], recipe_id.split('_'), NAME_WEIGHT))
+            if recipe['source']:
+                documents.append((len(self.entities) - 1, 'source', recipe['source'], tokenize(recipe['source']), SOURCE_WEIGHT))
+
+        self.document_fields = [field for _, field, _, _, _ in documents]
+        self.document_texts = [text for _, _, text, _, _ in documents]
+        self.document_entities = np.array([entity for entity, _, _, _, _ in documents], dtype=np.int32)
+        self.document_weights = np.array([weight for _, _, _, _, weight in documents])
+
+        # Ties are broken by the length and then the text of the documents
+        text_order = sorted(range(len(documents)), key=lambda document: (len(self.document_texts[document]), self.document_texts[document]))
+        self.document_text_ranks = np.empty(len(documents), dtype=np.int32)
+        self.document_text_ranks[text_order] = np.arange(len(documents))
+
+        # The normalized texts in sorted order, to find the documents that
+        # start with a query with a binary search
+        normalized_texts = ['_'.join(tokens) for _, _, _, tokens, _ in documents]
+        normalized_order = sorted(range(len(documents)), key=normalized_texts.__getitem__)
+        self.sorted_texts = [normalized_texts[document] for document in normalized_order]
+        self.sorted_documents = np.array(normalized_order, dtype=np.int32)
+
+        # The documents that contain each token
+        self.postings = collections.defaultdict(list)
+        for document, (_, _, _, tokens, _) in enumerate(documents):
+            for token in dict.fromkeys(tokens):
+                self.postings[token].append(document)
+
+        self.trie = _TrieNode()
+        for token, token_documents in self.postings.items():
+            node = self.trie
+            for character in token:
+                node = node.children.setdefault(character, _TrieNode())
+                node.documents.extend(token_documents)
+                node.lengths.extend([len(token)] * len(token_documents))
+        self.trie.freeze()
+
+        self.trigram_tokens = collections.defaultdict(list)
+        self.trigram_counts = {}
+        for token in self.postings:
+            token_trigrams = trigrams(token)
+            self.trigram_counts[token] = len(token_trigrams)
+            for trigram in token_trigrams:
+                self.trigram_tokens[trigram].append(token)
+
+    def prefix_node(self, prefix: str) -> _TrieNode:
+        """
+        Returns the trie node of the tokens that start with the prefix, or
+        None if there aren't any.
+        """
+
+        node = self.trie
+        for character in prefix:
+            node = node.children.get(character, None)
+            if node is None:
+                return None
+
+        return node
+
+    def fuzzy_tokens(self, token: str) -> dict:
+        """
+        Returns the similarity of the indexed tokens that share enough
+        trigrams with the token, by token. The token might be a misspelled
+        word that's still being typed, so it's also compared to the start of
+        longer tokens, one character longer than itself, and that similarity
+        is scaled by the prefix score.
+        """
+
+        token_trigrams = trigrams(token)
+        shared = collections.Counter()
+        for trigram in token_trigrams:
+            shared.update(self.trigram_tokens.get(trigram, ()))
+
+        similarities = {}
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(token_trigrams) + self.trigram_counts[candidate])
+            if similarity < MIN_FUZZY_SIMILARITY:
+                similarity = 0.0
+
+            start_length = len(token) + 1
+            if len(candidate) > start_length:
+                start_trigrams = trigrams(candidate[:start_length])
+                start_similarity = 2 * len(token_trigrams & start_trigrams) / (len(token_trigrams) + len(start_trigrams))
+                if start_similarity >= MIN_FUZZY_SIMILARITY:
+                    similarity = max(similarity, start_similarity * float(prefix_score(len(token), len(candidate))))
+
+            if similarity:
+                similarities[candidate] = similarity
+
+        return similarities
+
+    def token_scores(self, query_token: str) -> np.ndarray:
+        """
+        Returns how well the query token matches each document, as the best
+        score of the query token against any of the document's tokens.
+        """
+
+        scores = np.zeros(len(self.document_texts))
+        node = self.prefix_node(query_token)
+        if node is not None:
+            np.maximum.at(scores, node.documents, prefix_score(len(query_token), node.lengths))
+            return scores
+
+        for token, similarity in self.fuzzy_tokens(query_token).items():
+            token_documents = self.postings[token]
+            scores[token_documents] = np.maximum(scores[token_documents], FUZZY_SCORE * similarity)
+
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """
+        Returns the `limit` best SearchHits for the query, best first.
+        """
+
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens or limit <= 0:
+            return []
+
+        # Scaled by the fraction of the query tokens that match at all, so
+        # that hits that match the whole query beat hits that only match one
+        # of its tokens well
+        token_scores = np.array([self.token_scores(query_token) for query_token in query_tokens])
+        scores = token_scores.mean(axis=0) * np.count_nonzero(token_scores, axis=0) / len(query_tokens)
+
+        normalized_query = '_'.join(query_tokens)
+        start = bisect.bisect_left(self.sorted_texts, normalized_query)
+        end = bisect.bisect_left(self.sorted_texts, normalized_query + '\x7f', start)
+        scores[self.sorted_documents[start:end]] += PREFIX_BONUS
+        scores *= self.document_weights
+
+        # Documents in order of rank, then the best document of each recipe
+        # or raw material, which is its first document in that order
+        documents = np.flatnonzero(scores)
+        documents = documents[np.lexsort((self.document_text_ranks[documents], -scores[documents]))]
+        _, first_positions = np.unique(self.document_entities[documents], return_index=True)
+        documents = documents[np.sort(first_positions)[:limit]]
+
+        return [
+            SearchHit(
+                *self.entities[self.document_entities[document]],
+                self.document_fields[document],
+                self.document_texts[document],
+                float(scores[document]),
+            )
+            for document in documents
+        ]
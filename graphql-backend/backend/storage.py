@@ -0,0 +1,188 @@
+import array
+import hashlib
+import json
+import os
+import struct
+import sys
+
+
+# See `write_compact_recipe_data` and `COMPACT_DATA_SECTIONS` in data/app.py
+# for a description of the compact data format.
+COMPACT_DATA_MAGIC = b'ACRD'
+COMPACT_DATA_VERSION = 3
+COMPACT_DATA_NONE = -2 ** 31
+
+
+def read_compact_sections(contents) -> tuple:
+    """
+    Reads the header and the sections of a compact recipe data file from a
+    bytes-like object. Returns the header dict and a dict of arrays, one per
+    section.
+    """
+
+    if bytes(contents[:4]) != COMPACT_DATA_MAGIC:
+        raise ValueError('Not a compact recipe data file.')
+
+    version, header_length = struct.unpack_from('<II', contents, 4)
+    if version != COMPACT_DATA_VERSION:
+        raise ValueError(f'Unsupported compact recipe data version: {version}')
+
+    header = json.loads(bytes(contents[12:12 + header_length]).decode('utf-8'))
+    data_start = 12 + header_length
+
+    sections = {}
+    for section_name, section_header in header['sections'].items():
+        section = array.array(section_header['typecode'])
+        start = data_start + section_header['offset']
+        end = start + section_header['length'] * section.itemsize
+        section.frombytes(contents[start:end])
+        if sys.byteorder == 'big':
+            section.byteswap()
+        sections[section_name] = section
+
+    return header, sections
+
+
+def load_compact_recipe_data(filename: str) -> dict:
+    """
+    Loads a compact recipe data file, generated by the data pipeline next to
+    diy_recipes.json, into the same structure as diy_recipes.json.
+    """
+
+    with open(filename, 'rb') as compact_file:
+        header, sections = read_compact_sections(compact_file.read())
+
+    # Decoding the whole string table at once interns every string, so each
+    # ID, name and URI is only held in memory once. The table ends with a
+    # separator, and string references that are None are stored as -1.
+    strings = bytes(sections['strings']).decode('utf-8').split('\0')
+    strings[-1] = None
+
+    def _ints(section_name: str) -> list:
+        return [
+            None if value == COMPACT_DATA_NONE else value
+            for value in sections[section_name]
+        ]
+
+    def _strings(section_name: str) -> list:
+        return [strings[index] for index in sections[section_name]]
+
+    def _ranges(section_name: str) -> list:
+        offsets = sections[f'{section_name}_offsets']
+        return [range(offsets[i], offsets[i + 1]) for i in range(len(offsets) - 1)]
+
+    recipe_ids = _strings('recipe_id')
+    raw_material_ids = _strings('raw_material_id')
+    used_in_recipes = sections['used_in_recipe']
+
+    raw_materials = {
+        raw_material_id: {
+            'name': name,
+            'id': raw_material_id,
+            'uri': uri,
+            'image_url': image_url,
+            'used_in': [recipe_ids[used_in_recipes[i]] for i in used_in],
+            'sell_price': sell_price,
+        }
+        for raw_material_id, name, uri, image_url, used_in, sell_price in zip(
+            raw_material_ids,
+            _strings('raw_material_name'),
+            _strings('raw_material_uri'),
+            _strings('raw_material_image_url'),
+            _ranges('used_in'),
+            _ints('raw_material_sell_price'),
+        )
+    }
+
+    material_ids = _strings('material_id')
+    material_names = _strings('material_name')
+    material_uris = _strings('material_uri')
+    material_quantities = sections['material_quantity']
+    requirement_raw_materials = sections['requirement_raw_material']
+    requirement_quantities = sections['requirement_quantity']
+    requirement_names = _strings('requirement_name')
+    requirement_uris = _strings('requirement_uri')
+    depends_on_recipes = sections['depends_on_recipe']
+
+    recipes = {}
+    for recipe_id, name, uri, has_page, image_url, source, sell_price, total_crafting_steps, value_of_raw_materials, materials, requirements, depends_on in zip(
+        recipe_ids,
+        _strings('recipe_name'),
+        _strings('recipe_uri'),
+        sections['recipe_has_page'],
+        _strings('recipe_image_url'),
+        _strings('recipe_source'),
+        _ints('recipe_sell_price'),
+        _ints('recipe_total_crafting_steps'),
+        _ints('recipe_value_of_raw_materials'),
+        _ranges('material'),
+        _ranges('requirement'),
+        _ranges('depends_on'),
+    ):
+        # Recipes can spell the names of their raw materials differently
+        # from the raw material table
+        recipe_raw_materials = {}
+        for i in requirements:
+            raw_material_id = raw_material_ids[requirement_raw_materials[i]]
+            recipe_raw_materials[raw_material_id] = {
+                'name': requirement_names[i],
+                'id': raw_material_id,
+                'uri': requirement_uris[i],
+                'quantity': requirement_quantities[i],
+            }
+
+        recipes[recipe_id] = {
+            'name': name,
+            'id': recipe_id,
+            'uri': uri,
+            'has_page': bool(has_page),
+            'image_url': image_url,
+            'materials': [
+                {
+                    'name': material_names[i],
+                    'id': material_ids[i],
+                    'uri': material_uris[i],
+                    'quantity': material_quantities[i],
+                }
+                for i in materials
+            ],
+            'source': source,
+            'sell_price': sell_price,
+            'total_crafting_steps': total_crafting_steps,
+            'depends_on': [recipe_ids[depends_on_recipes[i]] for i in depends_on],
+            'raw_materials': recipe_raw_materials,
+            'value_of_raw_materials': value_of_raw_materials,
+        }
+
+    return {
+        'wiki_base_url': header['wiki_base_url'],
+        'utc_datetime': header['utc_datetime'],
+        'recipes': recipes,
+        'raw_materials': raw_materials,
+    }
+
+
+def file_digest(filename: str) -> str:
+    """
+    Returns the hex SHA-256 hash of the contents of a file.
+    """
+
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as data_file:
+        for chunk in iter(lambda: data_file.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def load_recipe_data(filename: str) -> dict:
+    """
+    Loads the recipe data from either diy_recipes.json or the compact recipe
+    data file, based on the file's extension.
+    """
+
+    if os.path.splitext(filename)[1] == '.json':
+        with open(filename) as rdfile:
+            return json.load(rdfile)
+
+    return load_compact_recipe_data(filename)
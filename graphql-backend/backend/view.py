@@ -0,0 +1,412 @@
+import collections
+import collections.abc
+import hashlib
+import json
+import threading
+import time
+
+import flask
+import flask_graphql
+from graphql.error import GraphQLError
+from graphql.language.lexer import Lexer, TokenKind
+from graphql.language.source import Source
+from graphql_server import HttpQueryError, get_graphql_params, json_encode
+
+import backend.cost as cost
+import backend.metrics as metrics
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a GraphQL query document, so that queries that only differ in
+    whitespace, commas and comments are the same. The document is tokenized,
+    rather than parsed, and its tokens are joined with single spaces. Returns
+    None if the document can't be tokenized.
+    """
+
+    source = Source(query)
+    lexer = Lexer(source)
+    tokens = []
+    try:
+        token = lexer.next_token()
+        while token.kind != TokenKind.EOF:
+            tokens.append(source.body[token.start:token.end])
+            token = lexer.next_token()
+    except GraphQLError:
+        return None
+
+    return ' '.join(tokens)
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache of encoded GraphQL responses. The cache is bounded
+    by the total size of the cached response bodies, and the least recently
+    used responses are evicted first.
+
+    Normalized query documents are also cached by their raw text, so that
+    cache hits for a query that has been seen before don't tokenize it again.
+    """
+
+    def __init__(self, max_size: int, max_queries: int = 1024):
+        self.max_size = max_size
+        self.max_queries = max_queries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._responses = collections.OrderedDict()
+        self._normalized_queries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def normalize(self, query: str) -> str:
+        with self._lock:
+            if query in self._normalized_queries:
+                self._normalized_queries.move_to_end(query)
+                return self._normalized_queries[query]
+
+        normalized_query = normalize_query(query)
+
+        with self._lock:
+            self._normalized_queries[query] = normalized_query
+            if len(self._normalized_queries) > self.max_queries:
+                self._normalized_queries.popitem(last=False)
+
+        return normalized_query
+
+    def get(self, key: tuple) -> tuple:
+        """
+        Returns the cached (body, status code) for the key, or None.
+        """
+
+        with self._lock:
+            response = self._responses.get(key, None)
+            if response is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._responses.move_to_end(key)
+            return response
+
+    def put(self, key: tuple, body: bytes, status_code: int):
+        if len(body) > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._responses:
+                return
+
+            self._responses[key] = (body, status_code)
+            self.size += len(body)
+            while self.size > self.max_size:
+                _, (evicted_body, _) = self._responses.popitem(last=False)
+                self.size -= len(evicted_body)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._responses),
+                'size': self.size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class PersistedQueryRegistry:
+    """
+    A thread-safe registry of query documents by the hex SHA-256 hash of
+    their text, for automatic persisted queries: clients send the hash of a
+    query instead of the query itself, and register the query by sending
+    both if the hash is unknown. Queries can then be sent as short GET
+    requests, which CDNs and browsers can cache. The least recently used
+    queries are dropped once there are more than `max_queries`.
+    """
+
+    def __init__(self, max_queries: int):
+        self.max_queries = max_queries
+        self._queries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query_hash: str) -> str:
+        with self._lock:
+            query = self._queries.get(query_hash, None)
+            if query is not None:
+                self._queries.move_to_end(query_hash)
+
+            return query
+
+    def register(self, query_hash: str, query: str):
+        if hashlib.sha256(query.encode('utf-8')).hexdigest() != query_hash:
+            raise HttpQueryError(400, 'provided sha does not match query')
+
+        with self._lock:
+            self._queries[query_hash] = query
+            self._queries.move_to_end(query_hash)
+            if len(self._queries) > self.max_queries:
+                self._queries.popitem(last=False)
+
+
+def apply_persisted_query(persisted_queries: PersistedQueryRegistry, data, args: dict):
+    """
+    Replaces the query of requests that use the `persistedQuery` extension
+    with the registered query, or registers the query if the request has
+    both. `data` is the parsed request body, and `args` are the query string
+    parameters. Does nothing if `persisted_queries` is None.
+    """
+
+    if persisted_queries is None or not isinstance(data, collections.abc.Mapping):
+        return data
+
+    extensions = data.get('extensions') or args.get('extensions')
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise HttpQueryError(400, 'Extensions are invalid JSON.')
+
+    if not isinstance(extensions, collections.abc.Mapping):
+        return data
+
+    persisted_query = extensions.get('persistedQuery', None)
+    if not isinstance(persisted_query, collections.abc.Mapping):
+        return data
+
+    query_hash = persisted_query.get('sha256Hash', None)
+    query = data.get('query') or args.get('query')
+    if query:
+        persisted_queries.register(query_hash, query)
+    else:
+        query = persisted_queries.get(query_hash)
+        if query is None:
+            raise HttpQueryError(400, 'PersistedQueryNotFound')
+
+    data = dict(data)
+    data['query'] = query
+    return data
+
+
+def response_cache_key(cache: ResponseCache, params, data_version: str, pretty: bool) -> tuple:
+    """
+    Returns the cache key of the response to a query, given its
+    `RequestParams`, or None if the response can't be cached. The key is also
+    used for ETags, so it's needed even if `cache` is None.
+    """
+
+    if not params.query:
+        return None
+
+    if cache is not None:
+        normalized_query = cache.normalize(params.query)
+    else:
+        normalized_query = normalize_query(params.query)
+    if normalized_query is None or normalized_query.startswith(('mutation', 'subscription')):
+        return None
+
+    return (
+        normalized_query,
+        json.dumps(params.variables, sort_keys=True),
+        params.operation_name,
+        data_version,
+        bool(pretty),
+    )
+
+
+def response_etag(key: tuple) -> str:
+    return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+
+def cacheable_response(body: bytes, status_code: int) -> bool:
+    """
+    Returns whether an encoded response can be cached and given an ETag,
+    which it can only be if it succeeded without any GraphQL errors. Errors
+    can be transient, so they're never served from a cache.
+    """
+
+    if status_code != 200:
+        return False
+
+    # Only responses that mention errors are parsed
+    if b'"errors"' not in body:
+        return True
+
+    try:
+        response = json.loads(body)
+    except ValueError:
+        return False
+
+    return isinstance(response, dict) and 'errors' not in response
+
+
+class CachingGraphQLView(flask_graphql.GraphQLView):
+    """
+    A GraphQLView that serves repeated queries from a `ResponseCache`, keyed
+    on the normalized query document, the variables, the operation name and
+    the version of the dataset. Cache hits skip parsing, validation and
+    execution entirely.
+
+    Each request takes a snapshot of `datasets.current` (see
+    `dataset.DatasetReloader`) when it starts, which is passed to the
+    resolvers as `info.context['dataset']`.
+
+    Responses also get a strong ETag that's derived from the same key, so GET
+    and HEAD requests with a matching `If-None-Match` header are answered with
+    a 304 before the query is even looked up. POST requests are always
+    answered in full. GET responses are cacheable for `max_age` seconds, and
+    the `Last-Modified` header is the scrape time of the dataset. Responses
+    with errors aren't cached, and are sent with `Cache-Control: no-store`,
+    see `cacheable_response`. Queries can be sent by hash with the
+    `persistedQuery` extension, see `PersistedQueryRegistry`.
+
+    Only single GET and POST queries are cached, not batches, mutations, or
+    requests that render GraphiQL. The `X-Cache` response header says
+    whether a response was a cache hit.
+
+    If `metrics` is set, the duration of each phase of the request and of
+    every resolver is recorded in it, see `metrics.Metrics`. If
+    `cost_analyzer` is set, queries that are estimated to cost more than its
+    budget are rejected before they're executed, see `cost.CostLimitBackend`.
+    """
+
+    cache = None
+    datasets = None
+    dataset = None
+    persisted_queries = None
+    max_age = 0
+    metrics = None
+    timer = None
+    cost_analyzer = None
+
+    def parse_body(self):
+        data = apply_persisted_query(self.persisted_queries, super().parse_body(), flask.request.args)
+        if self.timer is not None and self.timer.params is None and isinstance(data, collections.abc.Mapping):
+            self.timer.params = get_graphql_params(data, flask.request.args)
+
+        return data
+
+    def cache_key(self) -> tuple:
+        """
+        Returns the cache key for the current request, or None if its
+        response can't be cached.
+        """
+
+        if flask.request.method not in ('GET', 'POST') or self.should_display_graphiql():
+            return None
+
+        try:
+            data = self.parse_body()
+        except HttpQueryError:
+            return None
+
+        if not isinstance(data, collections.abc.Mapping):
+            return None
+
+        try:
+            params = get_graphql_params(data, flask.request.args)
+        except HttpQueryError:
+            return None
+
+        return response_cache_key(
+            self.cache,
+            params,
+            self.dataset.version if self.dataset is not None else None,
+            self.pretty or flask.request.args.get('pretty'),
+        )
+
+    def add_validators(self, response: flask.Response, etag: str) -> flask.Response:
+        response.set_etag(etag)
+        if self.dataset is not None:
+            response.last_modified = self.dataset.last_modified
+        if flask.request.method == 'GET' and self.max_age:
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+
+        return response
+
+    def get_context(self):
+        return {
+            'request': flask.request,
+            'dataset': self.dataset,
+        }
+
+    def get_backend(self):
+        if self.timer is not None:
+            return self.timer.backend(self.cost_analyzer, self.dataset)
+
+        if self.cost_analyzer is not None:
+            return cost.CostLimitBackend(self.cost_analyzer, self.dataset)
+
+        return super().get_backend()
+
+    def get_middleware(self):
+        if self.timer is not None:
+            return self.timer.middleware()
+
+        return super().get_middleware()
+
+    def encode(self, data, pretty=False):
+        if self.timer is None:
+            return json_encode(data, pretty=pretty)
+
+        start = time.perf_counter()
+        try:
+            return json_encode(data, pretty=pretty)
+        finally:
+            self.timer.add_phase('serialize', time.perf_counter() - start)
+
+    def dispatch_request(self):
+        if self.metrics is None:
+            return self.dispatch_cached_request()
+
+        self.timer = metrics.RequestTimer()
+        # GraphiQL pages are returned as strings
+        response = flask.make_response(self.dispatch_cached_request())
+        self.metrics.observe_request(
+            self.timer,
+            response.status_code,
+            response.headers.get('X-Cache', 'none').lower(),
+        )
+
+        return response
+
+    def dispatch_cached_request(self):
+        if self.datasets is not None:
+            self.dataset = self.datasets.current
+
+        try:
+            key = self.cache_key()
+        except HttpQueryError:
+            # Persisted query errors are reported by the base view
+            key = None
+
+        if key is None:
+            return super().dispatch_request()
+
+        etag = response_etag(key)
+        if flask.request.method in ('GET', 'HEAD') and flask.request.if_none_match.contains(etag):
+            return self.add_validators(flask.Response(status=304), etag)
+
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            body, status_code = cached
+            response = flask.Response(body, status=status_code, content_type='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            cacheable = True
+        else:
+            response = super().dispatch_request()
+            cacheable = cacheable_response(response.get_data(), response.status_code)
+            if self.cache is not None:
+                if cacheable:
+                    self.cache.put(key, response.get_data(), response.status_code)
+                response.headers['X-Cache'] = 'MISS'
+
+        if cacheable:
+            self.add_validators(response, etag)
+        else:
+            response.cache_control.no_store = True
+
+        return response
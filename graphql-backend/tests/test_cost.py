@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import unittest
+import warnings
+from unittest import mock
+
+from graphql.language.base import parse
+
+os.environ.setdefault('RECIPE_DATA_RELOAD_INTERVAL', '0')
+
+import app
+import asgi
+import backend.cost as cost
+import backend.search as search
+
+
+class QueryCostAnalyzerTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = cost.QueryCostAnalyzer(1000, app.QUERY_LIST_SIZES, app.QUERY_FIELD_COSTS)
+        self.data = app.DATASETS.current
+
+    def query_cost(self, query: str, variables: dict = None, operation_name: str = None) -> int:
+        return self.analyzer.query_cost(app.schema, parse(query), variables, operation_name, self.data)
+
+    def test_scalar_fields(self):
+        self.assertEqual(self.query_cost('{ dataVersion wikiBaseUrl }'), 2)
+
+    def test_list_fields(self):
+        self.assertEqual(self.query_cost('{ rawMaterials { id name } }'), 1 + 2 * len(self.data.raw_materials))
+        self.assertEqual(self.query_cost('{ recipes(recipeIds: ["axe", "flimsy_axe"]) { id } }'), 1 + 2 + 2)
+
+    def test_aliases(self):
+        self.assertEqual(
+            self.query_cost('{ a: rawMaterials { id } b: rawMaterials { id } }'),
+            2 * self.query_cost('{ rawMaterials { id } }'),
+        )
+
+    def test_fragments(self):
+        self.assertEqual(
+            self.query_cost('query { ...A ...A } fragment A on Query { ...B ...B } fragment B on Query { dataVersion }'),
+            4,
+        )
+        self.assertEqual(self.query_cost('{ ... on Query { dataVersion } }'), 1)
+
+    def test_page_size(self):
+        query = 'query ($first: Int) { recipesConnection(first: $first) { edges { node { id } } } }'
+
+        self.assertLess(self.query_cost(query, {'first': 5}), self.query_cost(query, {'first': 50}))
+        self.assertEqual(self.query_cost(query, {'first': 10 ** 6}), self.query_cost(query, {'first': len(self.data.recipes)}))
+
+    def test_search_limit(self):
+        query = 'query ($limit: Int) { search(query: "chair", limit: $limit) { score } }'
+
+        self.assertEqual(self.query_cost(query, {'limit': -5}), self.query_cost(query, {'limit': 0}))
+        self.assertEqual(self.query_cost(query, {'limit': 10 ** 6}), self.query_cost(query, {'limit': search.MAX_LIMIT}))
+
+    def test_crafting_plan_searches(self):
+        query = 'query ($inventory: [CraftableRecipeRawMaterialArg]) { optimalCraftingPlan(rawMaterials: $inventory) { profit } }'
+        inventory = [{'rawMaterialId': raw_material_id, 'quantity': 1} for raw_material_id in self.data.raw_materials]
+
+        self.assertLess(self.query_cost(query, {'inventory': inventory[:2]}), self.query_cost(query, {'inventory': inventory[:4]}))
+
+    def test_crafting_plan_quantities(self):
+        query = 'query ($inventory: [CraftableRecipeRawMaterialArg]) { optimalCraftingPlan(rawMaterials: $inventory) { profit } }'
+        inventory = lambda quantity: [
+            {'rawMaterialId': raw_material_id, 'quantity': quantity}
+            for raw_material_id in ('wood', 'stone', 'iron_nugget')
+        ]
+
+        self.assertEqual(self.query_cost(query, {'inventory': inventory(None)}), self.query_cost(query, {'inventory': inventory(1)}))
+        self.assertEqual(self.query_cost(query, {'inventory': inventory(-5)}), self.query_cost(query, {'inventory': inventory(1)}))
+        self.assertEqual(
+            self.query_cost(query, {'inventory': inventory(app.PLAN_SEARCH_QUANTITY - 1)}),
+            self.query_cost(query, {'inventory': inventory(1)}),
+        )
+        self.assertLess(
+            self.query_cost(query, {'inventory': inventory(app.PLAN_SEARCH_QUANTITY)}),
+            self.query_cost(query, {'inventory': inventory(10 ** 6)}),
+        )
+
+    def test_introspection(self):
+        self.assertEqual(self.query_cost('{ __schema { types { name fields { name } } } }'), 1)
+
+    def test_operation_name(self):
+        query = 'query A { dataVersion } query B { rawMaterials { id } }'
+
+        self.assertEqual(self.query_cost(query, operation_name='A'), 1)
+        self.assertEqual(self.query_cost(query, operation_name='B'), 1 + len(self.data.raw_materials))
+        # Ambiguous operations are rejected when they're executed
+        self.assertEqual(self.query_cost(query), 0)
+
+
+@unittest.skipUnless(app.QUERY_COST_ANALYZER, 'Query cost analysis is disabled')
+class QueryCostLimitTest(unittest.TestCase):
+    CHEAP_QUERY = '{ recipes(recipeIds: ["axe"]) { name } }'
+    EXPENSIVE_QUERY = '{ ' + ' '.join(
+        f'a{alias}: recipes {{ name rawMaterials {{ name quantity }} materials {{ name }} }}'
+        for alias in range(30)
+    ) + ' }'
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_under_budget(self):
+        response = self.client.post('/', json={'query': self.CHEAP_QUERY})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data'], {'recipes': [{'name': 'Axe'}]})
+        self.assertEqual(response.get_json()['extensions']['cost'], {'requestedQueryCost': 3, 'maximumAvailable': app.QUERY_COST_BUDGET})
+
+    def test_no_deprecated_execute_arguments(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)
+            response = self.client.post('/', json={'query': self.CHEAP_QUERY})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('errors', response.get_json())
+
+    def test_over_budget(self):
+        with mock.patch('app.current_dataset', wraps=app.current_dataset) as current_dataset:
+            response = self.client.post('/', json={'query': self.EXPENSIVE_QUERY})
+
+        body = response.get_json()
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('data', body)
+        self.assertIn('exceeds the maximum', body['errors'][0]['message'])
+        self.assertGreater(body['extensions']['cost']['requestedQueryCost'], app.QUERY_COST_BUDGET)
+        self.assertEqual(body['extensions']['cost']['maximumAvailable'], app.QUERY_COST_BUDGET)
+        # Rejected before any field was resolved
+        current_dataset.assert_not_called()
+
+    def test_over_budget_asgi(self):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': json.dumps({'query': self.EXPENSIVE_QUERY}).encode()}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'path': '/', 'method': 'POST', 'query_string': b'', 'headers': [(b'content-type', b'application/json')]}
+        asyncio.run(asgi.application(scope, receive, send))
+
+        self.assertEqual(messages[0]['status'], 400)
+        self.assertIn('exceeds the maximum', json.loads(messages[1]['body'])['errors'][0]['message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
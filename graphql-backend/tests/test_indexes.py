@@ -0,0 +1,43 @@
+import unittest
+
+import backend.indexes as indexes
+
+
+def recipe(name: str, sell_price: int = None, value_of_raw_materials: int = None) -> dict:
+    return {
+        'name': name,
+        'sell_price': sell_price,
+        'value_of_raw_materials': value_of_raw_materials,
+        'total_crafting_steps': 1,
+    }
+
+
+RECIPES = {
+    'wooden_chair': recipe('Wooden chair', 1440, 1080),
+    'log_chair': recipe('Log chair', 1440, 240),
+    'document_stack': recipe('Document stack', 100),
+    'unsellable_chair': recipe('Unsellable chair', None, 480),
+    'mystery_chair': recipe('Mystery chair'),
+}
+
+
+class ProfitMarginTest(unittest.TestCase):
+    def test_profit_margin(self):
+        self.assertEqual(indexes.profit_margin(RECIPES['wooden_chair']), 360)
+
+    def test_unknown_values(self):
+        self.assertIsNone(indexes.profit_margin(RECIPES['document_stack']))
+        self.assertIsNone(indexes.profit_margin(RECIPES['unsellable_chair']))
+        self.assertIsNone(indexes.profit_margin(RECIPES['mystery_chair']))
+
+    def test_sorted_index(self):
+        index = indexes.SortedIndex(RECIPES, indexes.RECIPE_SORT_KEYS)
+
+        self.assertEqual(
+            index.sorted_ids('profit_margin', descending=True),
+            ['log_chair', 'wooden_chair', 'document_stack', 'unsellable_chair', 'mystery_chair'],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import os
+import random
+import unittest
+
+import numpy as np
+
+import backend.matrix as matrix
+import backend.storage as storage
+
+RECIPE_DATA_FILENAME = os.path.join(os.path.dirname(__file__), '..', 'data', 'diy_recipes.json')
+
+
+def recipe(materials: dict, raw_materials: dict, depends_on: list = ()) -> dict:
+    return {
+        'materials': [
+            {'id': material_id, 'quantity': quantity}
+            for material_id, quantity in materials.items()
+        ],
+        'raw_materials': {
+            raw_material_id: {'quantity': quantity}
+            for raw_material_id, quantity in raw_materials.items()
+        },
+        'depends_on': list(depends_on),
+    }
+
+
+RAW_MATERIALS = {
+    'wood': {},
+    'stone': {},
+    'iron_nugget': {},
+}
+
+# Recipes are listed before the recipes that they're crafted from, and
+# document_stack and scattered_papers are crafted from each other, like in
+# the served recipes
+RECIPES = {
+    'iron_table': recipe({'table': 1, 'iron_nugget': 2}, {'wood': 6, 'stone': 1, 'iron_nugget': 2}, ['table', 'plank']),
+    'table': recipe({'plank': 3, 'stone': 1}, {'wood': 6, 'stone': 1}, ['plank']),
+    'plank': recipe({'wood': 2}, {'wood': 2}),
+    'stone_stool': recipe({'stone': 3}, {'stone': 3}),
+    'document_stack': recipe({'scattered_papers': 1}, {}, ['document_stack', 'scattered_papers']),
+    'scattered_papers': recipe({'document_stack': 1}, {}, ['document_stack', 'scattered_papers']),
+}
+
+
+class RequirementMatrixTest(unittest.TestCase):
+    def setUp(self):
+        self.requirements = matrix.RequirementMatrix(RECIPES, RAW_MATERIALS)
+
+    def recipe_vector(self, recipe_quantities: dict) -> np.ndarray:
+        return self.requirements.recipe_vector(recipe_quantities)
+
+    def by_recipe_id(self, vector: np.ndarray) -> dict:
+        return {
+            recipe_id: value
+            for recipe_id, value in zip(self.requirements.recipe_ids, vector)
+            if value
+        }
+
+    def test_shape(self):
+        self.assertEqual(self.requirements.shape, (6, 3))
+        self.assertEqual(self.requirements.recipe_ids, list(RECIPES))
+        self.assertEqual(self.requirements.raw_material_ids, list(RAW_MATERIALS))
+
+    def test_to_dense(self):
+        expected = np.zeros((len(RECIPES), len(RAW_MATERIALS)))
+        for row, recipe in enumerate(RECIPES.values()):
+            for raw_material_id, raw_material_ref in recipe['raw_materials'].items():
+                expected[row, self.requirements.raw_material_positions[raw_material_id]] = raw_material_ref['quantity']
+
+        np.testing.assert_array_equal(self.requirements.to_dense(), expected)
+        np.testing.assert_array_equal(self.requirements.to_dense(np.array([2, 0, 4])), expected[[2, 0, 4]])
+        self.assertEqual(self.requirements.to_dense(np.array([], dtype=np.int64)).shape, (0, 3))
+
+    def test_inventory_vector(self):
+        inventory = self.requirements.inventory_vector({'stone': 4, 'wood': 2, 'iron_nugget': None, 'gold_nugget': 5})
+
+        np.testing.assert_array_equal(inventory, [2, 4, 0])
+
+    def test_inventory_matrix(self):
+        inventories = self.requirements.inventory_matrix([{'wood': 1}, {}, {'iron_nugget': 3}])
+
+        np.testing.assert_array_equal(inventories, [[1, 0, 0], [0, 0, 0], [0, 0, 3]])
+
+    def test_recipe_vector(self):
+        vector = self.requirements.recipe_vector({'table': 2, 'plank': None, 'chair': 1})
+
+        self.assertEqual(self.by_recipe_id(vector), {'table': 2})
+
+    def test_craftable_quantities(self):
+        inventory = self.requirements.inventory_vector({'wood': 13, 'stone': 2})
+
+        craftable = self.requirements.craftable_quantities(inventory)
+
+        self.assertEqual(craftable.dtype, np.int64)
+        self.assertEqual(self.by_recipe_id(craftable), {'table': 2, 'plank': 6})
+
+    def test_craftable_quantities_batch(self):
+        # More inventories than fit in a block
+        rng = np.random.default_rng(0)
+        inventories = rng.integers(0, 20, (2 * matrix.CRAFTABLE_QUANTITIES_BLOCK_SIZE + 3, len(RAW_MATERIALS))).astype(np.float64)
+        dense = self.requirements.to_dense()
+
+        craftable = self.requirements.craftable_quantities(inventories)
+
+        self.assertEqual(craftable.shape, (len(inventories), len(RECIPES)))
+        for inventory, row in zip(inventories, craftable):
+            expected = [
+                int(min(inventory[required > 0] // required[required > 0])) if required.any() else 0
+                for required in dense
+            ]
+            np.testing.assert_array_equal(row, expected)
+            np.testing.assert_array_equal(self.requirements.craftable_quantities(inventory), row)
+
+    def test_craftable_quantities_without_raw_materials(self):
+        recipes = {recipe_id: RECIPES[recipe_id] for recipe_id in ('document_stack', 'scattered_papers')}
+        requirements = matrix.RequirementMatrix(recipes, RAW_MATERIALS)
+
+        craftable = requirements.craftable_quantities(np.full((2, len(RAW_MATERIALS)), 100.0))
+
+        np.testing.assert_array_equal(craftable, np.zeros((2, 2)))
+
+    def test_required_raw_materials(self):
+        recipe_quantities = self.recipe_vector({'iron_table': 2, 'plank': 1, 'stone_stool': 3})
+
+        required = self.requirements.required_raw_materials(recipe_quantities)
+
+        np.testing.assert_array_equal(required, [14, 11, 4])
+        np.testing.assert_array_equal(required, recipe_quantities @ self.requirements.to_dense())
+
+    def test_required_crafts(self):
+        required_crafts = self.requirements.required_crafts(self.recipe_vector({'iron_table': 2, 'stone_stool': 1}))
+
+        self.assertEqual(self.by_recipe_id(required_crafts), {'iron_table': 2, 'table': 2, 'plank': 6, 'stone_stool': 1})
+
+    def test_required_crafts_cycle(self):
+        for recipe_id in ('document_stack', 'scattered_papers'):
+            required_crafts = self.by_recipe_id(self.requirements.required_crafts(self.recipe_vector({recipe_id: 1})))
+
+            # The material that completes the cycle isn't crafted
+            self.assertEqual(required_crafts, {recipe_id: 1})
+
+    def test_available_recipes(self):
+        def available(owned_recipe_ids: list) -> set:
+            return set(self.by_recipe_id(self.requirements.available_recipes(owned_recipe_ids)))
+
+        self.assertEqual(available([]), set())
+        self.assertEqual(available(['plank', 'table']), {'plank', 'table'})
+        # Tables are crafted from planks, which aren't owned
+        self.assertEqual(available(['iron_table', 'table']), set())
+        self.assertEqual(available(['iron_table', 'table', 'plank']), {'iron_table', 'table', 'plank'})
+        self.assertEqual(available(['document_stack']), set())
+        self.assertEqual(available(['document_stack', 'scattered_papers']), {'document_stack', 'scattered_papers'})
+        self.assertEqual(available(['stone_stool', 'chair']), {'stone_stool'})
+
+    def test_dependencies(self):
+        # Each recipe and the recipes that it depends on, other than itself
+        self.assertEqual(len(self.requirements.depends_on_indptr), len(RECIPES) + 1)
+        self.assertEqual(len(self.requirements.depends_on_indices), len(RECIPES) + 5)
+
+
+class RecipeDataRequirementMatrixTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = storage.load_recipe_data(RECIPE_DATA_FILENAME)
+        cls.requirements = matrix.RequirementMatrix(cls.data['recipes'], cls.data['raw_materials'])
+
+    def test_available_recipes(self):
+        rng = random.Random(0)
+        recipe_ids = list(self.data['recipes'])
+        for owned_count in (0, 1, 50, 300, 500, len(recipe_ids)):
+            owned = set(rng.sample(recipe_ids, owned_count))
+
+            available = self.requirements.available_recipes(list(owned))
+
+            expected = [
+                recipe_id in owned and set(recipe['depends_on']) <= owned
+                for recipe_id, recipe in self.data['recipes'].items()
+            ]
+            np.testing.assert_array_equal(available, expected)
+
+    def test_required_crafts(self):
+        # Crafting a recipe takes as many crafts as its crafting steps
+        for recipe_id, recipe in self.data['recipes'].items():
+            required_crafts = self.requirements.required_crafts(self.requirements.recipe_vector({recipe_id: 1}))
+
+            self.assertEqual(required_crafts.sum(), recipe['total_crafting_steps'], recipe_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
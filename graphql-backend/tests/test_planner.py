@@ -0,0 +1,562 @@
+import itertools
+import os
+import random
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import backend.matrix as matrix
+import backend.planner as planner
+import backend.storage as storage
+
+RECIPE_DATA_FILENAME = os.path.join(os.path.dirname(__file__), '..', 'data', 'diy_recipes.json')
+
+
+def brute_force_lp(c: np.ndarray, A: np.ndarray, b: np.ndarray) -> float:
+    """
+    Returns the optimal value of `maximize c.x subject to A.x <= b, x >= 0`
+    as the best of its vertices, which are the feasible solutions of every
+    square subsystem of the constraints.
+    """
+
+    m, n = A.shape
+    constraints = np.vstack([A, -np.eye(n)])
+    bounds = np.concatenate([b, np.zeros(n)])
+
+    best = -np.inf
+    for rows in itertools.combinations(range(m + n), n):
+        rows = list(rows)
+        try:
+            x = np.linalg.solve(constraints[rows], bounds[rows])
+        except np.linalg.LinAlgError:
+            continue
+        if (constraints @ x <= bounds + 1e-9).all():
+            best = max(best, c @ x)
+
+    return best
+
+
+def brute_force_knapsack(weights: list, values: list, bounds: list, capacity: int) -> np.ndarray:
+    """
+    Returns the best value of every capacity from 0 to `capacity` by trying
+    every combination of quantities.
+    """
+
+    best_values = np.zeros(capacity + 1)
+    for quantities in itertools.product(*(range(bound + 1) for bound in bounds)):
+        weight = np.dot(quantities, weights)
+        if weight <= capacity:
+            best_values[weight:] = np.maximum(best_values[weight:], np.dot(quantities, values))
+
+    return best_values
+
+
+def brute_force_plans(crafting_planner: planner.CraftingPlanner, inventory: np.ndarray, available: np.ndarray = None) -> list:
+    """
+    Returns the (profit, crafting steps) of every combination of the recipes
+    that are worth crafting that can be crafted from the inventory.
+    """
+
+    requirements = crafting_planner.requirements
+    upper_bounds = requirements.craftable_quantities(inventory)
+    if available is not None:
+        upper_bounds[~available] = 0
+    candidates = np.flatnonzero((crafting_planner.recipe_profits > 0) & (upper_bounds > 0))
+    required = requirements.to_dense(candidates)
+    profits = crafting_planner.recipe_profits[candidates]
+    steps = crafting_planner.recipe_crafting_steps[candidates]
+
+    plans = []
+
+    def add_plans(candidate: int, remaining: np.ndarray, profit: float, total_steps: int):
+        if candidate == len(candidates):
+            plans.append((profit, total_steps))
+            return
+
+        while (remaining >= 0).all():
+            add_plans(candidate + 1, remaining, profit, total_steps)
+            remaining = remaining - required[candidate]
+            profit += profits[candidate]
+            total_steps += steps[candidate]
+
+    add_plans(0, inventory, 0.0, 0)
+    return plans
+
+
+def brute_force_plan(crafting_planner: planner.CraftingPlanner, inventory: np.ndarray, available: np.ndarray = None, labor_budget: int = None) -> float:
+    """
+    Returns the profit of the best plan for the inventory that takes at most
+    `labor_budget` crafting steps, by trying every combination of recipes.
+    """
+
+    return max(
+        profit
+        for profit, steps in brute_force_plans(crafting_planner, inventory, available)
+        if labor_budget is None or steps <= labor_budget
+    )
+
+
+def brute_force_candidates(crafting_planner: planner.CraftingPlanner, upper_bounds: np.ndarray, profits: np.ndarray) -> np.ndarray:
+    """
+    Compares each candidate recipe with every other one. Of recipes that
+    are identical, the first one is kept.
+    """
+
+    candidates = np.flatnonzero((profits > 0) & (upper_bounds > 0))
+    requirements = crafting_planner.requirements.to_dense(candidates)
+    steps = crafting_planner.recipe_crafting_steps[candidates]
+    candidate_profits = profits[candidates]
+
+    kept = []
+    for j in range(len(candidates)):
+        requires_less = (requirements <= requirements[j]).all(axis=1) & (steps <= steps[j])
+        identical = (requirements == requirements[j]).all(axis=1) & (steps == steps[j]) & (candidate_profits == candidate_profits[j])
+        dominates = requires_less & (candidate_profits >= candidate_profits[j]) & (~identical | (np.arange(len(candidates)) < j))
+        dominates[j] = False
+        if not dominates.any():
+            kept.append(candidates[j])
+
+    return np.array(kept, dtype=np.int64)
+
+
+def recipe(raw_materials: dict, sell_price: int, total_crafting_steps: int = 1) -> dict:
+    return {
+        'materials': [
+            {'id': raw_material_id, 'quantity': quantity}
+            for raw_material_id, quantity in raw_materials.items()
+        ],
+        'raw_materials': {
+            raw_material_id: {'quantity': quantity}
+            for raw_material_id, quantity in raw_materials.items()
+        },
+        'depends_on': [],
+        'sell_price': sell_price,
+        'total_crafting_steps': total_crafting_steps,
+    }
+
+
+class SolveLpTest(unittest.TestCase):
+    def test_known_optimum(self):
+        c = np.array([3.0, 5.0])
+        A = np.array([[1.0, 0.0], [0.0, 2.0], [3.0, 2.0]])
+        b = np.array([4.0, 12.0, 18.0])
+
+        value, x, duals = planner.solve_lp(c, A, b)
+
+        self.assertAlmostEqual(value, 36)
+        np.testing.assert_allclose(x, [2, 6], atol=1e-9)
+        np.testing.assert_allclose(duals, [0, 1.5, 1], atol=1e-9)
+
+    def test_brute_force(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            m, n = rng.integers(1, 5), rng.integers(1, 5)
+            c = rng.integers(-2, 10, n).astype(np.float64)
+            A = rng.integers(0, 6, (m, n)).astype(np.float64)
+            A[0] += 1
+            b = rng.integers(0, 20, m).astype(np.float64)
+
+            value, x, duals = planner.solve_lp(c, A, b)
+
+            self.assertAlmostEqual(value, brute_force_lp(c, A, b))
+            self.assertAlmostEqual(c @ x, value)
+            self.assertTrue((x >= -1e-9).all())
+            self.assertTrue((A @ x <= b + 1e-9).all())
+            # The duals are feasible and prove that the value is optimal
+            self.assertTrue((duals >= -1e-9).all())
+            self.assertTrue((A.T @ duals >= c - 1e-9).all())
+            self.assertAlmostEqual(b @ duals, value)
+
+    def test_degenerate(self):
+        c = np.array([1.0, 1.0, 1.0])
+        A = np.array([[1.0, 1.0, 0.0], [1.0, 0.0, 1.0], [0.0, 1.0, 1.0], [1.0, 1.0, 1.0]])
+        b = np.array([0.0, 0.0, 2.0, 2.0])
+
+        value, _, _ = planner.solve_lp(c, A, b)
+
+        self.assertAlmostEqual(value, brute_force_lp(c, A, b))
+
+    def test_no_variables(self):
+        value, x, duals = planner.solve_lp(np.zeros(0), np.zeros((2, 0)), np.ones(2))
+
+        self.assertEqual(value, 0)
+        self.assertEqual(len(x), 0)
+        np.testing.assert_array_equal(duals, [0, 0])
+
+    def test_unbounded(self):
+        with self.assertRaises(ValueError):
+            planner.solve_lp(np.array([1.0, 1.0]), np.array([[1.0, 0.0]]), np.array([1.0]))
+
+
+class BoundedKnapsackTest(unittest.TestCase):
+    def assert_solutions(self, weights: list, values: list, bounds: list, best_values: np.ndarray, solution):
+        for capacity, best_value in enumerate(best_values):
+            quantities = solution(capacity)
+            self.assertTrue((quantities >= 0).all())
+            self.assertTrue((quantities <= bounds).all())
+            self.assertLessEqual(quantities @ weights, capacity)
+            self.assertAlmostEqual(quantities @ values, best_value)
+
+    def test_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            items = rng.randint(1, 4)
+            weights = [rng.randint(1, 6) for _ in range(items)]
+            values = [rng.randint(1, 20) for _ in range(items)]
+            bounds = [rng.randint(0, 4) for _ in range(items)]
+            capacity = rng.randint(0, 25)
+
+            best_values, solution = planner.bounded_knapsack(np.array(weights), np.array(values), np.array(bounds), capacity)
+
+            np.testing.assert_allclose(best_values, brute_force_knapsack(weights, values, bounds, capacity))
+            self.assert_solutions(weights, values, bounds, best_values, solution)
+
+    def test_initial_values(self):
+        weights, values, bounds = [3, 4, 5], [4, 6, 7], [2, 3, 1]
+        capacity = 20
+
+        initial_values, _ = planner.bounded_knapsack(np.array(weights[:1]), np.array(values[:1]), np.array(bounds[:1]), capacity)
+        best_values, _ = planner.bounded_knapsack(np.array(weights[1:]), np.array(values[1:]), np.array(bounds[1:]), capacity, initial_values)
+
+        np.testing.assert_allclose(best_values, brute_force_knapsack(weights, values, bounds, capacity))
+
+    def test_items_heavier_than_capacity(self):
+        best_values, solution = planner.bounded_knapsack(np.array([10, 2]), np.array([100, 1]), np.array([5, 5]), 5)
+
+        np.testing.assert_allclose(best_values, [0, 0, 1, 1, 2, 2])
+        np.testing.assert_array_equal(solution(5), [0, 2])
+
+
+class CraftingPlannerTest(unittest.TestCase):
+    RAW_MATERIALS = {
+        'wood': {'sell_price': 60},
+        'stone': {'sell_price': 75},
+        'iron_nugget': {'sell_price': 375},
+        'star_fragment': {'sell_price': None},
+    }
+
+    RECIPES = {
+        'wooden_stool': recipe({'wood': 3}, 360),
+        'stone_stool': recipe({'stone': 3}, 300),
+        'iron_frame': recipe({'iron_nugget': 2, 'wood': 1}, 1000, 2),
+        'star_wand': recipe({'star_fragment': 3, 'wood': 1}, 800),
+        'rock_wall': recipe({'stone': 2, 'wood': 2}, 480),
+        # Can't be crafted from raw materials, so it's never in a plan
+        'gift': recipe({}, 5000),
+    }
+
+    def setUp(self):
+        self.requirements = matrix.RequirementMatrix(self.RECIPES, self.RAW_MATERIALS)
+        self.planner = planner.CraftingPlanner(self.RECIPES, self.RAW_MATERIALS, self.requirements)
+
+    def plan(self, inventory: dict, **kwargs) -> dict:
+        return self.planner.optimal_plan(self.requirements.inventory_vector(inventory), time_limit=None, **kwargs)
+
+    def recipe_quantities(self, plan: dict) -> dict:
+        return {
+            recipe_id: quantity
+            for recipe_id, quantity in zip(self.requirements.recipe_ids, plan['recipe_quantities'])
+            if quantity
+        }
+
+    def assert_consistent(self, plan: dict, inventory: dict):
+        inventory = self.requirements.inventory_vector(inventory)
+        required = self.requirements.required_raw_materials(plan['recipe_quantities'])
+        self.assertTrue((required <= inventory).all())
+        np.testing.assert_array_equal(plan['leftover_raw_materials'], inventory - required)
+        self.assertEqual(plan['total_sell_price'], plan['crafted_sell_price'] + plan['leftover_sell_price'])
+        self.assertEqual(plan['profit'], plan['total_sell_price'] - int(inventory @ self.planner.raw_material_sell_prices))
+
+    def test_profits(self):
+        profits = dict(zip(self.requirements.recipe_ids, self.planner.recipe_profits))
+        self.assertEqual(profits['wooden_stool'], 180)
+        self.assertEqual(profits['stone_stool'], 75)
+        self.assertEqual(profits['iron_frame'], 190)
+        # Star fragments can't be sold, so they're worth nothing
+        self.assertEqual(profits['star_wand'], 740)
+        self.assertEqual(profits['rock_wall'], 210)
+        self.assertEqual(profits['gift'], 5000)
+
+    def test_optimal_plan(self):
+        inventory = {'wood': 7, 'stone': 4, 'iron_nugget': 2, 'star_fragment': 3}
+
+        plan = self.plan(inventory)
+
+        # Two rock walls earn more than a stool and a rock wall
+        self.assertEqual(self.recipe_quantities(plan), {'iron_frame': 1, 'star_wand': 1, 'rock_wall': 2})
+        self.assertEqual(plan['profit'], 190 + 740 + 2 * 210)
+        self.assertEqual(plan['total_crafting_steps'], 5)
+        self.assertTrue(plan['optimal'])
+        self.assert_consistent(plan, inventory)
+
+    def test_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            inventory = {raw_material_id: rng.randint(0, 12) for raw_material_id in self.RAW_MATERIALS}
+
+            plan = self.plan(inventory)
+
+            self.assertEqual(plan['profit'], brute_force_plan(self.planner, self.requirements.inventory_vector(inventory)))
+            self.assertTrue(plan['optimal'])
+            self.assert_consistent(plan, inventory)
+
+    def test_empty_inventory(self):
+        plan = self.plan({})
+
+        self.assertEqual(self.recipe_quantities(plan), {})
+        self.assertEqual(plan['total_sell_price'], 0)
+        self.assertEqual(plan['profit'], 0)
+        self.assertTrue(plan['optimal'])
+
+    def test_leftovers_are_sold(self):
+        plan = self.plan({'wood': 2, 'stone': 1})
+
+        self.assertEqual(self.recipe_quantities(plan), {})
+        self.assertEqual(plan['leftover_sell_price'], 2 * 60 + 75)
+        self.assertEqual(plan['profit'], 0)
+
+    def test_recipe_without_raw_materials(self):
+        plan = self.plan({'wood': 100, 'stone': 100, 'iron_nugget': 100, 'star_fragment': 100})
+
+        self.assertNotIn('gift', self.recipe_quantities(plan))
+        self.assert_consistent(plan, {'wood': 100, 'stone': 100, 'iron_nugget': 100, 'star_fragment': 100})
+
+    def test_available_recipes(self):
+        available = self.requirements.available_recipes(['wooden_stool', 'stone_stool'])
+
+        plan = self.plan({'wood': 7, 'stone': 4, 'iron_nugget': 2}, available=available)
+
+        self.assertEqual(self.recipe_quantities(plan), {'wooden_stool': 2, 'stone_stool': 1})
+
+    def test_labor_budget(self):
+        rng = random.Random(0)
+        for _ in range(10):
+            inventory = {raw_material_id: rng.randint(0, 12) for raw_material_id in self.RAW_MATERIALS}
+            inventory_vector = self.requirements.inventory_vector(inventory)
+            most_profitable = self.plan(inventory)
+
+            for labor_budget in range(most_profitable['total_crafting_steps'] + 1):
+                plan = self.plan(inventory, labor_budget=labor_budget)
+                frontier = self.planner.pareto_frontier(inventory_vector, labor_budget, time_limit=None)
+                best_profit = brute_force_plan(self.planner, inventory_vector, labor_budget=labor_budget)
+
+                self.assertLessEqual(plan['total_crafting_steps'], labor_budget)
+                self.assert_consistent(plan, inventory)
+                # The local search might not find the best plan, but it's
+                # at least as good as the corners of the frontier below the
+                # budget, and it's only optimal if it's the best plan
+                self.assertLessEqual(plan['profit'], best_profit)
+                self.assertGreaterEqual(plan['profit'], max(frontier_plan['profit'] for frontier_plan in frontier))
+                if plan['optimal']:
+                    self.assertEqual(plan['profit'], best_profit)
+
+    def test_profit_per_crafting_step(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            inventory = {raw_material_id: rng.randint(0, 12) for raw_material_id in self.RAW_MATERIALS}
+            plans = brute_force_plans(self.planner, self.requirements.inventory_vector(inventory))
+
+            plan = self.plan(inventory, objective=planner.OBJECTIVE_PROFIT_PER_CRAFTING_STEP)
+
+            best = max((profit / steps for profit, steps in plans if steps), default=None)
+            self.assertAlmostEqual(planner.profit_per_crafting_step(plan), best)
+
+    def test_pareto_frontier(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            inventory = {raw_material_id: rng.randint(0, 12) for raw_material_id in self.RAW_MATERIALS}
+            inventory_vector = self.requirements.inventory_vector(inventory)
+            plans = brute_force_plans(self.planner, inventory_vector)
+
+            frontier = self.planner.pareto_frontier(inventory_vector, time_limit=None)
+
+            self.assertEqual(frontier[0]['total_crafting_steps'], 0)
+            self.assertEqual(frontier[-1]['profit'], max(profit for profit, _ in plans))
+            for plan in frontier:
+                self.assert_consistent(plan, inventory)
+            # Each plan earns more than the plans before it, and no plan is
+            # above the lines between them
+            for left, right in zip(frontier, frontier[1:]):
+                self.assertLess(left['total_crafting_steps'], right['total_crafting_steps'])
+                self.assertLess(left['profit'], right['profit'])
+                slope = (right['profit'] - left['profit']) / (right['total_crafting_steps'] - left['total_crafting_steps'])
+                for profit, steps in plans:
+                    if left['total_crafting_steps'] <= steps <= right['total_crafting_steps']:
+                        self.assertLessEqual(profit, left['profit'] + slope * (steps - left['total_crafting_steps']) + 1e-6)
+
+    def test_huge_inventory(self):
+        inventory = {'wood': 31, 'stone': 4, 'iron_nugget': 2, 'star_fragment': 3}
+        expected_profit = brute_force_plan(self.planner, self.requirements.inventory_vector(inventory))
+        inventory['wood'] += 3 * 10 ** 7
+
+        plan = self.plan(inventory)
+
+        # The extra wood is crafted into wooden stools
+        self.assertEqual(plan['profit'], expected_profit + 10 ** 7 * 180)
+        self.assertTrue(plan['optimal'])
+        self.assert_consistent(plan, inventory)
+
+    def test_candidates(self):
+        recipes = dict(
+            self.RECIPES,
+            # Identical to wooden_stool, and dominated by it
+            wooden_stool_copy=recipe({'wood': 3}, 360),
+            wooden_bench=recipe({'wood': 4}, 400),
+        )
+        requirements = matrix.RequirementMatrix(recipes, self.RAW_MATERIALS)
+        crafting_planner = planner.CraftingPlanner(recipes, self.RAW_MATERIALS, requirements)
+        upper_bounds = crafting_planner._upper_bounds(requirements.inventory_vector({'wood': 7, 'stone': 4, 'iron_nugget': 2, 'star_fragment': 3}), None)
+
+        candidates = crafting_planner._candidates(upper_bounds, crafting_planner.recipe_profits)
+
+        self.assertEqual(
+            [requirements.recipe_ids[position] for position in candidates],
+            ['wooden_stool', 'stone_stool', 'iron_frame', 'star_wand', 'rock_wall'],
+        )
+
+    def test_unknown_objective(self):
+        with self.assertRaises(ValueError):
+            self.plan({'wood': 3}, objective='most_crafting_steps')
+
+
+class RecipeDataPlannerTest(unittest.TestCase):
+    """
+    Tests against the recipes that are served, which include the cycle of
+    `document_stack` and `scattered_papers`, which are crafted from each
+    other and don't require any raw materials.
+    """
+
+    INVENTORIES = [
+        {'wood': 10, 'stone': 5},
+        {'wood': 6, 'iron_nugget': 3},
+        {'clay': 6, 'stone': 6, 'iron_nugget': 2},
+        {'tree_branch': 10, 'clump_of_weeds': 10},
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = storage.load_recipe_data(RECIPE_DATA_FILENAME)
+        cls.requirements = matrix.RequirementMatrix(cls.data['recipes'], cls.data['raw_materials'])
+        cls.planner = planner.CraftingPlanner(cls.data['recipes'], cls.data['raw_materials'], cls.requirements)
+
+    def test_brute_force(self):
+        for inventory in self.INVENTORIES:
+            inventory = self.requirements.inventory_vector(inventory)
+
+            plan = self.planner.optimal_plan(inventory, time_limit=None)
+
+            self.assertEqual(plan['profit'], brute_force_plan(self.planner, inventory))
+            self.assertTrue(plan['optimal'])
+
+    def test_available_recipes_brute_force(self):
+        available = self.requirements.available_recipes(['wooden_chair', 'log_stakes', 'stone_stool', 'barrel'])
+        for inventory in self.INVENTORIES:
+            inventory = self.requirements.inventory_vector(inventory)
+
+            plan = self.planner.optimal_plan(inventory, available=available, time_limit=None)
+
+            self.assertEqual(plan['profit'], brute_force_plan(self.planner, inventory, available))
+            self.assertFalse(plan['recipe_quantities'][~available].any())
+
+    def test_candidates_brute_force(self):
+        rng = np.random.default_rng(0)
+        for inventory in self.INVENTORIES + [{raw_material_id: 100 for raw_material_id in self.data['raw_materials']}]:
+            upper_bounds = self.planner._upper_bounds(self.requirements.inventory_vector(inventory), None)
+            for step_cost in (0, int(rng.integers(1, 200))):
+                profits = self.planner.recipe_profits - step_cost * self.planner.recipe_crafting_steps
+
+                # Several blocks of recipes
+                with mock.patch.object(planner, 'DOMINANCE_BLOCK_SIZE', 7):
+                    candidates = self.planner._candidates(upper_bounds, profits)
+
+                np.testing.assert_array_equal(candidates, brute_force_candidates(self.planner, upper_bounds, profits))
+
+    def test_cyclic_recipes(self):
+        cycle = [self.requirements.recipe_positions[recipe_id] for recipe_id in ('document_stack', 'scattered_papers')]
+        inventory = np.full(len(self.requirements.raw_material_ids), 50.0)
+
+        np.testing.assert_array_equal(self.requirements.craftable_quantities(inventory)[cycle], [0, 0])
+        self.assertTrue((self.planner.recipe_profits[cycle] > 0).all())
+
+        plan = self.planner.optimal_plan(inventory)
+
+        self.assertFalse(plan['recipe_quantities'][cycle].any())
+        self.assertTrue((plan['leftover_raw_materials'] >= 0).all())
+        self.assertGreater(plan['profit'], 0)
+
+    def test_time_limit(self):
+        rng = random.Random(0)
+        common_raw_materials = ['wood', 'hardwood', 'softwood', 'stone', 'clay', 'iron_nugget', 'gold_nugget', 'tree_branch', 'bamboo_piece', 'clump_of_weeds', 'star_fragment']
+        for _ in range(5):
+            inventory = {raw_material_id: rng.randint(0, 80) for raw_material_id in common_raw_materials}
+            inventory = self.requirements.inventory_vector(inventory)
+            labor_budget = self.planner.optimal_plan(inventory)['total_crafting_steps'] // 2
+            # Without any cached hulls
+            crafting_planner = planner.CraftingPlanner(self.data['recipes'], self.data['raw_materials'], self.requirements)
+
+            start = time.perf_counter()
+            plan = crafting_planner.optimal_plan(inventory, labor_budget, time_limit=0.05)
+            frontier = crafting_planner.pareto_frontier(inventory, labor_budget, time_limit=0.05)
+            elapsed = time.perf_counter() - start
+
+            # The plans that are returned when the time is up still have to
+            # be built, which takes a few milliseconds
+            self.assertLess(elapsed, 2 * 0.05 + 0.2)
+            self.assertLessEqual(plan['total_crafting_steps'], labor_budget)
+            self.assertTrue((plan['leftover_raw_materials'] >= 0).all())
+            self.assertTrue(all(frontier_plan['total_crafting_steps'] <= labor_budget for frontier_plan in frontier))
+
+    def test_huge_inventory(self):
+        inventory = self.requirements.inventory_vector({'wood': 10 ** 7, 'stone': 100, 'iron_nugget': 40, 'clay': 30})
+        crafting_planner = planner.CraftingPlanner(self.data['recipes'], self.data['raw_materials'], self.requirements)
+
+        start = time.perf_counter()
+        plan = crafting_planner.optimal_plan(inventory)
+        budget_plan = crafting_planner.optimal_plan(inventory, 500)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 2 * planner.DEFAULT_TIME_LIMIT)
+        self.assertTrue(plan['optimal'])
+        self.assertTrue(budget_plan['optimal'])
+        self.assertEqual(budget_plan['total_crafting_steps'], 500)
+        for crafting_plan in (plan, budget_plan):
+            self.assertTrue((crafting_plan['leftover_raw_materials'] >= 0).all())
+            np.testing.assert_array_equal(
+                crafting_plan['leftover_raw_materials'],
+                inventory - self.requirements.required_raw_materials(crafting_plan['recipe_quantities']),
+            )
+
+    def test_huge_inventory_time_limit(self):
+        # Too many of each raw material to complete the knapsack tables in time
+        inventory = self.requirements.inventory_vector({'wood': 10 ** 6, 'stone': 10 ** 6, 'iron_nugget': 10 ** 6})
+        crafting_planner = planner.CraftingPlanner(self.data['recipes'], self.data['raw_materials'], self.requirements)
+
+        start = time.perf_counter()
+        plan = crafting_planner.optimal_plan(inventory, time_limit=0.05)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 2 * 0.05 + 1)
+        self.assertFalse(plan['optimal'])
+        self.assertGreater(plan['profit'], 0)
+        np.testing.assert_array_equal(
+            plan['leftover_raw_materials'],
+            inventory - self.requirements.required_raw_materials(plan['recipe_quantities']),
+        )
+        self.assertTrue((plan['leftover_raw_materials'] >= 0).all())
+
+    def test_time_limit_reached(self):
+        inventory = self.requirements.inventory_vector(self.INVENTORIES[0])
+        crafting_planner = planner.CraftingPlanner(self.data['recipes'], self.data['raw_materials'], self.requirements)
+
+        plan = crafting_planner.optimal_plan(inventory, time_limit=0)
+
+        self.assertFalse(plan['optimal'])
+        self.assertTrue((plan['leftover_raw_materials'] >= 0).all())
+        # The plan that wasn't proven optimal isn't cached
+        self.assertTrue(crafting_planner.optimal_plan(inventory, time_limit=None)['optimal'])
+
+
+if __name__ == '__main__':
+    unittest.main()
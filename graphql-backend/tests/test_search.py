@@ -0,0 +1,124 @@
+import os
+import unittest
+
+os.environ.setdefault('RECIPE_DATA_RELOAD_INTERVAL', '0')
+
+import app
+import backend.search as search
+
+
+def recipe(name: str, source: str = None) -> dict:
+    return {'name': name, 'source': source}
+
+
+RECIPES = {
+    'wooden_chair': recipe('Wooden chair', 'Tom Nook'),
+    'wooden_block_chair': recipe('Wooden-block chair', 'Balloons'),
+    'log_chair': recipe('Log chair', 'Tom Nook'),
+    'iron_worktable': recipe('Iron worktable', 'Nook Miles+'),
+    'bamboo_wall': recipe('Bamboo wall', 'Message in a bottleIsland resident'),
+}
+
+RAW_MATERIALS = {
+    'wood': {'name': 'Wood'},
+    'iron_nugget': {'name': 'Iron nugget'},
+}
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = search.SearchIndex(RECIPES, RAW_MATERIALS)
+
+    def ids(self, query: str, limit: int = 10) -> list:
+        return [hit.id for hit in self.index.search(query, limit)]
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('Wooden-block chair'), ['wooden', 'block', 'chair'])
+        self.assertEqual(search.tokenize('Message in a bottleIsland resident'), ['message', 'in', 'a', 'bottle', 'island', 'resident'])
+        self.assertEqual(search.tokenize('Nook Miles+'), ['nook', 'miles'])
+        self.assertEqual(search.tokenize('__'), [])
+        self.assertEqual(search.tokenize(None), [])
+
+    def test_exact_name_first(self):
+        hits = self.index.search('wooden chair')
+        self.assertEqual(hits[0].id, 'wooden_chair')
+        self.assertEqual(hits[0].kind, search.RECIPE)
+        self.assertEqual(hits[0].field, 'name')
+        self.assertEqual(hits[0].text, 'Wooden chair')
+        self.assertGreater(hits[0].score, hits[1].score)
+
+    def test_prefix(self):
+        self.assertEqual(self.ids('iron'), ['iron_nugget', 'iron_worktable'])
+        self.assertEqual(self.ids('iron n')[:2], ['iron_nugget', 'iron_worktable'])
+        self.assertEqual(self.ids('bamb wa'), ['bamboo_wall'])
+
+    def test_prefix_scores_by_coverage(self):
+        self.assertEqual(self.ids('woo')[:2], ['wood', 'wooden_chair'])
+
+    def test_fuzzy(self):
+        self.assertEqual(self.ids('wod')[:3], ['wood', 'wooden_chair', 'wooden_block_chair'])
+        self.assertEqual(self.ids('ironn worktabel'), ['iron_worktable', 'iron_nugget'])
+
+    def test_fuzzy_multiple_tokens(self):
+        # "wod" is closer to "wood" than to "wooden", but "wooden chair"
+        # matches both query tokens
+        self.assertEqual(self.ids('wod chai')[:2], ['wooden_chair', 'wooden_block_chair'])
+        self.assertEqual(self.ids('wod chai')[2], 'log_chair')
+
+    def test_source(self):
+        hits = self.index.search('island resident')
+        self.assertEqual([hit.id for hit in hits], ['bamboo_wall'])
+        self.assertEqual(hits[0].field, 'source')
+        self.assertEqual(hits[0].text, 'Message in a bottleIsland resident')
+
+    def test_each_entity_once(self):
+        hits = self.index.search('nook')
+        self.assertEqual(sorted(hit.id for hit in hits), ['iron_worktable', 'log_chair', 'wooden_chair'])
+
+    def test_no_hits(self):
+        self.assertEqual(self.ids('xyzzy'), [])
+        self.assertEqual(self.ids(''), [])
+        self.assertEqual(self.ids('!?'), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.ids('chair', 2)), 2)
+        self.assertEqual(self.ids('chair', 0), [])
+        self.assertEqual(self.ids('chair', -1), [])
+
+
+class SearchQueryTest(unittest.TestCase):
+    QUERY = '''
+        query ($query: String!, $limit: Int) {
+            search(query: $query, limit: $limit) {
+                recipe { id }
+                rawMaterial { id }
+                matchedField
+            }
+        }
+    '''
+
+    def search(self, query: str, limit: int = None) -> list:
+        result = app.schema.execute(
+            self.QUERY,
+            variable_values={'query': query, 'limit': limit},
+            context_value={'dataset': app.DATASETS.current},
+        )
+        self.assertFalse(result.errors)
+        return result.data['search']
+
+    def test_search(self):
+        hits = self.search('wooden chair')
+        self.assertEqual(hits[0], {'recipe': {'id': 'wooden_chair'}, 'rawMaterial': None, 'matchedField': 'name'})
+
+    def test_raw_material(self):
+        self.assertEqual(self.search('wood', 1), [{'recipe': None, 'rawMaterial': {'id': 'wood'}, 'matchedField': 'name'}])
+
+    def test_negative_limit(self):
+        self.assertEqual(self.search('chair', -5), [])
+
+    def test_limit_over_maximum(self):
+        self.assertEqual(len(self.search('a', 10 * search.MAX_LIMIT)), search.MAX_LIMIT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import copy
+import importlib.util
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+import backend.storage as storage
+
+DATA_LOCATION = os.path.join(os.path.dirname(__file__), '..', 'data')
+RECIPE_DATA_FILENAME = os.path.join(DATA_LOCATION, 'diy_recipes.json')
+COMPACT_RECIPE_DATA_FILENAME = os.path.join(DATA_LOCATION, 'diy_recipes.bin')
+
+# The compact data files are written by the data pipeline, which isn't part
+# of the API's image
+SCRAPER_FILENAME = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'app.py')
+
+
+def load_scraper():
+    if not os.path.exists(SCRAPER_FILENAME):
+        return None
+
+    spec = importlib.util.spec_from_file_location('scraper', SCRAPER_FILENAME)
+    scraper = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(scraper)
+    except ImportError:
+        return None
+
+    return scraper
+
+
+scraper = load_scraper()
+
+
+class CompactRecipeDataTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(RECIPE_DATA_FILENAME) as rdfile:
+            cls.data = json.load(rdfile)
+
+    def test_load(self):
+        self.assertEqual(storage.load_compact_recipe_data(COMPACT_RECIPE_DATA_FILENAME), self.data)
+
+    def test_load_recipe_data(self):
+        self.assertEqual(storage.load_recipe_data(RECIPE_DATA_FILENAME), self.data)
+        self.assertEqual(storage.load_recipe_data(COMPACT_RECIPE_DATA_FILENAME), self.data)
+
+    def test_invalid_file(self):
+        with open(COMPACT_RECIPE_DATA_FILENAME, 'rb') as compact_file:
+            contents = compact_file.read()
+
+        with self.assertRaises(ValueError):
+            storage.read_compact_sections(b'JSON' + contents[4:])
+        with self.assertRaises(ValueError):
+            storage.read_compact_sections(contents[:4] + struct.pack('<I', storage.COMPACT_DATA_VERSION + 1) + contents[8:])
+
+
+@unittest.skipIf(scraper is None, 'The data pipeline or its dependencies are not installed')
+class CompactRecipeDataRoundtripTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(RECIPE_DATA_FILENAME) as rdfile:
+            cls.data = json.load(rdfile)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'diy_recipes.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def roundtrip(self, data: dict):
+        scraper.write_compact_recipe_data(data, self.filename)
+
+        self.assertEqual(storage.load_compact_recipe_data(self.filename), data)
+
+    def test_roundtrip(self):
+        self.roundtrip(self.data)
+
+    def test_shipped_file_is_current(self):
+        scraper.write_compact_recipe_data(self.data, self.filename)
+
+        with open(self.filename, 'rb') as written, open(COMPACT_RECIPE_DATA_FILENAME, 'rb') as shipped:
+            self.assertEqual(written.read(), shipped.read())
+
+    def test_missing_values(self):
+        data = copy.deepcopy(self.data)
+        recipe = data['recipes']['wooden_chair']
+        recipe['source'] = None
+        recipe['sell_price'] = None
+        recipe['value_of_raw_materials'] = None
+        recipe['image_url'] = None
+        data['raw_materials']['wood']['sell_price'] = None
+        data['raw_materials']['wood']['name'] = 'Wöod'
+
+        self.roundtrip(data)
+
+    def test_empty(self):
+        self.roundtrip({
+            'wiki_base_url': self.data['wiki_base_url'],
+            'utc_datetime': self.data['utc_datetime'],
+            'recipes': {},
+            'raw_materials': {},
+        })
+
+    def test_nul_characters(self):
+        data = copy.deepcopy(self.data)
+        data['recipes']['wooden_chair']['name'] = 'Wooden\0chair'
+
+        with self.assertRaises(ValueError):
+            scraper.write_compact_recipe_data(data, self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
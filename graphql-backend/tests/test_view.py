@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import json
+import os
+import unittest
+import urllib.parse
+
+os.environ.setdefault('RECIPE_DATA_RELOAD_INTERVAL', '0')
+
+import app
+import asgi
+import backend.view as view
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def persisted_query_extensions(query: str) -> str:
+    return json.dumps({'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}})
+
+
+class NormalizeQueryTest(unittest.TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(
+            view.normalize_query('query {\n  recipe(id: "axe") { id, name }  # comment\n}'),
+            'query { recipe ( id : "axe" ) { id name } }',
+        )
+
+    def test_invalid_query(self):
+        self.assertIsNone(view.normalize_query('{ recipe(id: "axe) { id } }'))
+
+
+class CacheableResponseTest(unittest.TestCase):
+    def test_cacheable_response(self):
+        self.assertTrue(view.cacheable_response(b'{"data":{"recipe":{"id":"axe"}}}', 200))
+        # Names that look like the errors key, but aren't
+        self.assertTrue(view.cacheable_response(b'{"data":{"name":"\\"errors\\""}}', 200))
+
+    def test_errors(self):
+        self.assertFalse(view.cacheable_response(b'{"data":{"recipe":null},"errors":[{"message":"nope"}]}', 200))
+        self.assertFalse(view.cacheable_response(b'{"errors":[{"message":"nope"}]}', 400))
+        self.assertFalse(view.cacheable_response(b'{"data":{"recipe":{"id":"axe"}}}', 500))
+
+
+class PersistedQueryRegistryTest(unittest.TestCase):
+    def test_register(self):
+        registry = view.PersistedQueryRegistry(2)
+        query = '{ dataVersion }'
+
+        self.assertIsNone(registry.get(query_hash(query)))
+        registry.register(query_hash(query), query)
+        self.assertEqual(registry.get(query_hash(query)), query)
+
+    def test_hash_mismatch(self):
+        registry = view.PersistedQueryRegistry(2)
+
+        with self.assertRaises(view.HttpQueryError):
+            registry.register(query_hash('{ dataVersion }'), '{ wikiBaseUrl }')
+
+    def test_least_recently_used_are_dropped(self):
+        registry = view.PersistedQueryRegistry(2)
+        queries = ['{ dataVersion }', '{ wikiBaseUrl }', '{ rawMaterials { id } }']
+
+        registry.register(query_hash(queries[0]), queries[0])
+        registry.register(query_hash(queries[1]), queries[1])
+        registry.get(query_hash(queries[0]))
+        registry.register(query_hash(queries[2]), queries[2])
+
+        self.assertEqual(registry.get(query_hash(queries[0])), queries[0])
+        self.assertIsNone(registry.get(query_hash(queries[1])))
+        self.assertEqual(registry.get(query_hash(queries[2])), queries[2])
+
+
+class HttpCachingTest(unittest.TestCase):
+    QUERY = '{ recipe(id: "axe") { id sellPrice } }'
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_validators(self):
+        response = self.client.get('/', query_string={'query': self.QUERY})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response.headers['ETag'], r'^"[0-9a-f]{64}"$')
+        self.assertIn('Last-Modified', response.headers)
+        self.assertEqual(response.headers['Cache-Control'], f'public, max-age={app.RESPONSE_MAX_AGE}')
+
+    def test_etag_ignores_formatting(self):
+        first = self.client.get('/', query_string={'query': self.QUERY})
+        second = self.client.get('/', query_string={'query': '{recipe(id:"axe"){id,sellPrice}}'})
+        other = self.client.get('/', query_string={'query': '{ recipe(id: "axe") { id } }'})
+
+        self.assertEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertNotEqual(first.headers['ETag'], other.headers['ETag'])
+
+    def test_post_is_not_publicly_cacheable(self):
+        response = self.client.post('/', json={'query': self.QUERY})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response.headers)
+        self.assertNotIn('public', response.headers.get('Cache-Control', ''))
+
+    def test_not_modified(self):
+        etag = self.client.get('/', query_string={'query': self.QUERY}).headers['ETag']
+
+        response = self.client.get('/', query_string={'query': self.QUERY}, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+    def test_post_not_modified(self):
+        etag = self.client.post('/', json={'query': self.QUERY}).headers['ETag']
+
+        response = self.client.post('/', json={'query': self.QUERY}, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data'], {'recipe': {'id': 'axe', 'sellPrice': 625}})
+
+    def test_modified(self):
+        response = self.client.get('/', query_string={'query': self.QUERY}, headers={'If-None-Match': '"0"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data'], {'recipe': {'id': 'axe', 'sellPrice': 625}})
+
+    @unittest.skipIf(app.RESPONSE_CACHE is None, 'The response cache is disabled')
+    def test_response_cache(self):
+        query = '{ recipe(id: "flimsy_axe") { id } }'
+
+        first = self.client.post('/', json={'query': query})
+        second = self.client.post('/', json={'query': query.replace(' ', '  ')})
+
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(first.get_data(), second.get_data())
+
+
+class PersistedQueryTest(unittest.TestCase):
+    QUERY = '{ recipe(id: "stone_axe") { id } }'
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_unknown_hash(self):
+        response = self.client.get('/', query_string={'extensions': persisted_query_extensions('{ unknown }')})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['errors'], [{'message': 'PersistedQueryNotFound'}])
+
+    def test_register_and_get(self):
+        registered = self.client.post('/', json={'query': self.QUERY, 'extensions': json.loads(persisted_query_extensions(self.QUERY))})
+        response = self.client.get('/', query_string={'extensions': persisted_query_extensions(self.QUERY)})
+
+        self.assertEqual(registered.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data'], {'recipe': {'id': 'stone_axe'}})
+        self.assertIn('public', response.headers['Cache-Control'])
+
+    def test_hash_mismatch(self):
+        response = self.client.post('/', json={'query': self.QUERY + ' ', 'extensions': json.loads(persisted_query_extensions(self.QUERY))})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['errors'], [{'message': 'provided sha does not match query'}])
+
+    def test_invalid_extensions(self):
+        response = self.client.get('/', query_string={'query': self.QUERY, 'extensions': '{'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ErrorResponseTest(unittest.TestCase):
+    """
+    Responses with errors are never cached or given validators, since the
+    errors can be transient.
+    """
+
+    QUERY = '{ recipe(id: "no_such_recipe") { id } }'
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def get(self):
+        # Resolver errors are logged by graphql-core
+        with self.assertLogs('graphql', 'ERROR'):
+            return self.client.get('/', query_string={'query': self.QUERY})
+
+    def get_asgi(self) -> tuple:
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/', 'query_string': urllib.parse.urlencode({'query': self.QUERY}).encode(), 'headers': []}
+        with self.assertLogs('graphql', 'ERROR'):
+            asyncio.run(asgi.application(scope, receive, send))
+
+        headers = {name.decode().lower(): value.decode() for name, value in messages[0]['headers']}
+        return messages[0]['status'], headers, json.loads(messages[1]['body'])
+
+    def test_not_cached(self):
+        for _ in range(2):
+            response = self.get()
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.get_json()['errors'])
+            self.assertNotIn('ETag', response.headers)
+            self.assertNotIn('Last-Modified', response.headers)
+            self.assertEqual(response.headers['Cache-Control'], 'no-store')
+            if app.RESPONSE_CACHE is not None:
+                self.assertEqual(response.headers['X-Cache'], 'MISS')
+
+    def test_not_cached_asgi(self):
+        for _ in range(2):
+            status, headers, body = self.get_asgi()
+
+            self.assertEqual(status, 200)
+            self.assertTrue(body['errors'])
+            self.assertNotIn('etag', headers)
+            self.assertNotIn('last-modified', headers)
+            self.assertEqual(headers['cache-control'], 'no-store')
+            if app.RESPONSE_CACHE is not None:
+                self.assertEqual(headers['x-cache'], 'MISS')
+
+    def test_invalid_query(self):
+        response = self.client.get('/', query_string={'query': '{ noSuchField }'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+
+
+if __name__ == '__main__':
+    unittest.main()